@@ -1,14 +1,26 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
-import random
-import math
-from queue import PriorityQueue
+import time
 from PIL import Image, ImageTk
+import any_angle
+# The routing core; helpers such as a_star and Courier stay importable from here
+from core import (Courier, Router, a_star, clamp, generate_random_map, is_walkable, line_of_sight,
+                  random_position, load_grid, load_costs, load_map, TICK_MS, PLANNERS)
+from planner_service import PlanningService
+import instrument
+from fleet import dispatch, plan_legs
+from renderer import FleetSprites, Layout, RetainedRenderer, courier_shape, flag_shape
+from raster import GridRaster
+from scheduler import FrameScheduler
+from sim_clock import SimClock
+import strip_loader
 
 WINDOW_WIDTH = 1000
 WINDOW_HEIGHT = 700
 
 TILE_SIZE = 10 # Fixed size
+FRAME_MS = 16 # 60 FPS for smoother animation
+FLEET_SIZE = 1000 # Extra couriers sent out by the "Armada" button
 
 GRAY = "#666666"
 WHITE = "#FFFFFF"
@@ -18,147 +30,143 @@ RED = "#FF0000"
 GREEN = "#00FF00"
 BLUE = "#0000FF"
 
-def clamp(value, min_value, max_value):
-    return max(min_value, min(max_value, value))
-
-def generate_random_map(grid_width, grid_height):
-    return [[0 if random.random() < 0.85 else 1 for _ in range(grid_width)] for _ in range(grid_height)]
-
-def is_walkable(grid, x, y):
-    return 0 <= x < len(grid[0]) and 0 <= y < len(grid) and grid[y][x] == 0
-
-def line_of_sight(grid, start, end):
-    """Check if there's a clear line of sight between two points using Bresenham's algorithm"""
-    x0, y0 = start
-    x1, y1 = end
-    
-    dx = abs(x1 - x0)
-    dy = abs(y1 - y0)
-    
-    sx = 1 if x0 < x1 else -1
-    sy = 1 if y0 < y1 else -1
-    
-    err = dx - dy
-    
-    x, y = x0, y0
-    
-    while True:
-        # Check if current position is walkable
-        if not is_walkable(grid, x, y):
-            return False
-            
-        if x == x1 and y == y1:
-            break
-            
-        e2 = 2 * err
-        
-        if e2 > -dy:
-            err -= dy
-            x += sx
-            
-        if e2 < dx:
-            err += dx
-            y += sy
-    
-    return True
-
-def a_star(grid, start, goal):
-    def heuristic(a, b):
-        # Manhattan distance for grid-based movement
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
-    
-    open_set = PriorityQueue()
-    open_set.put((0, start))
-    came_from = {}
-    g_score = {start: 0}
-    
-    # 8-direction movement (cardinal + diagonal)
-    directions = [
-        # Cardinal directions (4)
-        (0, -1), (1, 0), (0, 1), (-1, 0),
-        # Diagonal directions (4)
-        (-1, -1), (-1, 1), (1, -1), (1, 1)
-    ]
-    
-    while not open_set.empty():
-        _, current = open_set.get()
-        if current == goal:
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            return path[::-1]
-        
-        for dx, dy in directions:
-            neighbor = (current[0] + dx, current[1] + dy)
-            
-            # Skip if neighbor is not walkable
-            if not is_walkable(grid, *neighbor):
-                continue
-            
-            # For diagonal moves, check if path is clear
-            if abs(dx) == 1 and abs(dy) == 1:
-                # Check both adjacent cells for diagonal movement
-                if not (is_walkable(grid, current[0] + dx, current[1]) and 
-                       is_walkable(grid, current[0], current[1] + dy)):
-                    continue
-                move_cost = math.sqrt(2)
+# Canvas items updated in place every frame, bottom to top
+SCENE_LAYERS = [
+    ("pickup_pole", "line", {"fill": BLACK, "width": 3}),
+    ("pickup_flag", "polygon", {"fill": YELLOW, "outline": BLACK}),
+    ("goal_pole", "line", {"fill": BLACK, "width": 3}),
+    ("goal_flag", "polygon", {"fill": RED, "outline": BLACK}),
+    ("courier", "polygon", {"fill": GREEN, "outline": BLACK}),
+    ("path_rest", "line", {"fill": GREEN, "width": 2, "dash": (4, 2)}),
+    ("path_head", "line", {"fill": GREEN, "width": 2, "dash": (4, 2)}),
+    ("legend_box", "rectangle", {"fill": "white", "outline": "black", "stipple": "gray50"}),
+    ("legend", "text", {"anchor": "nw", "font": ("Arial", 10, "bold")}),
+    ("perf_box", "rectangle", {"fill": "white", "outline": "black", "stipple": "gray50"}),
+    ("perf", "text", {"anchor": "nw", "font": ("Courier", 9)}),
+]
+
+class MapView:
+    """Frames of one canvas: map layer, flags, courier and route, fleet, legend.
+
+    Everything drawn is passed to draw(), so frames can be drawn without
+    an App or a Tk window (benchmark.py times them on an offscreen canvas).
+    """
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.renderer = RetainedRenderer(canvas)
+        self.raster = None  # Obstacle layer when there is no map image
+        self.fleet_sprites = FleetSprites(canvas, (GREEN, "#FFD700"))
+        self.layout = None  # Grid <-> canvas mapping of the last frame
+        self.map_image = None
+        self.map_photo = None  # Photo of map_image, made again when the image changes
+
+    def photo(self, map_image):
+        if map_image is not self.map_image:
+            self.map_image = map_image
+            self.map_photo = None
+            if map_image is not None:
+                # Offscreen canvases (benchmark.OffscreenCanvas) make their own photos
+                make_photo = getattr(self.canvas, "make_photo", None) or ImageTk.PhotoImage
+                self.map_photo = make_photo(map_image)
+        return self.map_photo
+
+    def draw_static(self, canvas, router, layout):
+        """Map layer: drawn once per map, canvas size or closure change"""
+        if self.map_photo:
+            # Draw loaded map
+            canvas.create_image(layout.offset_x, layout.offset_y, anchor=tk.NW, image=self.map_photo)
+        else:
+            # Walkable area white, obstacles as gray blocks without grid lines,
+            # rasterised into a few images instead of one rectangle per obstacle
+            if self.raster is None or self.raster.grid is not router.grid:
+                self.raster = GridRaster(router.grid, TILE_SIZE, WHITE, GRAY)
             else:
-                move_cost = 1
-                
-            tentative_g = g_score[current] + move_cost
-            
-            if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                came_from[neighbor] = current
-                g_score[neighbor] = tentative_g
-                f_score = tentative_g + heuristic(neighbor, goal)
-                open_set.put((f_score, neighbor))
-    return []
-
-def random_position(grid):
-    h = len(grid)
-    w = len(grid[0])
-    while True:
-        x = random.randint(0, w - 1)
-        y = random.randint(0, h - 1)
-        if grid[y][x] == 0:
-            return x, y
-
-class Courier:
-    def __init__(self, x, y):
-        self.x, self.y = x, y
-        self.path = []
-        self.moving = False
-        self.angle = 0
-        self.target_index = 0
-        self.speed = 0.15  # Reduced speed for more precise movement
-        self.current_pos = (float(x), float(y))  # Float position for smooth animation
-        self.has_pickup = False  # Status apakah sudah mengambil pickup
-        self.current_target = None  # Target saat ini (pickup atau goal)
-        
-    def move(self):
-        if self.path and self.target_index < len(self.path):
-            target = self.path[self.target_index]
-            dx = target[0] - self.current_pos[0]
-            dy = target[1] - self.current_pos[1]
-            distance = math.sqrt(dx**2 + dy**2)
-            
-            if distance < self.speed:
-                self.current_pos = (float(target[0]), float(target[1]))
-                self.target_index += 1
+                self.raster.sync(router.closures)
+            self.raster.draw(canvas, layout.offset_x, layout.offset_y)
+
+        # Closed roads
+        for cell in router.closures:
+            canvas.create_rectangle(*layout.cell_box(*cell), fill=RED, outline=BLACK, stipple="gray50")
+
+    def draw(self, router, map_image, pickup, goal, courier, alpha, legend_text, fleet=None):
+        """One frame of router's map (map_image, or the grid when None); alpha
+        places the courier between its last two ticks"""
+        canvas_w = self.canvas.winfo_width()
+        canvas_h = self.canvas.winfo_height()
+        flat = router.flat_grid
+        photo = self.photo(map_image)
+
+        if photo:
+            image_w, image_h = map_image.size
+            offset_x = (canvas_w - image_w) // 2
+            offset_y = (canvas_h - image_h) // 2
+            scale_x = image_w / (flat.width * TILE_SIZE)
+            scale_y = image_h / (flat.height * TILE_SIZE)
+        else:
+            map_w = flat.width * TILE_SIZE
+            map_h = flat.height * TILE_SIZE
+            offset_x = max((canvas_w - map_w) // 2, 0)
+            offset_y = max((canvas_h - map_h) // 2, 0)
+            scale_x = scale_y = 1
+        layout = Layout(offset_x, offset_y, TILE_SIZE, scale_x, scale_y)
+        self.layout = layout
+
+        # Map layer and scene items are only recreated for a new map or size
+        if self.renderer.begin(
+            (flat.version, id(photo), canvas_w, canvas_h),
+            lambda canvas: self.draw_static(canvas, router, layout),
+            SCENE_LAYERS,
+        ):
+            self.fleet_sprites.reset()
+
+        # Pickup point - Yellow flag
+        pole, flag = flag_shape(*layout.to_canvas(*pickup), scale_x, scale_y)
+        self.renderer.update("pickup_pole", pole)
+        self.renderer.update("pickup_flag", flag)
+
+        # Goal - Red flag
+        pole, flag = flag_shape(*layout.to_canvas(*goal), scale_x, scale_y)
+        self.renderer.update("goal_pole", pole)
+        self.renderer.update("goal_flag", flag)
+
+        # Courier - Green triangle, changes color if has pickup
+        courier_color = GREEN if not courier.has_pickup else "#FFD700"  # Gold color when has pickup
+        cx, cy = layout.to_canvas(*courier.position(alpha))
+        length = TILE_SIZE * max(scale_x, scale_y) // 1
+        self.renderer.update("courier", courier_shape(cx, cy, length, courier.angle), fill=courier_color)
+
+        # Draw path if it exists: the segment to the next waypoint follows the
+        # courier, the rest of the line only changes when a waypoint is reached
+        path, index = courier.path, courier.target_index
+        if path and index < len(path):
+            path_color = GREEN if not courier.has_pickup else "#FFD700"
+            self.renderer.update("path_head", (cx, cy) + layout.to_canvas(*path[index]), fill=path_color)
+            if index + 1 < len(path):
+                self.renderer.update_keyed(
+                    "path_rest", (id(path), index),
+                    lambda: [c for point in path[index:] for c in layout.to_canvas(*point)],
+                    fill=path_color,
+                )
             else:
-                # Smooth movement with smaller steps
-                direction_x = dx / distance
-                direction_y = dy / distance
-                new_x = self.current_pos[0] + direction_x * self.speed
-                new_y = self.current_pos[1] + direction_y * self.speed
-                self.current_pos = (new_x, new_y)
-                self.angle = math.atan2(-direction_y, direction_x)
-            
-            # Update grid position
-            self.x, self.y = int(round(self.current_pos[0])), int(round(self.current_pos[1]))
+                self.renderer.hide("path_rest")
         else:
-            self.moving = False
+            self.renderer.hide("path_head")
+            self.renderer.hide("path_rest")
+
+        # Fleet couriers, one batch of polygon updates
+        if fleet is not None:
+            self.fleet_sprites.draw(layout, fleet, length // 2,
+                                    below=self.renderer.items["legend_box"])
+
+        self.renderer.legend("legend", "legend_box", legend_text)
+
+        # Performance overlay, to the right of the legend box
+        if instrument.enabled:
+            legend_right = self.renderer.last["legend_box"][0][2] if self.renderer.last.get("legend_box") else 0
+            self.renderer.legend("perf", "perf_box", instrument.overlay_text(), x=legend_right + 8)
+        else:
+            self.renderer.hide("perf")
+            self.renderer.hide("perf_box")
 
 class App:
     def __init__(self, root):
@@ -199,15 +207,53 @@ class App:
         self.speed_scale.set(3)  # Lower default speed
         self.speed_scale.pack(side=tk.LEFT, padx=5, pady=5)
 
-        self.grid = []
+        # Fleet mode: many extra couriers on their own pickup -> delivery trips
+        self.fleet_btn = tk.Button(self.controls_frame, text="Armada", command=self.start_fleet, state=tk.DISABLED)
+        self.fleet_btn.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Planner engine: plain A*, Jump Point Search (JPS+) or hierarchical (HPA*)
+        self.planner = tk.StringVar(value=PLANNERS[0])
+        self.planner_menu = tk.OptionMenu(self.controls_frame, self.planner, *PLANNERS)
+        self.planner_menu.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Any-angle routes: keep only the waypoints where the courier has to turn
+        self.any_angle = tk.BooleanVar(value=False)
+        self.any_angle_check = tk.Checkbutton(self.controls_frame, text="Jalur Lurus", variable=self.any_angle,
+                                              command=self.on_planner_changed)
+        self.any_angle_check.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Performance overlay next to the legend; records can be saved as JSON lines
+        self.show_stats = tk.BooleanVar(value=False)
+        self.stats_check = tk.Checkbutton(self.controls_frame, text="Statistik", variable=self.show_stats,
+                                          command=self.toggle_stats)
+        self.stats_check.pack(side=tk.LEFT, padx=5, pady=5)
+        self.export_btn = tk.Button(self.controls_frame, text="Export Statistik", command=self.export_stats)
+        self.export_btn.pack(side=tk.LEFT, padx=5, pady=5)
+
+        # Grid, planners and caches; searches run on the Router in a worker pool
+        self.router = Router(self.planner.get())
+        self.planner.trace_add("write", lambda *args: self.on_planner_changed())
+        self.planner_service = PlanningService(root)
+        self.goal_leg = None  # ((start, goal, version), path) of the pickup->goal leg
+        self.waiting_for_goal = None  # key of the goal leg the courier is waiting for
+
         self.start = (0, 0)
         self.pickup = (0, 0)  # Bendera kuning - pickup point
         self.goal = (0, 0)    # Bendera merah - delivery point
         self.courier = Courier(0, 0)
-        self.map_image = None
-        self.map_photo = None
-
-        self.root.bind("<Configure>", lambda e: self.update())
+        self.map_image = None  # Shown instead of the grid when a map is loaded
+        self.view = MapView(self.canvas)
+        self.fleet = None  # fleet.Fleet of the fleet mode, moved every tick
+        self.fleet_legs = None  # (pickup leg, delivery leg) per fleet courier
+        self.fleet_delivered = 0
+        self.fleet_tick_ms = 0.0  # Cost of the last fleet tick
+
+        # Resizes only invalidate the frame; the courier moves on its own clock
+        self.frames = FrameScheduler(root, self.render_frame, self.step, FRAME_MS)
+        self.last_frame = None  # perf_counter of the previous measured frame
+        self.clock = SimClock(TICK_MS)
+        self.root.bind("<Configure>", lambda e: self.frames.invalidate())
+        self.canvas.bind("<Button-1>", self.on_canvas_click)
         self.root.minsize(500, 350)
 
         # Show initial message
@@ -226,159 +272,298 @@ class App:
         self.courier.speed = float(value) / 20  # More granular speed control
 
     def draw_grid(self):
-        self.canvas.delete("all")
-        canvas_w = self.canvas.winfo_width()
-        canvas_h = self.canvas.winfo_height()
-        
-        if not self.grid:  # If no map loaded
+        if self.router.flat_grid is None:  # If no map loaded
             self.show_initial_message()
+            self.view.renderer.invalidate()
             return
-            
-        if self.map_photo:
-            # Draw loaded map
-            self.canvas.create_image(
-                (canvas_w - self.map_photo.width()) // 2,
-                (canvas_h - self.map_photo.height()) // 2,
-                anchor=tk.NW, image=self.map_photo
-            )
+
+        # Legend
+        status = "Mencari Pickup" if not self.courier.has_pickup else "Mengirim ke Tujuan"
+        legend_text = f"Map size: {self.grid_width * TILE_SIZE} px x {self.grid_height * TILE_SIZE} px | Status: {status}"
+        if self.fleet is not None:
+            legend_text += (f"\nArmada: {len(self.fleet)} kurir, {self.fleet_delivered} terkirim"
+                            f" | Tick: {self.fleet_tick_ms:.2f} ms")
+        if self.router.replan_stats is not None:
+            legend_text += f" | Replan D* Lite: {self.router.replan_stats['speedup']:.1f}x vs A*"
+        if self.router.hpa_stats is not None and self.router.planner_name == "HPA*":
+            legend_text += f" | HPA*: maks {self.router.hpa_stats['bound_ratio']:.2f}x rute optimal"
+        if self.router.route_report is not None:
+            report = self.router.route_report
+            legend_text += (f"\nWaypoint: {report['waypoints']} -> {report['any_angle_waypoints']}"
+                            f" | Panjang: {report['length']:.1f} -> {report['any_angle_length']:.1f}")
+
+        alpha = self.clock.alpha() if self.courier.moving else 1.0
+        self.view.draw(self.router, self.map_image, self.pickup, self.goal, self.courier, alpha,
+                       legend_text, self.fleet)
+
+    def render_frame(self):
+        """Frame callback: draw, and record frame stats while instrumentation is on"""
+        if not instrument.enabled:
+            self.draw_grid()
+            return
+        began = time.perf_counter()
+        self.draw_grid()
+        now = time.perf_counter()
+        interval = (began - self.last_frame) * 1000 if self.last_frame is not None else 0.0
+        self.last_frame = now
+        instrument.record("frame", draw_ms=(now - began) * 1000, interval_ms=interval,
+                          items=len(self.canvas.find_all()), dropped_ticks=self.clock.dropped)
+
+    def toggle_stats(self):
+        if self.show_stats.get():
+            instrument.enable()
         else:
-            # Draw default grid
-            map_w = self.grid_width * TILE_SIZE
-            map_h = self.grid_height * TILE_SIZE
-            offset_x = max((canvas_w - map_w) // 2, 0)
-            offset_y = max((canvas_h - map_h) // 2, 0)
+            instrument.disable()
+        self.last_frame = None
+        self.frames.invalidate()
+
+    def export_stats(self):
+        filepath = filedialog.asksaveasfilename(defaultextension=".jsonl",
+                                                filetypes=[("JSON Lines", "*.jsonl")])
+        if filepath:
+            try:
+                count = instrument.export(filepath)
+                messagebox.showinfo("Info", f"{count} catatan statistik disimpan.")
+            except OSError as e:
+                messagebox.showerror("Error", str(e))
 
-            # Draw walkable area as plain white background
-            self.canvas.create_rectangle(
-                offset_x, 
-                offset_y,
-                offset_x + map_w,
-                offset_y + map_h,
-                fill=WHITE, outline=WHITE
-            )
-
-            # Draw obstacles as gray blocks without grid lines
-            for y in range(self.grid_height):
-                for x in range(self.grid_width):
-                    if self.grid[y][x] == 1:  # obstacle
-                        self.canvas.create_rectangle(
-                            offset_x + x*TILE_SIZE,
-                            offset_y + y*TILE_SIZE,
-                            offset_x + (x+1)*TILE_SIZE,
-                            offset_y + (y+1)*TILE_SIZE,
-                            fill=GRAY, outline=GRAY
-                        )
-
-        # Draw start, pickup, goal, and courier
-        canvas_w = self.canvas.winfo_width()
-        canvas_h = self.canvas.winfo_height()
+    def update(self):
+        """Request a redraw, and run the animation loop while the courier moves"""
+        if self.courier.moving or self.fleet_moving():
+            if not self.frames.animating:
+                self.clock.reset()  # don't replay the time spent standing still
+            self.frames.start()
+        else:
+            self.frames.invalidate()
+
+    def step(self):
+        """Run the simulation ticks due by now; True while the courier or the fleet keeps moving"""
+        for _ in range(self.clock.advance()):
+            if self.fleet is not None:
+                self.tick_fleet()
+            if not self.courier.moving:
+                continue
+            path = self.courier.path
+            self.tick()
+            if self.courier.path is not path:
+                break  # a new leg started; it runs from a fresh clock
+        return self.courier.moving or self.fleet_moving()
+
+    def fleet_moving(self):
+        return self.fleet is not None and bool(self.fleet.moving[:len(self.fleet)].any())
+
+    def tick_fleet(self):
+        """Advance every fleet courier one timestep in one vectorised step"""
+        began = time.perf_counter()
+        self.fleet_delivered += len(self.fleet.advance(self.fleet_legs))
+        self.fleet_tick_ms = (time.perf_counter() - began) * 1000
+        if instrument.enabled:
+            instrument.record("fleet_tick", couriers=len(self.fleet), ms=self.fleet_tick_ms)
+
+    def start_fleet(self):
+        """Send FLEET_SIZE couriers on random pickup -> delivery trips; both
+        legs of all of them are planned as one job in the planner pool"""
+        if self.router.flat_grid is None:
+            return
+        try:
+            stops = [self.router.components.random_positions(3) for _ in range(FLEET_SIZE)]
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.planner_service.submit("fleet", plan_legs, self.router.find_path, stops,
+                                    callback=lambda legs: self.on_fleet_legs(stops, legs),
+                                    on_error=self.on_planning_error, speculative=True)
+
+    def on_fleet_legs(self, stops, legs):
+        self.fleet = dispatch(stops, legs)
+        self.fleet_legs = legs
+        self.fleet_delivered = 0
+        self.update()
+
+    def tick(self):
+        """Advance the simulation one fixed timestep"""
+        self.courier.move()
         
-        if self.map_photo:
-            offset_x = (canvas_w - self.map_photo.width()) // 2
-            offset_y = (canvas_h - self.map_photo.height()) // 2
-            scale_x = self.map_photo.width() / (self.grid_width * TILE_SIZE)
-            scale_y = self.map_photo.height() / (self.grid_height * TILE_SIZE)
+        # Check if courier reached pickup point
+        courier_pos = (int(round(self.courier.current_pos[0])), int(round(self.courier.current_pos[1])))
+        
+        # If courier reached pickup and doesn't have pickup yet
+        if not self.courier.has_pickup and courier_pos == self.pickup and not self.courier.moving:
+            self.courier.has_pickup = True
+            messagebox.showinfo("Info", "Pickup berhasil! Sekarang menuju ke tujuan.")
+            # Path to goal: usually already planned while driving to the pickup
+            self.request_goal_leg(courier_pos)
+        
+        # If courier reached goal with pickup
+        elif self.courier.has_pickup and courier_pos == self.goal and not self.courier.moving:
+            messagebox.showinfo("Success", "Delivery berhasil diselesaikan!")
+            self.courier.moving = False
+
+    def start_goal_leg(self, path):
+        if path:
+            self.courier.path = path
+            self.courier.moving = True
+            self.courier.target_index = 0
+            self.courier.current_target = "goal"
+            self.courier.last_waypoint = self.courier_cell()
+            self.check_closures()
+            self.prepare_repairs(self.goal)
+            self.update()
         else:
-            map_w = self.grid_width * TILE_SIZE
-            map_h = self.grid_height * TILE_SIZE
-            offset_x = max((canvas_w - map_w) // 2, 0)
-            offset_y = max((canvas_h - map_h) // 2, 0)
-            scale_x = scale_y = 1
+            messagebox.showerror("Error", "Tidak ada jalur dari pickup ke tujuan!")
 
+    def request_goal_leg(self, start):
+        """Use the speculative pickup->goal path if it matches, else plan it now"""
+        key = (start, self.goal, self.router.flat_grid.version)
+        if self.goal_leg is not None and self.goal_leg[0] == key:
+            self.start_goal_leg(self.goal_leg[1])
+            return
+        self.waiting_for_goal = key
+        if self.planner_service.busy("goal"):
+            self.planner_service.promote("goal")
+        else:
+            self.submit_goal_leg(start)
+
+    def submit_goal_leg(self, start, speculative=False):
+        key = (start, self.goal, self.router.flat_grid.version)
+        self.goal_leg = None
+        self.planner_service.submit("goal", self.router.find_path, start, self.goal,
+                                    callback=lambda path: self.on_goal_leg(key, path),
+                                    on_error=self.on_planning_error, speculative=speculative)
+
+    def on_goal_leg(self, key, path):
+        self.goal_leg = (key, path)
+        if self.waiting_for_goal is None:
+            return
+        if self.waiting_for_goal == key:
+            self.waiting_for_goal = None
+            self.start_goal_leg(path)
+        else:
+            # Flags moved since the speculative request was made
+            self.submit_goal_leg(self.waiting_for_goal[0])
 
+    def on_pickup_leg(self, path):
+        if path:
+            self.courier.path = path
+            self.courier.moving = True
+            self.courier.target_index = 0
+            self.courier.current_target = "pickup"
+            self.courier.last_waypoint = self.courier_cell()
+            self.check_closures()
+            self.prepare_repairs(self.pickup)
+            self.update()
+        else:
+            self.planner_service.cancel("goal")
+            messagebox.showinfo("Info", "Tidak ada jalur dari posisi saat ini ke pickup point.")
 
-        # Pickup point - Yellow flag
-        px, py = self.pickup
-        cx = offset_x + px*TILE_SIZE*scale_x + TILE_SIZE*scale_x//2
-        cy = offset_y + py*TILE_SIZE*scale_y + TILE_SIZE*scale_y//2
-        self.canvas.create_line(cx, cy - 10*scale_y, cx, cy + 10*scale_y, fill=BLACK, width=3)
-        self.canvas.create_polygon([(cx, cy), (cx, cy - 10*scale_y), (cx + 10*scale_x, cy)], fill=YELLOW, outline=BLACK)
+    def on_planning_error(self, error):
+        messagebox.showerror("Error", str(error))
 
-        # Goal - Red flag
-        gx, gy = self.goal
-        cx = offset_x + gx*TILE_SIZE*scale_x + TILE_SIZE*scale_x//2
-        cy = offset_y + gy*TILE_SIZE*scale_y + TILE_SIZE*scale_y//2
-        self.canvas.create_line(cx, cy - 10*scale_y, cx, cy + 10*scale_y, fill=BLACK, width=3)
-        self.canvas.create_polygon([(cx, cy), (cx, cy - 10*scale_y), (cx + 10*scale_x, cy)], fill=RED, outline=BLACK)
+    def cancel_planning(self):
+        """Drop pending and speculative routes (positions or map changed)"""
+        self.planner_service.cancel()
+        self.goal_leg = None
+        self.waiting_for_goal = None
 
-        # Courier - Green triangle, changes color if has pickup
-        courier_color = GREEN if not self.courier.has_pickup else "#FFD700"  # Gold color when has pickup
-        cx = offset_x + self.courier.current_pos[0]*TILE_SIZE*scale_x + TILE_SIZE*scale_x//2
-        cy = offset_y + self.courier.current_pos[1]*TILE_SIZE*scale_y + TILE_SIZE*scale_y//2
-        length = TILE_SIZE * max(scale_x, scale_y) // 1
-        angle = self.courier.angle
-        points = [
-            (cx + length * math.cos(angle), cy - length * math.sin(angle)),
-            (cx + length * math.cos(angle + 2.3), cy - length * math.sin(angle + 2.3)),
-            (cx + length * math.cos(angle - 2.3), cy - length * math.sin(angle - 2.3)),
-        ]
-        self.canvas.create_polygon(points, fill=courier_color, outline=BLACK)
-
-        # Draw path if it exists
-        if self.courier.path:
-            path_points = []
-            for point in [self.courier.current_pos] + self.courier.path[self.courier.target_index:]:
-                px, py = point
-                cx = offset_x + px*TILE_SIZE*scale_x + TILE_SIZE*scale_x//2
-                cy = offset_y + py*TILE_SIZE*scale_y + TILE_SIZE*scale_y//2
-                path_points.append((cx, cy))
-            
-            if len(path_points) > 1:
-                path_color = GREEN if not self.courier.has_pickup else "#FFD700"
-                self.canvas.create_line(path_points, fill=path_color, width=2, dash=(4, 2))
+    def on_canvas_click(self, event):
+        """Click a road cell to close it; click a closed cell to reopen it"""
+        if self.router.flat_grid is None or self.view.layout is None:
+            return
+        cell = self.view.layout.to_grid(event.x, event.y)
+        if cell in self.router.closures:
+            self.unblock_cell(cell)
+        else:
+            self.block_cell(cell)
+
+    def block_cell(self, cell):
+        """Close a walkable cell at runtime; False if it is not free to close"""
+        courier = self.courier
+        busy = {self.start, self.pickup, self.goal, (courier.x, courier.y)}
+        if courier.path and 0 < courier.target_index <= len(courier.path):
+            busy.add(courier.path[courier.target_index - 1])  # the cell it is leaving
+        if cell in busy:
+            return False
+        return self.set_closed(cell, True)
 
-        # Legend
-        if self.grid:  # Only show legend if map is loaded
-            status = "Mencari Pickup" if not self.courier.has_pickup else "Mengirim ke Tujuan"
-            legend_text = f"Map size: {self.grid_width * TILE_SIZE} px x {self.grid_height * TILE_SIZE} px | Status: {status}"
-            padding = 4
-            font = ("Arial", 10, "bold")
-            text_id = self.canvas.create_text(padding, padding, anchor="nw", text=legend_text, font=font)
-            bbox = self.canvas.bbox(text_id)
-            if bbox:
-                x1, y1, x2, y2 = bbox
-                self.canvas.create_rectangle(
-                    x1 - padding, y1 - padding,
-                    x2 + padding, y2 + padding,
-                    fill="white", outline="black", stipple="gray50"
-                )
-                self.canvas.lift(text_id)
+    def unblock_cell(self, cell):
+        """Reopen a cell closed with block_cell"""
+        if cell not in self.router.closures:
+            return False
+        return self.set_closed(cell, False)
 
-    def update(self):
-        self.draw_grid()
-        
+    def set_closed(self, cell, closed):
+        if not self.router.set_closed(cell, closed):
+            return False
         if self.courier.moving:
-            self.courier.move()
-            
-            # Check if courier reached pickup point
-            courier_pos = (int(round(self.courier.current_pos[0])), int(round(self.courier.current_pos[1])))
-            
-            # If courier reached pickup and doesn't have pickup yet
-            if not self.courier.has_pickup and courier_pos == self.pickup and not self.courier.moving:
-                self.courier.has_pickup = True
-                messagebox.showinfo("Info", "Pickup berhasil! Sekarang menuju ke tujuan.")
-                # Calculate path to goal
-                self.courier.path = a_star(self.grid, courier_pos, self.goal)
-                if self.courier.path:
-                    self.courier.moving = True
-                    self.courier.target_index = 0
-                    self.courier.current_target = "goal"
-                else:
-                    messagebox.showerror("Error", "Tidak ada jalur dari pickup ke tujuan!")
-            
-            # If courier reached goal with pickup
-            elif self.courier.has_pickup and courier_pos == self.goal and not self.courier.moving:
-                messagebox.showinfo("Success", "Delivery berhasil diselesaikan!")
-                self.courier.moving = False
-            
-            self.root.after(16, self.update)  # 60 FPS for smoother animation
+            self.repair_route()
+        self.update()
+        return True
+
+    def check_closures(self):
+        """Repair a new leg that was planned before the latest closures"""
+        path = self.courier.path
+        if path and not any_angle.lines_of_sight(self.router.flat_grid, [self.courier.last_waypoint] + path[:-1], path).all():
+            self.repair_route()
+
+    def prepare_repairs(self, target):
+        """Search the D* Lite state of the new leg in the background, so that
+        closing a road on the way only costs the repair"""
+        self.planner_service.submit("prepare_replan", self.router.prepare_replan, self.courier_cell(), target,
+                                    callback=lambda _: None, on_error=self.on_planning_error, speculative=True)
+
+    def courier_cell(self):
+        return (self.courier.x, self.courier.y)
+
+    def repair_route(self):
+        """Reroute the moving courier around changed cells with D* Lite"""
+        courier = self.courier
+        path, index = courier.path, courier.target_index
+        target = self.pickup if courier.current_target == "pickup" else self.goal
+        # Keep heading for the next waypoint unless the segment to it was just
+        # closed; then wait at the centre of the current cell for the new route
+        if index < len(path) and any_angle.line_of_sight(self.router.flat_grid, courier.last_waypoint, path[index]):
+            anchor = path[index]
+        else:
+            anchor = self.courier_cell()
+            courier.path = [anchor]
+            courier.target_index = 0
+            courier.last_waypoint = anchor
+        leg = (courier, courier.current_target)
+        self.planner_service.submit("repair", self.router.replan, anchor, target,
+                                    callback=lambda rest: self.on_repair(leg, anchor, rest),
+                                    on_error=self.on_planning_error)
+
+    def on_repair(self, leg, anchor, rest):
+        courier = self.courier
+        target = self.pickup if courier.current_target == "pickup" else self.goal
+        if (courier, courier.current_target) != leg:
+            return
+        if not courier.moving and (self.courier_cell() != anchor or anchor == target):
+            return  # the leg ended meanwhile (not just the wait at anchor)
+        courier.moving = True
+        if not rest and anchor != target:
+            courier.path = []
+            courier.moving = False
+            messagebox.showinfo("Info", "Jalan tertutup: tidak ada jalur lain ke tujuan.")
+        else:
+            courier.path = [anchor] + rest
+            courier.target_index = 0
+            if instrument.enabled and self.router.repair_stats is not None:
+                # The D* Lite vs full A* metric; waits for the other requests
+                self.planner_service.submit("replan_metric", self.router.measure_replan,
+                                            anchor, target, self.router.repair_stats,
+                                            callback=lambda stats: self.update(),
+                                            on_error=self.on_planning_error, speculative=True)
+        self.update()
 
     def random_courier_position(self):
         """Set random position for courier only"""
-        if not self.grid:
+        if self.router.flat_grid is None:
             return
+        self.cancel_planning()
             
-        new_position = random_position(self.grid)
+        # Stay in the pickup's area so the courier can always reach it
+        new_position = random_position(self.router.grid, self.router.components, self.router.components.label(self.pickup))
         self.start = new_position
         self.courier = Courier(*new_position)
         self.courier.has_pickup = False
@@ -386,42 +571,44 @@ class App:
 
     def random_destinations(self):
         """Set random positions for both pickup (yellow) and goal (red) flags"""
-        if not self.grid:
+        if self.router.flat_grid is None:
             return
+        self.cancel_planning()
             
-        # Generate two different random positions
-        self.pickup = random_position(self.grid)
-        
-        # Make sure goal is different from pickup
-        while True:
-            self.goal = random_position(self.grid)
-            if self.goal != self.pickup:
-                break
+        # Two different positions reachable from the courier
+        component = self.router.components.label((self.courier.x, self.courier.y))
+        try:
+            self.pickup, self.goal = self.router.components.random_positions(2, component)
+        except ValueError:
+            self.pickup, self.goal = self.router.components.random_positions(2)
                 
         self.update()
 
+    def on_planner_changed(self):
+        # Tk variables must only be read on the Tk thread, so workers use a copy
+        self.router.set_planner(self.planner.get(), self.any_angle.get())
+
     def play(self):
-        if not self.grid:
+        if self.router.flat_grid is None:
             return
         
         # Reset courier pickup status
         self.courier.has_pickup = False
         current_pos = (int(self.courier.current_pos[0]), int(self.courier.current_pos[1]))
+        self.cancel_planning()
         
-        # First, find path to pickup point
-        self.courier.path = a_star(self.grid, current_pos, self.pickup)
-        if self.courier.path:
-            self.courier.moving = True
-            self.courier.target_index = 0
-            self.courier.current_target = "pickup"
-            self.update()
-        else:
-            messagebox.showinfo("Info", "Tidak ada jalur dari posisi saat ini ke pickup point.")
+        # First, find path to pickup point; the pickup->goal leg is planned
+        # speculatively in the background once that one is done, while the
+        # courier drives there
+        self.planner_service.submit("pickup", self.router.find_path, current_pos, self.pickup,
+                                    callback=self.on_pickup_leg, on_error=self.on_planning_error)
+        self.submit_goal_leg(self.pickup, speculative=True)
 
     def reset_position(self):
-        if not self.grid:
+        if self.router.flat_grid is None:
             return
             
+        self.cancel_planning()
         self.courier = Courier(*self.start)
         self.courier.moving = False
         self.courier.has_pickup = False
@@ -431,56 +618,39 @@ class App:
         try:
             filepath = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg")])
             if filepath:
-                img = Image.open(filepath).convert('RGB')
-                w, h = img.size
-                
-                # Save original image for display
-                self.map_image = img
-                self.map_photo = ImageTk.PhotoImage(self.map_image)
+                began = time.perf_counter()
+                with Image.open(filepath) as img:
+                    w, h = img.size
+                    streamed = w * h > strip_loader.STREAM_MIN_PIXELS
+                    if not streamed:
+                        # Save original image for display
+                        self.map_image = img.convert('RGB')
+                if streamed:
+                    # Too big to decode at once: show a smaller copy built strip by strip
+                    self.map_image = strip_loader.preview(filepath)
                 
                 # Calculate grid size based on image dimensions
                 self.grid_width = w // TILE_SIZE
                 self.grid_height = h // TILE_SIZE
                 
-                # Create walkability grid with improved detection
-                grid = []
-                for y in range(self.grid_height):
-                    row = []
-                    for x in range(self.grid_width):
-                        # Sample multiple pixels within each tile for better accuracy
-                        walkable_pixels = 0
-                        total_pixels = 0
-                        
-                        for dy in range(TILE_SIZE):
-                            for dx in range(TILE_SIZE):
-                                pixel_x = x * TILE_SIZE + dx
-                                pixel_y = y * TILE_SIZE + dy
-                                
-                                if pixel_x < w and pixel_y < h:
-                                    r, g, b = self.map_image.getpixel((pixel_x, pixel_y))
-                                    total_pixels += 1
-                                    
-                                    # Check if in gray range (90-150) - walkable
-                                    if 90 <= r <= g <= 150 and 90 <= g <= 150 and 90 <= b <= 150:
-                                        walkable_pixels += 1
-                        
-                        # If more than 30% of pixels in tile are walkable, consider tile walkable
-                        if total_pixels > 0 and walkable_pixels / total_pixels > 0.2:
-                            row.append(0)  # Walkable
-                        else:
-                            row.append(1)  # Obstacle
-                            
-                    grid.append(row)
+                # Create walkability grid: a tile is walkable when more than
+                # 20% of its pixels fall in the gray road range (cached on disk),
+                # plus the road quality for the Terrain planner, from the same pixels
+                decoded = time.perf_counter()
+                grid, costs = load_map(filepath, TILE_SIZE, image=None if streamed else self.map_image)
+                classified = time.perf_counter()
                 
-                self.grid = grid
-                self.start = random_position(self.grid)
+                self.cancel_planning()
+                self.fleet = None
+                self.router.set_grid(grid, costs)
+                if instrument.enabled:
+                    instrument.record("map_load", file=filepath, width=self.grid_width, height=self.grid_height,
+                                      decode_ms=(decoded - began) * 1000,
+                                      classify_ms=(classified - decoded) * 1000,
+                                      index_ms=(time.perf_counter() - classified) * 1000)
                 
-                # Generate different positions for pickup and goal
-                self.pickup = random_position(self.grid)
-                while True:
-                    self.goal = random_position(self.grid)
-                    if self.goal != self.pickup:
-                        break
+                # Start, pickup and goal: different cells in one connected area
+                self.start, self.pickup, self.goal = self.router.components.random_positions(3)
                 
                 self.courier = Courier(*self.start)
                 
@@ -490,6 +660,7 @@ class App:
                 self.play_btn.config(state=tk.NORMAL)
                 self.reset_btn.config(state=tk.NORMAL)
                 self.speed_scale.config(state=tk.NORMAL)
+                self.fleet_btn.config(state=tk.NORMAL)
                 
                 self.update()
         except Exception as e:
@@ -0,0 +1,137 @@
+"""Any-angle routes: prune grid waypoints that are in line of sight.
+
+Grid planners return one waypoint per cell. smooth_path() keeps only
+the waypoints where the route has to turn: from each kept waypoint it
+jumps to the farthest later waypoint that is in line of sight. Those
+checks use the scalar line_of_sight(): it stops at the first blocked
+cell, and a window of short segments is about ten times faster that way
+than as one array batch. lines_of_sight() runs many Bresenham walks in
+lockstep as array operations; it pays off for many segments at once,
+such as validating a whole route after a road closure.
+
+Sight lines walk the same Bresenham cells as Final.line_of_sight. With
+corners=True a diagonal step also needs both side cells to be free (the
+no-corner-cutting rule of a_star), which makes the checked cells cover
+every cell the straight segment between the two cell centres touches,
+so a courier moving along it never crosses an obstacle.
+"""
+import math
+import numpy as np
+
+WINDOW = 64  # waypoints looked ahead from each kept waypoint
+
+def line_of_sight(flat, start, end, corners=True):
+    """True if the straight segment from start to end only crosses walkable cells"""
+    x0, y0 = start
+    x1, y1 = end
+    if not (flat.in_bounds(x0, y0) and flat.in_bounds(x1, y1)):
+        return False
+    walk = flat.walk
+    stride = flat.stride
+    dx = abs(x1 - x0)
+    dy = abs(y1 - y0)
+    sx = stride if x0 < x1 else -stride
+    sy = 1 if y0 < y1 else -1
+    err = dx - dy
+    node = flat.node_id(x0, y0)
+    end_node = flat.node_id(x1, y1)
+    while True:
+        if not walk[node]:
+            return False
+        if node == end_node:
+            return True
+        e2 = 2 * err
+        step_x = e2 > -dy
+        step_y = e2 < dx
+        if step_x and step_y and corners and not (walk[node + sx] and walk[node + sy]):
+            return False
+        if step_x:
+            err -= dy
+            node += sx
+        if step_y:
+            err += dx
+            node += sy
+
+def lines_of_sight(flat, starts, ends, corners=True):
+    """line_of_sight for many (start, end) pairs at once, as a bool array.
+
+    All walks advance together one Bresenham step per round; walks that
+    end or hit an obstacle drop out, so later rounds only touch the
+    segments still in progress.
+    """
+    starts = np.asarray(starts, dtype=np.int64).reshape(-1, 2)
+    ends = np.asarray(ends, dtype=np.int64).reshape(-1, 2)
+    walk = np.frombuffer(flat.walk, dtype=np.bool_)  # 0/1 bytes: a view, no copy
+    stride = flat.stride
+    x0, y0 = starts[:, 0], starts[:, 1]
+    x1, y1 = ends[:, 0], ends[:, 1]
+    clear = (np.minimum(x0, x1) >= 0) & (np.maximum(x0, x1) < flat.width) \
+        & (np.minimum(y0, y1) >= 0) & (np.maximum(y0, y1) < flat.height)
+    idx = np.flatnonzero(clear)
+    x0, y0, x1, y1 = x0[idx], y0[idx], x1[idx], y1[idx]
+    node = (x0 + 1) * stride + y0 + 1
+    dx = np.abs(x1 - x0)
+    dy = np.abs(y1 - y0)
+    sx = np.where(x0 < x1, stride, -stride)
+    sy = np.where(y0 < y1, 1, -1)
+    err = dx - dy
+    remaining = np.maximum(dx, dy)  # a walk takes max(dx, dy) steps
+    while len(idx):
+        ok = walk[node]
+        done = remaining == 0
+        if done.any():
+            clear[idx[done]] = ok[done]
+            keep = ~done
+            idx, node, dx, dy, sx, sy, err, remaining, ok = (
+                a[keep] for a in (idx, node, dx, dy, sx, sy, err, remaining, ok))
+        e2 = 2 * err
+        step_x = e2 > -dy
+        step_y = e2 < dx
+        if corners:
+            ok &= ~(step_x & step_y) | (walk[node + sx] & walk[node + sy])
+        if not ok.all():
+            clear[idx[~ok]] = False
+            idx, node, dx, dy, sx, sy, err, remaining, step_x, step_y = (
+                a[ok] for a in (idx, node, dx, dy, sx, sy, err, remaining, step_x, step_y))
+        err = err - dy * step_x + dx * step_y
+        node = node + sx * step_x + sy * step_y
+        remaining = remaining - 1
+    return clear
+
+def smooth_path(flat, start, path, window=WINDOW):
+    """Waypoints of path (start excluded, as from a_star) with straight stretches collapsed"""
+    if len(path) < 2:
+        return list(path)
+    points = [start] + list(path)
+    result = []
+    i = 0
+    last = len(points) - 1
+    while i < last:
+        # Farthest visible waypoint in the window; if that is the window
+        # end, keep going while the next one is visible too
+        best = min(i + window, last)
+        while best > i + 1 and not line_of_sight(flat, points[i], points[best]):
+            best -= 1
+        if best == i + window:
+            while best < last and line_of_sight(flat, points[i], points[best + 1]):
+                best += 1
+        result.append(points[best])
+        i = best
+    return result
+
+def path_length(start, path):
+    length = 0.0
+    x, y = start
+    for nx, ny in path:
+        length += math.hypot(nx - x, ny - y)
+        x, y = nx, ny
+    return length
+
+def route_report(start, grid_path, any_angle_path):
+    """Waypoint counts and lengths of a grid route and its any-angle version"""
+    return {
+        "waypoints": len(grid_path),
+        "any_angle_waypoints": len(any_angle_path),
+        "length": path_length(start, grid_path),
+        "any_angle_length": path_length(start, any_angle_path),
+    }
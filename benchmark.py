@@ -0,0 +1,597 @@
+"""Reproducible benchmark of map ingestion, path search and frame drawing.
+
+Every image in map/ is classified like Final.App.load_map (without the
+grid cache), then a seeded batch of connected start/goal pairs is run
+through the 4- and 8-connected a_star (the first ones also through the
+PriorityQueue search a_star replaced, for its speedup), JPS+ and the
+weighted terrain.a_star (and the 8-connected routes through
+any_angle.smooth_path); HPA* routes are timed against the 8-connected
+a_star, with their suboptimality bound; ALT (landmark) A* and JPS+ report
+their expansions against octile A*; flow fields
+are built for some of the goals and checked against optimal A*, D* Lite
+repairs a route closed halfway and is timed against a full A*, and
+Final.MapView draws frames over the map image (and over the grid raster)
+on an OffscreenCanvas, so no display is needed; so does a fleet of
+FLEET_COURIERS couriers. The import time of
+core is checked against its fixed budget, and neither core nor the
+headless simulate.py may load a GUI module. Results are JSON; compare()
+flags metrics that got worse than a stored baseline.
+
+    python benchmark.py --out results.json
+    python benchmark.py --baseline results.json   # exit status 1 on regressions
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from queue import PriorityQueue
+
+import numpy as np
+from PIL import Image
+
+import map_loader
+import grid_search
+import any_angle
+import core
+import dstar_lite
+import jps
+import landmarks
+import terrain
+from components import ComponentIndex
+from dstar_lite import DStarLite
+from fleet import dispatch
+from flow_field import FlowField
+from hpa import HierarchicalGrid
+from landmarks import octile_heuristic
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MAP_DIR = os.path.join(ROOT, "map")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+QUERIES = 200
+FRAMES = 120
+FIELDS = 10  # flow fields built per map (goals of the first query pairs)
+REPAIRS = 20  # routes closed halfway and repaired with D* Lite per map
+REFERENCE_QUERIES = 50  # queries also run through reference_a_star per map
+FLEET_COURIERS = 1000  # couriers of the fleet drawn by bench_draw_fleet
+REPEATS = 5  # one-off timings (ingestion, first frame) take the median of this many runs
+SEED = 1
+TOLERANCE = 0.5  # allowed slowdown before a timing counts as a regression
+COUNT_TOLERANCE = 0.05  # same for deterministic counts (expansions, canvas calls, bytes)
+
+# Must not be loaded by `import core` or `import simulate` (headless services and workers)
+GUI_MODULES = ("tkinter", "PIL")
+
+# Bump when the meaning of a metric changes; baselines of another version are not compared
+FORMAT_VERSION = 2
+
+class OffscreenCanvas:
+    """Stand-in for tk.Canvas that keeps items in a dict, for drawing without a display"""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.items = {}  # id -> [kind, coords, options]
+        self.next_id = 1
+        self.calls = 0  # Tk calls a real canvas would have received
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def make_photo(self, image):
+        return image.copy()
+
+    def _create(self, kind, coords, options):
+        self.calls += 1
+        item = self.next_id
+        self.next_id += 1
+        self.items[item] = [kind, coords, options]
+        return item
+
+    def create_line(self, *coords, **options):
+        return self._create("line", coords, options)
+
+    def create_polygon(self, *coords, **options):
+        return self._create("polygon", coords, options)
+
+    def create_rectangle(self, *coords, **options):
+        return self._create("rectangle", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self._create("text", coords, options)
+
+    def create_image(self, *coords, **options):
+        return self._create("image", coords, options)
+
+    def coords(self, item, *coords):
+        self.calls += 1
+        self.items[item][1] = coords
+
+    def itemconfig(self, item, **options):
+        self.calls += 1
+        self.items[item][2].update(options)
+
+    def tag_lower(self, item, below):
+        self.calls += 1
+
+    def delete(self, tag):
+        self.calls += 1
+        if tag == "all":
+            self.items.clear()
+        else:
+            self.items.pop(tag, None)
+
+    def find_all(self):
+        return tuple(self.items)
+
+    def bbox(self, item):
+        # Rough text extent: 7 x 14 px per character of the default font
+        _, coords, options = self.items[item]
+        x, y = coords[:2]
+        return x, y, x + 7 * len(options.get("text", "")), y + 14
+
+def percentiles(samples):
+    """p50 / p95 of a list of seconds, in milliseconds"""
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0}
+    p50, p95 = np.percentile(np.array(samples) * 1000, [50, 95])
+    return {"p50_ms": float(p50), "p95_ms": float(p95)}
+
+def map_files(directory=MAP_DIR):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
+
+def ingest(path):
+    """Decode and classify an image the way Final.App.load_map does: (cells, cost levels)"""
+    with Image.open(path) as img:
+        pixels = map_loader.image_to_array(img)
+    return map_loader.classify_map(pixels, map_loader.TILE_SIZE)
+
+def map_image(path):
+    """The image Final.App.load_map shows for a map file"""
+    with Image.open(path) as img:
+        return img.convert("RGB")
+
+def query_pairs(flat, count, seed):
+    """Seeded start/goal pairs, each inside one connected area"""
+    components = ComponentIndex(flat)
+    rng = random.Random(seed)
+    try:
+        return [tuple(components.random_positions(2, rng=rng)) for _ in range(count)]
+    except ValueError:
+        return []
+
+def reference_a_star(grid, start, goal, diagonal=True):
+    """The PriorityQueue search of the original Final.a_star (diagonal=True)
+    and program.a_star, kept to measure grid_search.a_star against"""
+    def is_walkable(x, y):
+        return 0 <= x < len(grid[0]) and 0 <= y < len(grid) and grid[y][x] == 0
+
+    if diagonal:
+        directions = [(0, -1), (1, 0), (0, 1), (-1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+    else:
+        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    open_set = PriorityQueue()
+    open_set.put((0, start))
+    came_from = {}
+    g_score = {start: 0}
+    while not open_set.empty():
+        _, current = open_set.get()
+        if current == goal:
+            path = []
+            while current in came_from:
+                path.append(current)
+                current = came_from[current]
+            return path[::-1]
+        for dx, dy in directions:
+            neighbor = (current[0] + dx, current[1] + dy)
+            if not is_walkable(*neighbor):
+                continue
+            if dx and dy:
+                if not (is_walkable(current[0] + dx, current[1]) and is_walkable(current[0], current[1] + dy)):
+                    continue
+                move_cost = math.sqrt(2)
+            else:
+                move_cost = 1
+            tentative_g = g_score[current] + move_cost
+            if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g
+                open_set.put((tentative_g + abs(neighbor[0] - goal[0]) + abs(neighbor[1] - goal[1]), neighbor))
+    return []
+
+def bench_search(flat, pairs, diagonal, grid=None, count=REFERENCE_QUERIES):
+    """a_star on the pairs; with the list grid, the first count pairs also
+    through reference_a_star: "speedup" is the ratio of their total times,
+    "mismatches" the routes whose length differs from the reference one"""
+    times, expanded = [], []
+    stats = {}
+    for start, goal in pairs:
+        began = time.perf_counter()
+        grid_search.a_star(flat, start, goal, diagonal=diagonal, stats=stats)
+        times.append(time.perf_counter() - began)
+        expanded.append(stats["expanded"])
+    result = percentiles(times)
+    result["mean_expanded"] = float(np.mean(expanded)) if expanded else 0.0
+    if grid is not None:
+        new = old = 0.0
+        mismatches = 0
+        for start, goal in pairs[:count]:
+            began = time.perf_counter()
+            path = grid_search.a_star(flat, start, goal, diagonal=diagonal)
+            new += time.perf_counter() - began
+            began = time.perf_counter()
+            reference = reference_a_star(grid, start, goal, diagonal)
+            old += time.perf_counter() - began
+            if abs(any_angle.path_length(start, path) - any_angle.path_length(start, reference)) > 1e-6:
+                mismatches += 1
+        result["speedup"] = old / new if new else 0.0
+        result["mismatches"] = mismatches
+    return result
+
+def bench_jps(flat, pairs):
+    """JPS+ on the same pairs, with its expansions against octile A* (jps.expansion_report)"""
+    table = jps.JumpTable(flat)
+    times = []
+    for start, goal in pairs:
+        began = time.perf_counter()
+        jps.jps(flat, start, goal, table)
+        times.append(time.perf_counter() - began)
+    result = percentiles(times)
+    report = jps.expansion_report(flat, table, pairs)
+    result.update(mean_expanded=report["jps"], octile_expanded=report["octile"], ratio=report["ratio"])
+    return result
+
+def bench_alt(flat, pairs):
+    """A* with the ALT heuristic on the same pairs: table load (or build)
+    time from the grid cache, query times, and its expansions against
+    octile A* (landmarks.expansion_report)"""
+    began = time.perf_counter()
+    table = landmarks.LandmarkTable.load_or_build(flat)
+    load = time.perf_counter() - began
+    times = []
+    for start, goal in pairs:
+        began = time.perf_counter()
+        grid_search.a_star(flat, start, goal, heuristic=table.heuristic(goal))
+        times.append(time.perf_counter() - began)
+    result = percentiles(times)
+    report = landmarks.expansion_report(flat, table, pairs)
+    result.update(load_ms=load * 1000, mean_expanded=report["alt"], octile_expanded=report["octile"],
+                  ratio=report["ratio"])
+    return result
+
+def bench_hpa(flat, pairs):
+    """HPA* on the same pairs: cluster build time, query times, the speedup
+    over the 8-connected a_star on the same pairs, and the bound_ratio of
+    find_path (route cost / octile distance, an upper bound on how much
+    longer than optimal the routes are) next to the actual ratio to the
+    optimal (octile) a_star route"""
+    began = time.perf_counter()
+    hierarchy = HierarchicalGrid(flat)
+    build = time.perf_counter() - began
+    times, baseline, ratios, excess = [], [], [], []
+    stats = {}
+    for start, goal in pairs:
+        began = time.perf_counter()
+        path = hierarchy.find_path(start, goal, stats)
+        times.append(time.perf_counter() - began)
+        began = time.perf_counter()
+        grid_search.a_star(flat, start, goal, diagonal=True)
+        baseline.append(time.perf_counter() - began)
+        if path:
+            ratios.append(stats["bound_ratio"])
+            optimal = grid_search.a_star(flat, start, goal, heuristic=octile_heuristic(flat, goal).tolist())
+            excess.append(stats["cost"] / any_angle.path_length(start, optimal))
+    result = percentiles(times)
+    result["build_ms"] = build * 1000
+    result["speedup"] = sum(baseline) / sum(times) if sum(times) else 0.0
+    result["mean_bound_ratio"] = float(np.mean(ratios)) if ratios else 0.0
+    result["max_bound_ratio"] = float(np.max(ratios)) if ratios else 0.0
+    result["mean_cost_ratio"] = float(np.mean(excess)) if excess else 0.0
+    return result
+
+def bench_terrain(flat, levels, pairs):
+    """Weighted terrain search (bucket queue) on the same pairs"""
+    costs = terrain.TerrainCosts(levels)
+    times, expanded = [], []
+    stats = {}
+    for start, goal in pairs:
+        began = time.perf_counter()
+        terrain.a_star(flat, costs, start, goal, stats=stats)
+        times.append(time.perf_counter() - began)
+        expanded.append(stats["expanded"])
+    result = percentiles(times)
+    result["mean_expanded"] = float(np.mean(expanded)) if expanded else 0.0
+    return result
+
+def bench_flow_field(flat, pairs, count=FIELDS):
+    """Flow field build time, and how many of their distances differ from
+    the cost of the optimal (octile) a_star route; check_budget wants none"""
+    times = []
+    mismatches = 0
+    for start, goal in pairs[:count]:
+        began = time.perf_counter()
+        field = FlowField(flat, goal)
+        times.append(time.perf_counter() - began)
+        path = grid_search.a_star(flat, start, goal, heuristic=octile_heuristic(flat, goal).tolist())
+        if abs(field.distance(start) - any_angle.path_length(start, path)) > 1e-6:
+            mismatches += 1
+    result = percentiles(times)
+    result["mismatches"] = mismatches
+    return result
+
+def bench_replan(flat, pairs, count=REPAIRS):
+    """D* Lite repairs after closing a cell halfway along the route, against
+    a full optimal A* on the closed grid (dstar_lite.speedup)"""
+    repairs, full, speedups = [], [], []
+    for start, goal in pairs[:count]:
+        grid = grid_search.FlatGrid.from_walk(bytearray(flat.walk), flat.width, flat.height)
+        replanner = DStarLite(grid, goal)
+        path = replanner.plan(start)
+        if len(path) < 2:
+            continue
+        cell = path[(len(path) - 1) // 2]
+        grid.set_walkable(*cell, False)
+        replanner.update_cells([cell])
+        replanner.plan(start)
+        stats = dstar_lite.speedup(grid, replanner.stats, start, goal)
+        repairs.append(stats["time"])
+        full.append(stats["full_time"])
+        speedups.append(stats["speedup"])
+    result = percentiles(repairs)
+    result["full_p50_ms"] = percentiles(full)["p50_ms"]
+    result["p50_speedup"] = float(np.median(speedups)) if speedups else 0.0
+    return result
+
+def bench_any_angle(flat, pairs):
+    """Waypoint pruning of the 8-connected routes: time, mean waypoints and lengths"""
+    times = []
+    totals = dict.fromkeys(("waypoints", "any_angle_waypoints", "length", "any_angle_length"), 0.0)
+    for start, goal in pairs:
+        path = grid_search.a_star(flat, start, goal, diagonal=True)
+        began = time.perf_counter()
+        pruned = any_angle.smooth_path(flat, start, path)
+        times.append(time.perf_counter() - began)
+        for key, value in any_angle.route_report(start, path, pruned).items():
+            totals[key] += value / len(pairs)
+    result = percentiles(times)
+    result.update(totals)
+    return result
+
+def bench_draw(cells, pairs, frames=FRAMES, map_image=None):
+    """First frame (map layer + scene) and later frames with the courier
+    moving, drawn by Final.MapView over map_image (None: the grid raster)"""
+    import Final
+    canvas = OffscreenCanvas(cells.shape[1] * map_loader.TILE_SIZE, cells.shape[0] * map_loader.TILE_SIZE)
+    router = core.Router()
+    router.set_grid(cells)
+    start, goal = pairs[0] if pairs else ((0, 0), (0, 0))
+    courier = core.Courier(*start)
+    courier.path = core.a_star(router.flat_grid, start, goal)
+    courier.moving = bool(courier.path)
+    legend = "Map size: %d x %d" % (cells.shape[1], cells.shape[0])
+
+    def draw(view):
+        view.draw(router, map_image, start, goal, courier, 1.0, legend)
+
+    first = []
+    for _ in range(REPEATS):
+        canvas.delete("all")
+        view = Final.MapView(canvas)
+        began = time.perf_counter()
+        draw(view)
+        first.append(time.perf_counter() - began)
+    items = len(canvas.items)
+    times = []
+    calls = canvas.calls
+    for _ in range(frames):
+        courier.move()
+        began = time.perf_counter()
+        draw(view)
+        times.append(time.perf_counter() - began)
+    result = percentiles(times)
+    result["first_ms"] = float(np.median(first)) * 1000
+    result["items"] = items
+    result["calls_per_frame"] = (canvas.calls - calls) / max(frames, 1)
+    return result
+
+def bench_draw_fleet(cells, pairs, frames=FRAMES, couriers=FLEET_COURIERS):
+    """Frames of a fleet of couriers driving the query routes (courier i
+    takes pair i modulo their number), one tick per frame, drawn by
+    Final.MapView over the grid raster"""
+    import Final
+    canvas = OffscreenCanvas(cells.shape[1] * map_loader.TILE_SIZE, cells.shape[0] * map_loader.TILE_SIZE)
+    router = core.Router()
+    router.set_grid(cells)
+    if not pairs:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "calls_per_frame": 0.0}
+    routes = [core.a_star(router.flat_grid, start, goal) for start, goal in pairs]
+    stops = [(pairs[i % len(pairs)][0], pairs[i % len(pairs)][1], pairs[i % len(pairs)][1]) for i in range(couriers)]
+    legs = [(routes[i % len(pairs)], []) for i in range(couriers)]
+    fleet = dispatch(stops, legs)
+    view = Final.MapView(canvas)
+    courier = core.Courier(*pairs[0][0])
+    legend = "Map size: %d x %d" % (cells.shape[1], cells.shape[0])
+    view.draw(router, None, pairs[0][0], pairs[0][1], courier, 1.0, legend, fleet)
+    times = []
+    calls = canvas.calls
+    for _ in range(frames):
+        fleet.advance(legs)
+        began = time.perf_counter()
+        view.draw(router, None, pairs[0][0], pairs[0][1], courier, 1.0, legend, fleet)
+        times.append(time.perf_counter() - began)
+    result = percentiles(times)
+    result["calls_per_frame"] = (canvas.calls - calls) / max(frames, 1)
+    return result
+
+def bench_map(path, queries=QUERIES, seed=SEED, frames=FRAMES):
+    times = []
+    for _ in range(REPEATS):
+        began = time.perf_counter()
+        cells, levels = ingest(path)
+        times.append(time.perf_counter() - began)
+    flat = grid_search.FlatGrid(cells)
+    grid = cells.tolist()
+    pairs = query_pairs(flat, queries, seed)
+    result = {
+        "width": int(cells.shape[1]),
+        "height": int(cells.shape[0]),
+        "queries": len(pairs),
+        "ingest_ms": float(np.median(times)) * 1000,
+        "a_star_4": bench_search(flat, pairs, diagonal=False, grid=grid),
+        "a_star_8": bench_search(flat, pairs, diagonal=True, grid=grid),
+        "jps": bench_jps(flat, pairs),
+        "alt": bench_alt(flat, pairs),
+        "hpa": bench_hpa(flat, pairs),
+        "flow_field": bench_flow_field(flat, pairs),
+        "terrain": bench_terrain(flat, levels, pairs),
+        "replan": bench_replan(flat, pairs),
+        "any_angle": bench_any_angle(flat, pairs),
+        "draw": bench_draw(cells, pairs, frames, map_image(path)),
+        "draw_raster": bench_draw(cells, pairs, frames),
+        "draw_fleet": bench_draw_fleet(cells, pairs, frames),
+    }
+    # Peak memory in a separate pass, so tracing does not slow the timings
+    tracemalloc.start()
+    try:
+        flat = grid_search.FlatGrid(ingest(path)[0])
+        for start, goal in pairs[:20]:
+            grid_search.a_star(flat, start, goal, diagonal=True)
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+def bench_import(module="core"):
+    """Median time to import module in a fresh interpreter, and the GUI modules it loaded"""
+    code = ("import sys, time\n"
+            "began = time.perf_counter()\n"
+            "import %s\n"
+            "print((time.perf_counter() - began) * 1000)\n"
+            "print(' '.join(m for m in %r if m in sys.modules))" % (module, GUI_MODULES))
+    times = []
+    for _ in range(REPEATS):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                             text=True, check=True).stdout.splitlines()
+        times.append(float(out[0]))
+        gui = out[1].split() if len(out) > 1 else []
+    return {"import_ms": float(np.median(times)), "gui_modules": gui}
+
+def check_budget(results, budget_ms=core.CORE_IMPORT_BUDGET_MS):
+    """Descriptions of fixed limits that current results break (no baseline needed)"""
+    failures = []
+    imported = results.get("core_import")
+    if imported:
+        if imported["import_ms"] > budget_ms:
+            failures.append("import core: %.1f ms > budget %.0f ms" % (imported["import_ms"], budget_ms))
+        if imported["gui_modules"]:
+            failures.append("import core loads %s" % ", ".join(imported["gui_modules"]))
+    imported = results.get("simulate_import")
+    if imported and imported["gui_modules"]:
+        failures.append("import simulate loads %s" % ", ".join(imported["gui_modules"]))
+    for name, metrics in results.get("maps", {}).items():
+        for search in ("a_star_4", "a_star_8"):
+            if metrics.get(search, {}).get("mismatches"):
+                failures.append("%s: %d %s route lengths differ from the PriorityQueue search"
+                                % (name, metrics[search]["mismatches"], search))
+        if metrics.get("flow_field", {}).get("mismatches"):
+            failures.append("%s: %d flow field distances differ from A*" % (name, metrics["flow_field"]["mismatches"]))
+    return failures
+
+def run(paths=None, queries=QUERIES, seed=SEED, frames=FRAMES):
+    paths = map_files() if paths is None else paths
+    return {
+        "format": FORMAT_VERSION,
+        "seed": seed,
+        "queries": queries,
+        "python": platform.python_version(),
+        "core_import": bench_import(),
+        "simulate_import": bench_import("simulate"),
+        "maps": {os.path.basename(p): bench_map(p, queries, seed, frames) for p in paths},
+    }
+
+# Metrics checked by compare(); timings end in _ms, the rest are counts
+_CHECKED = [
+    ("ingest_ms",), ("peak_bytes",),
+    ("a_star_4", "p50_ms"), ("a_star_4", "p95_ms"), ("a_star_4", "mean_expanded"),
+    ("a_star_8", "p50_ms"), ("a_star_8", "p95_ms"), ("a_star_8", "mean_expanded"),
+    ("jps", "p50_ms"), ("jps", "p95_ms"), ("jps", "mean_expanded"),
+    ("alt", "p50_ms"), ("alt", "p95_ms"), ("alt", "mean_expanded"),
+    ("hpa", "p50_ms"), ("hpa", "p95_ms"), ("hpa", "build_ms"), ("hpa", "mean_bound_ratio"),
+    ("flow_field", "p50_ms"), ("flow_field", "p95_ms"),
+    ("terrain", "p50_ms"), ("terrain", "p95_ms"), ("terrain", "mean_expanded"),
+    ("replan", "p50_ms"), ("replan", "p95_ms"),
+    ("any_angle", "p50_ms"), ("any_angle", "p95_ms"), ("any_angle", "any_angle_waypoints"),
+    ("draw", "first_ms"), ("draw", "p50_ms"), ("draw", "p95_ms"), ("draw", "calls_per_frame"),
+    ("draw_raster", "first_ms"), ("draw_raster", "p50_ms"), ("draw_raster", "calls_per_frame"),
+    ("draw_fleet", "p50_ms"), ("draw_fleet", "p95_ms"), ("draw_fleet", "calls_per_frame"),
+]
+
+def compare(baseline, current, tolerance=TOLERANCE):
+    """Descriptions of metrics in current that are worse than in baseline.
+
+    Timings may grow by the tolerance factor, counts by COUNT_TOLERANCE.
+    """
+    if baseline.get("format") != current.get("format"):
+        return ["format %s != baseline format %s" % (current.get("format"), baseline.get("format"))]
+    regressions = []
+    for name, metrics in current["maps"].items():
+        old = baseline["maps"].get(name)
+        if old is None:
+            continue
+        for keys in _CHECKED:
+            before, after = old, metrics
+            for key in keys:
+                before, after = before.get(key), after.get(key)
+                if before is None or after is None:
+                    break
+            if before is None or after is None:
+                continue
+            # Small absolute values are noise: allow at least 0.05 ms / 1 unit extra
+            if keys[-1].endswith("_ms"):
+                limit = before * (1 + tolerance) + 0.05
+            else:
+                limit = before * (1 + COUNT_TOLERANCE) + 1
+            if after > limit:
+                regressions.append("%s %s: %.3f -> %.3f" % (name, ".".join(keys), before, after))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartKurir benchmark")
+    parser.add_argument("--maps", nargs="*", help="image files (default: every image in map/)")
+    parser.add_argument("--queries", type=int, default=QUERIES)
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run(args.maps or None, args.queries, args.seed, args.frames)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    failures = check_budget(results)
+    for line in failures:
+        print("OVER BUDGET", line, file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line, file=sys.stderr)
+        failures += regressions
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
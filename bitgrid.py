@@ -0,0 +1,205 @@
+"""Walkability grid stored as one bit per cell, optionally memory-mapped.
+
+Each row is packed little-endian (bit x % 8 of byte x // 8 is cell x),
+with 1 meaning obstacle like the list-of-lists grids, so a 20,000 x
+20,000 map takes 50 MB instead of gigabytes. A BitGrid can stand in for
+the list grid (len(grid), grid[y][x], np.asarray(grid)) and for a
+FlatGrid in grid_search.a_star (same node ids, walk[node], offset).
+
+Files are a 16-byte header (magic, format, width, height) followed by
+the packed rows, so they can be mapped straight into memory.
+"""
+import struct
+import numpy as np
+from grid_search import FlatGrid, _versions
+
+MAGIC = b"SKBG"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIII")
+
+class _Row:
+    """grid[y] of a BitGrid: indexable like a list row"""
+    __slots__ = ("data", "start", "width")
+
+    def __init__(self, data, start, width):
+        self.data = data
+        self.start = start
+        self.width = width
+
+    def __len__(self):
+        return self.width
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.width
+        if not 0 <= x < self.width:
+            raise IndexError("grid row index out of range")
+        return (self.data[self.start + (x >> 3)] >> (x & 7)) & 1
+
+    def __iter__(self):
+        return (self[x] for x in range(self.width))
+
+class _Walk:
+    """walk[node] of a BitGrid: 1 if walkable, with FlatGrid node ids (border is 0)"""
+    __slots__ = ("data", "stride", "width", "height", "row_bytes")
+
+    def __init__(self, grid):
+        self.data = grid.data
+        self.stride = grid.stride
+        self.width = grid.width
+        self.height = grid.height
+        self.row_bytes = grid.row_bytes
+
+    def __len__(self):
+        return (self.width + 2) * self.stride
+
+    def __getitem__(self, node):
+        x, y = divmod(node, self.stride)
+        x -= 1
+        y -= 1
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return ((self.data[y * self.row_bytes + (x >> 3)] >> (x & 7)) & 1) ^ 1
+        return 0
+
+class BitGrid:
+    def __init__(self, bits, width):
+        """bits: (height, ceil(width / 8)) uint8 array of packed rows"""
+        self.bits = bits
+        self.height = bits.shape[0]
+        self.width = width
+        self.row_bytes = bits.shape[1] if bits.ndim == 2 else 0
+        self.stride = self.height + 2
+        # Flat byte view: scalar indexing on it is much cheaper than on the array
+        self.data = memoryview(bits.reshape(-1)) if bits.size else memoryview(b"")
+        self.walk = _Walk(self)
+        self.version = next(_versions)
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Pack a list grid or 2D array (0 = walkable)"""
+        cells = np.asarray(cells, dtype=np.uint8)
+        if cells.ndim != 2:
+            cells = cells.reshape(0, 0)
+        bits = np.packbits(cells != 0, axis=1, bitorder="little")
+        return cls(np.ascontiguousarray(bits), cells.shape[1])
+
+    @classmethod
+    def create(cls, width, height, path=None):
+        """All-walkable grid, in memory or as a new file mapped read-write"""
+        shape = (height, (width + 7) // 8)
+        if path is None:
+            return cls(np.zeros(shape, dtype=np.uint8), width)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, width, height))
+            f.truncate(_HEADER.size + shape[0] * shape[1])
+        if not shape[0] * shape[1]:
+            return cls(np.zeros(shape, dtype=np.uint8), width)
+        bits = np.memmap(path, dtype=np.uint8, mode="r+", offset=_HEADER.size, shape=shape)
+        return cls(bits, width)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved grid; mapped copy-on-write, so set_walkable never touches the file"""
+        with open(path, "rb") as f:
+            magic, version, width, height = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError("Bukan file grid SmartKurir: %s" % path)
+            shape = (height, (width + 7) // 8)
+            if not mmap:
+                bits = np.fromfile(f, dtype=np.uint8, count=shape[0] * shape[1]).reshape(shape)
+                return cls(bits, width)
+        bits = np.memmap(path, dtype=np.uint8, mode="c", offset=_HEADER.size, shape=shape)
+        return cls(bits, width)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.width, self.height))
+            f.write(np.ascontiguousarray(self.bits).tobytes())
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    # List-of-lists interface (0 = walkable, 1 = obstacle)
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.height
+        if not 0 <= y < self.height:
+            raise IndexError("grid index out of range")
+        return _Row(self.data, y * self.row_bytes, self.width)
+
+    def __iter__(self):
+        return (self[y] for y in range(self.height))
+
+    def __array__(self, dtype=None, copy=None):
+        cells = self.rows(0, self.height)
+        return cells if dtype is None else cells.astype(dtype)
+
+    def rows(self, y0, y1):
+        """Cells of rows y0..y1-1 as a uint8 array (0 = walkable)"""
+        return np.unpackbits(self.bits[y0:y1], axis=1, count=self.width, bitorder="little")
+
+    def row(self, y):
+        return self.rows(y, y + 1)[0]
+
+    def set_rows(self, y0, cells):
+        """Overwrite rows y0.. with a uint8 array of cells (0 = walkable)"""
+        cells = np.asarray(cells)
+        self.bits[y0:y0 + len(cells)] = np.packbits(cells != 0, axis=1, bitorder="little")
+        self.version = next(_versions)
+
+    # FlatGrid interface
+    def node_id(self, x, y):
+        return (x + 1) * self.stride + (y + 1)
+
+    def coords(self, node):
+        px, py = divmod(node, self.stride)
+        return px - 1, py - 1
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_walkable(self, x, y):
+        return self.in_bounds(x, y) and not (self.data[y * self.row_bytes + (x >> 3)] >> (x & 7)) & 1
+
+    def offset(self, dx, dy):
+        return dx * self.stride + dy
+
+    def neighbors(self, x, y):
+        """Walkable 8-neighbours of (x, y) without corner cutting"""
+        walkable = self.is_walkable
+        result = [(x + dx, y + dy) for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0))
+                  if walkable(x + dx, y + dy)]
+        for dx, dy in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+            if walkable(x + dx, y + dy) and walkable(x + dx, y) and walkable(x, y + dy):
+                result.append((x + dx, y + dy))
+        return result
+
+    def to_flat_grid(self, block=1024):
+        """FlatGrid of the same cells (a byte per cell, faster to search),
+        unpacked block rows at a time instead of the whole grid at once"""
+        walk = bytearray((self.width + 2) * self.stride)
+        columns = np.frombuffer(walk, dtype=np.uint8).reshape(self.width + 2, self.stride)
+        for y0 in range(0, self.height, block):
+            cells = self.rows(y0, y0 + block)
+            columns[1:-1, 1 + y0:1 + y0 + len(cells)] = (cells == 0).T
+        return FlatGrid.from_walk(walk, self.width, self.height)
+
+    def walk_array(self, padded=False):
+        walk = self.rows(0, self.height) == 0
+        return np.pad(walk, 1, constant_values=False) if padded else walk
+
+    def set_walkable(self, x, y, walkable):
+        """Change one cell; returns True if it changed (and bumps version)"""
+        i = y * self.row_bytes + (x >> 3)
+        mask = 1 << (x & 7)
+        byte = self.data[i]
+        new = byte & ~mask if walkable else byte | mask
+        if new == byte:
+            return False
+        self.data[i] = new
+        self.version = next(_versions)
+        return True
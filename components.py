@@ -0,0 +1,126 @@
+"""Connected components of a walkability grid.
+
+With the no-corner-cutting rule a diagonal step is only possible when
+both cardinal cells are open, so 8-connected reachability is the same as
+4-connected reachability and one labelling serves both planners.
+Labelling unions horizontal runs of walkable cells instead of single
+cells, which keeps the Python work proportional to the number of runs.
+The index keeps only the runs (read from the grid ROW_BLOCK rows at a
+time), never a per-cell array, so it stays small next to a BitGrid.
+"""
+import random
+from bisect import bisect_right
+
+import numpy as np
+
+ROW_BLOCK = 1024
+
+def _find(parent, i):
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+def grid_runs(flat, block=ROW_BLOCK):
+    """(rows, starts, ends) of the runs of walkable cells, in row-major order (ends exclusive)"""
+    parts = []
+    for y0 in range(0, flat.height, block):
+        walk = flat.rows(y0, y0 + block) == 0
+        edges = np.diff(np.pad(walk, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        parts.append((rows + y0, starts, ends))
+    if not parts:
+        return tuple(np.zeros(0, dtype=np.int32) for _ in range(3))
+    return tuple(np.concatenate(column).astype(np.int32) for column in zip(*parts))
+
+def label_runs(rows, starts, ends, height):
+    """Component (1..n) of every run, 4-connected; returns (labels, n)"""
+    n_runs = len(rows)
+    if n_runs == 0:
+        return np.zeros(0, dtype=np.int32), 0
+
+    row_first = np.searchsorted(rows, np.arange(height + 1)).tolist()
+    starts = starts.tolist()
+    ends = ends.tolist()
+    parent = list(range(n_runs))
+    for y in range(height - 1):
+        i, i_end = row_first[y], row_first[y + 1]
+        j, j_end = i_end, row_first[y + 2]
+        # Merge the runs of row y and y + 1 that share a column
+        while i < i_end and j < j_end:
+            if starts[i] < ends[j] and starts[j] < ends[i]:
+                a, b = _find(parent, i), _find(parent, j)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+            if ends[i] < ends[j]:
+                i += 1
+            else:
+                j += 1
+
+    roots = np.array([_find(parent, i) for i in range(n_runs)])
+    _, run_labels = np.unique(roots, return_inverse=True)
+    run_labels = run_labels.astype(np.int32) + 1
+    return run_labels, int(run_labels.max())
+
+class ComponentIndex:
+    """Component label of every run plus a free-cell index, for reachability and sampling"""
+    def __init__(self, flat):
+        self.flat = flat
+        self.version = flat.version
+        self.rows, self.starts, self.ends = grid_runs(flat)
+        self.run_labels, self.count = label_runs(self.rows, self.starts, self.ends, flat.height)
+        self.row_first = np.searchsorted(self.rows, np.arange(flat.height + 1))
+
+        # Free cells numbered component by component, row-major inside each
+        self.order = np.argsort(self.run_labels, kind="stable")
+        lengths = (self.ends - self.starts)[self.order]
+        self.first_free = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        first_run = np.searchsorted(self.run_labels[self.order], np.arange(1, self.count + 2))
+        self.offsets = self.first_free[first_run]
+        self.sizes = np.diff(self.offsets)
+
+    def label(self, pos):
+        x, y = pos
+        if not self.flat.in_bounds(x, y):
+            return 0
+        lo, hi = int(self.row_first[y]), int(self.row_first[y + 1])
+        i = bisect_right(self.starts, x, lo, hi) - 1
+        if i < lo or x >= self.ends[i]:
+            return 0
+        return int(self.run_labels[i])
+
+    def connected(self, a, b):
+        """True when a path between a and b exists"""
+        la = self.label(a)
+        return la != 0 and la == self.label(b)
+
+    def _cell(self, i):
+        k = int(np.searchsorted(self.first_free, i, side="right")) - 1
+        run = self.order[k]
+        return int(self.starts[run] + i - self.first_free[k]), int(self.rows[run])
+
+    def random_position(self, component=None, rng=random):
+        """Uniform free cell, optionally restricted to one component"""
+        if component is None:
+            if not self.first_free[-1]:
+                raise ValueError("Peta tidak memiliki sel yang bisa dilalui")
+            return self._cell(rng.randrange(int(self.first_free[-1])))
+        lo, hi = self.offsets[component - 1], self.offsets[component]
+        return self._cell(rng.randrange(lo, hi))
+
+    def random_positions(self, k, component=None, rng=random):
+        """k distinct free cells that are all reachable from each other"""
+        if component is None:
+            # Pick a cell uniformly among components large enough for k cells
+            weights = np.where(self.sizes >= k, self.sizes, 0)
+            total = int(weights.sum())
+            if total == 0:
+                raise ValueError("Tidak ada area terhubung dengan %d sel bebas" % k)
+            component = int(np.searchsorted(np.cumsum(weights), rng.randrange(total), side="right")) + 1
+        lo, hi = int(self.offsets[component - 1]), int(self.offsets[component])
+        if hi - lo < k:
+            raise ValueError("Tidak ada area terhubung dengan %d sel bebas" % k)
+        return [self._cell(lo + i) for i in rng.sample(range(hi - lo), k)]
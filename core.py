@@ -0,0 +1,376 @@
+"""Routing core shared by the Tk apps, the simulator and other headless tools.
+
+Grid helpers, the courier model, map classification (walkability and
+terrain costs) and Router (the planning state of one map) live here without any GUI dependency:
+importing this module never loads tkinter, and PIL is only imported
+when an image actually has to be decoded. benchmark.py measures the
+import time against CORE_IMPORT_BUDGET_MS.
+"""
+import math
+import random
+import threading
+import time
+
+import grid_search
+from grid_search import as_flat_grid
+import any_angle
+import dstar_lite
+import instrument
+import map_loader
+import terrain
+from bitgrid import BitGrid
+from dstar_lite import DStarLite
+from components import ComponentIndex
+from flow_field import FlowField, FlowFieldCache
+from grid_cache import default_cache as grid_cache
+from hpa import HierarchicalGrid
+from jps import JumpTable, jps
+from landmarks import LandmarkTable
+from route_cache import RouteCache
+
+TICK_MS = 16  # Simulation step of Final; courier speed is in cells per tick
+
+PLANNERS = ["A*", "A* + ALT", "JPS", "HPA*", "Flow field", "Terrain"]
+OPTIMAL_PLANNERS = ("A* + ALT", "JPS", "Flow field")  # Terrain costs are not symmetric
+
+# Import time of this module (python -c "import core") that benchmark.py enforces
+CORE_IMPORT_BUDGET_MS = 300
+
+def clamp(value, min_value, max_value):
+    return max(min_value, min(max_value, value))
+
+def generate_random_map(grid_width, grid_height):
+    return [[0 if random.random() < 0.85 else 1 for _ in range(grid_width)] for _ in range(grid_height)]
+
+def is_walkable(grid, x, y):
+    return 0 <= x < len(grid[0]) and 0 <= y < len(grid) and grid[y][x] == 0
+
+def line_of_sight(grid, start, end):
+    """Check if there's a clear line of sight between two points using Bresenham's algorithm"""
+    x0, y0 = start
+    x1, y1 = end
+
+    dx = abs(x1 - x0)
+    dy = abs(y1 - y0)
+
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+
+    err = dx - dy
+
+    x, y = x0, y0
+
+    while True:
+        # Check if current position is walkable
+        if not is_walkable(grid, x, y):
+            return False
+
+        if x == x1 and y == y1:
+            break
+
+        e2 = 2 * err
+
+        if e2 > -dy:
+            err -= dy
+            x += sx
+
+        if e2 < dx:
+            err += dx
+            y += sy
+
+    return True
+
+def a_star(grid, start, goal, diagonal=True):
+    """A* (8-direction without corner cutting, or 4-direction); grid may be a list grid or a FlatGrid"""
+    return grid_search.a_star(as_flat_grid(grid), start, goal, diagonal=diagonal)
+
+def random_position(grid, index=None, component=None, rng=random):
+    """Random walkable cell; with a ComponentIndex, sample its free-cell list
+    (optionally only inside one component) instead of rejection sampling"""
+    if index is not None:
+        return index.random_position(component, rng=rng)
+    h = len(grid)
+    w = len(grid[0])
+    while True:
+        x = rng.randint(0, w - 1)
+        y = rng.randint(0, h - 1)
+        if grid[y][x] == 0:
+            return x, y
+
+def flat_grid(grid):
+    """FlatGrid to search grid with; a BitGrid is unpacked a block of rows at a time"""
+    return grid.to_flat_grid() if isinstance(grid, BitGrid) else as_flat_grid(grid)
+
+def load_grid(filepath, tile_size=map_loader.TILE_SIZE, sampled=False):
+    """Walkability grid of a map image ((height, width) uint8 array, 0 = walkable;
+    a BitGrid for images too large to decode at once), cached on disk and
+    memory-mapped from there"""
+    return grid_cache.load_cells(filepath, tile_size, sampled=sampled)
+
+def load_map(filepath, tile_size=map_loader.TILE_SIZE, image=None):
+    """(load_grid, load_costs) of a map image, classified from one decode; pass
+    the decoded image to reuse it"""
+    return grid_cache.load_map(filepath, tile_size, image=image)
+
+def load_costs(filepath, tile_size=map_loader.TILE_SIZE):
+    """Terrain cost level of every tile of a map image (0 = obstacle), cached on disk"""
+    return grid_cache.load_costs(filepath, tile_size)
+
+class Courier:
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+        self.path = []
+        self.moving = False
+        self.angle = 0
+        self.target_index = 0
+        self.speed = 0.15  # Reduced speed for more precise movement
+        self.current_pos = (float(x), float(y))  # Float position for smooth animation
+        self.prev_pos = self.current_pos  # Position one tick ago, for interpolation
+        self.last_waypoint = (x, y)  # Where the current straight segment started
+        self.has_pickup = False  # Status apakah sudah mengambil pickup
+        self.current_target = None  # Target saat ini (pickup atau goal)
+
+    def move(self):
+        """Advance one simulation tick"""
+        self.prev_pos = self.current_pos
+        if self.path and self.target_index < len(self.path):
+            target = self.path[self.target_index]
+            dx = target[0] - self.current_pos[0]
+            dy = target[1] - self.current_pos[1]
+            distance = math.sqrt(dx**2 + dy**2)
+
+            if distance < self.speed:
+                self.current_pos = (float(target[0]), float(target[1]))
+                self.last_waypoint = target
+                self.target_index += 1
+            else:
+                # Smooth movement with smaller steps
+                direction_x = dx / distance
+                direction_y = dy / distance
+                new_x = self.current_pos[0] + direction_x * self.speed
+                new_y = self.current_pos[1] + direction_y * self.speed
+                self.current_pos = (new_x, new_y)
+                self.angle = math.atan2(-direction_y, direction_x)
+
+            # Update grid position
+            self.x, self.y = int(round(self.current_pos[0])), int(round(self.current_pos[1]))
+        else:
+            self.moving = False
+
+    def position(self, alpha=1.0):
+        """Drawn position, alpha of the way from the previous tick to the current one"""
+        (px, py), (x, y) = self.prev_pos, self.current_pos
+        return px + (x - px) * alpha, py + (y - py) * alpha
+
+class Router:
+    """Grid, planners and caches of one map, with the runtime road closures.
+
+    find_path and replan may run on planner worker threads. plan_lock
+    guards the shared state (grid changes, the route and flow field
+    caches, the per-map tables); searches run outside it, so several
+    workers can plan at once. A search that overlaps a closure may
+    return a route through the closed cell; its grid version no longer
+    matches, so it is not cached, and Final.check_closures repairs it.
+    The D* Lite state of the current leg is only searched under
+    replan_lock; closures reach it as a list of changed cells that the
+    next search takes over.
+    """
+    def __init__(self, planner=PLANNERS[0], smoothing=False):
+        self.plan_lock = threading.Lock()
+        self.replan_lock = threading.Lock()
+        self.planner_name = planner
+        self.smoothing = smoothing  # Prune routes to any-angle waypoints
+        # Routes are cached per grid version; other planners give other routes
+        self.route_cache = RouteCache()
+        self.flow_fields = FlowFieldCache()  # Distance fields per (grid version, goal)
+        self.route_report = None  # Waypoints and length of the last route, grid vs any-angle
+        self.set_grid([])
+
+    def set_grid(self, grid, costs=None):
+        """Start over on a new grid (list of lists, 2D array or BitGrid; [] for no map),
+        with its terrain cost levels if known (else the Terrain planner is plain A*)"""
+        with self.plan_lock:
+            self.grid = grid
+            self.flat_grid = flat_grid(grid) if len(grid) else None  # Flat walkability buffer used by a_star
+            self.terrain = terrain.TerrainCosts(costs) if costs is not None else None
+            self.jump_table = None  # JPS+ tables, built on first JPS query per map
+            self.hierarchy = None  # HPA* clusters, built on first HPA* query per map
+            self.landmarks = None  # ALT distance tables, loaded or built on first use per map
+            self.replanner = None  # D* Lite state of the current leg, repaired on closures
+            self.replanner_changes = []  # Cells changed since the replanner last searched
+            self.repair_stats = None  # DStarLite.stats of the last repair
+            self.replan_stats = None  # A repair against a full A*, if measure_replan ran
+            self.hpa_stats = None  # HierarchicalGrid.find_path stats of the last HPA* route
+            self.flow_fields.clear()
+            self.components = ComponentIndex(self.flat_grid) if len(grid) else None  # Connected areas
+            self.closures = set()  # Road cells closed at runtime
+
+    def set_planner(self, planner, smoothing):
+        with self.plan_lock:
+            self.planner_name = planner
+            self.smoothing = smoothing
+            self.route_cache.clear()
+            if not smoothing:
+                self.route_report = None
+            self.hpa_stats = None
+
+    def set_closed(self, cell, closed):
+        """Close or reopen a cell; False if it is off the map or already so"""
+        x, y = cell
+        if self.flat_grid is None or not self.flat_grid.in_bounds(x, y):
+            return False
+        with self.plan_lock:
+            version = self.flat_grid.version
+            if not self.flat_grid.set_walkable(x, y, not closed):
+                return False
+            if isinstance(self.grid, BitGrid):
+                self.grid.set_walkable(x, y, not closed)
+            else:
+                self.grid[y][x] = 1 if closed else 0
+            self.components = ComponentIndex(self.flat_grid)
+            # Tables that saw every earlier change only need this cell
+            if self.hierarchy is not None and self.hierarchy.version == version:
+                self.hierarchy.set_cell(x, y)
+            if self.landmarks is not None and self.landmarks.version == version:
+                self.landmarks.set_closed(cell, closed)
+            if self.replanner is not None:
+                self.replanner_changes.append(cell)
+        if closed:
+            self.closures.add(cell)
+        else:
+            self.closures.discard(cell)
+        return True
+
+    def find_path(self, start, goal):
+        """Plan with the selected engine"""
+        with self.plan_lock:
+            # Different areas: answer without searching the whole reachable region
+            if not self.components.connected(start, goal):
+                return []
+            flat = self.flat_grid
+            version = flat.version
+            planner = self.planner_name
+            smoothing = self.smoothing and not self.weighted(planner)
+            began = time.perf_counter()
+            # Only optimal planners' routes can answer subpath queries
+            path = self.route_cache.lookup(version, start, goal,
+                                           allow_subpath=planner in OPTIMAL_PLANNERS)
+        cached = path is not None
+        if not cached:
+            path = self.plan(planner, start, goal, flat)
+            with self.plan_lock:
+                if flat.version == version:
+                    self.route_cache.store(version, start, goal, path)
+        # The cache keeps grid routes; pruning them is cheap
+        if smoothing and path:
+            grid_path = path
+            path = any_angle.smooth_path(flat, start, grid_path)
+            self.route_report = any_angle.route_report(start, grid_path, path)
+        if instrument.enabled:
+            instrument.record("plan", planner=planner, cached=cached, waypoints=len(path),
+                              ms=(time.perf_counter() - began) * 1000)
+        return path
+
+    def weighted(self, planner):
+        """True if planner routes over terrain costs; straightening or a
+        uniform-cost repair would throw those routes away"""
+        return planner == "Terrain" and self.terrain is not None
+
+    def _table(self, name, flat, build):
+        """Per-map table (jump_table, hierarchy or landmarks) for flat, built
+        without plan_lock on first use; a table built while the grid
+        changed keeps the old version and is rebuilt next time"""
+        table = getattr(self, name)
+        if table is None or table.version != flat.version:
+            version = flat.version
+            table = build(flat)
+            table.version = version
+            with self.plan_lock:
+                if self.flat_grid is flat:
+                    setattr(self, name, table)
+        return table
+
+    def plan(self, planner, start, goal, flat=None):
+        """Route from start to goal with one engine, on flat (default: the current grid)"""
+        flat = flat or self.flat_grid
+        if planner == "JPS":
+            return jps(flat, start, goal, self._table("jump_table", flat, JumpTable))
+        if planner == "HPA*":
+            stats = {}
+            path = self._table("hierarchy", flat, HierarchicalGrid).find_path(start, goal, stats)
+            if path:
+                self.hpa_stats = stats
+            return path
+        if planner == "A* + ALT":
+            landmarks = self._table("landmarks", flat, LandmarkTable.load_or_build)
+            return grid_search.a_star(flat, start, goal, heuristic=landmarks.heuristic(goal))
+        if planner == "Flow field":
+            with self.plan_lock:
+                field = self.flow_fields.lookup(flat, goal)
+            if field is None:
+                field = FlowField(flat, goal)
+                with self.plan_lock:
+                    self.flow_fields.add(field)
+            return field.path(start)
+        if planner == "Terrain" and self.terrain is not None:
+            return terrain.a_star(flat, self.terrain, start, goal)
+        return a_star(flat, start, goal)
+
+    def _replanner(self, target):
+        """D* Lite state for a leg to target, new unless the current one has
+        that goal on this grid; call with plan_lock held"""
+        replanner = self.replanner
+        if replanner is None or replanner.goal != target or replanner.flat is not self.flat_grid:
+            replanner = self.replanner = DStarLite(self.flat_grid, target)
+            self.replanner_changes = []
+        return replanner
+
+    def _search(self, replanner, start):
+        """replanner.plan from start with the cells changed since its last
+        search; the search holds replan_lock but not plan_lock"""
+        with self.replan_lock:
+            with self.plan_lock:
+                changed = []
+                if self.replanner is replanner:
+                    changed, self.replanner_changes = self.replanner_changes, []
+            path = replanner.plan(start, changed)
+            return path, dict(replanner.stats)
+
+    def prepare_replan(self, start, target):
+        """Search the D* Lite state of a new leg from start to target ahead of
+        time, so that a closure on the way only costs its repair"""
+        with self.plan_lock:
+            if self.flat_grid is None or self.weighted(self.planner_name):
+                return
+            replanner = self._replanner(target)
+        self._search(replanner, start)
+
+    def replan(self, anchor, target):
+        """D* Lite repair of the route from anchor to target after closures
+        (a new terrain search for the Terrain planner)"""
+        with self.plan_lock:
+            flat = self.flat_grid
+            smoothing = self.smoothing
+            costs = self.terrain if self.weighted(self.planner_name) else None
+            replanner = self._replanner(target) if costs is None else None
+            self.repair_stats = None
+        if costs is not None:
+            # D* Lite only knows uniform costs
+            return terrain.a_star(flat, costs, anchor, target)
+        rest, stats = self._search(replanner, anchor)
+        self.repair_stats = stats
+        if smoothing and rest:
+            rest = any_angle.smooth_path(flat, anchor, rest)
+        return rest
+
+    def measure_replan(self, anchor, target, repair):
+        """replan_stats: a repair's stats against a full optimal A* from anchor.
+
+        Opt-in and slow (a whole search): run it without plan_lock, after
+        the repaired route is in use.
+        """
+        stats = dstar_lite.speedup(self.flat_grid, repair, anchor, target)
+        if instrument.enabled:
+            instrument.record("replan", **stats)
+        self.replan_stats = stats
+        return stats
@@ -0,0 +1,236 @@
+"""Incremental replanning with D* Lite (Koenig and Likhachev, 2002).
+
+The search runs backwards from the goal: g[n] is the cost from n to the
+goal and rhs[n] its one-step lookahead. When cells are blocked or
+unblocked only the nodes next to them get a new rhs, and compute() only
+re-expands nodes whose cost actually changed, so a repair costs about
+the size of the affected region instead of a whole new search. As the
+courier moves, km grows by the heuristic distance it covered, so keys
+already in the queue stay valid without reordering the heap.
+
+Move rules are those of grid_search.a_star (no corner cutting, sqrt(2)
+diagonals); the heuristic is the octile (or Manhattan, 4-connected)
+distance, which never overestimates, so every route is a shortest one.
+"""
+import heapq
+import math
+import time
+
+import grid_search
+from grid_search import SQRT2, CARDINALS_8, DIAGONALS_8, DIRECTIONS_4, DENSE_NODES, _Scores
+from landmarks import octile_heuristic
+
+EPSILON = 1e-9
+
+class DStarLite:
+    def __init__(self, flat, goal, diagonal=True):
+        self.flat = flat
+        self.goal = goal
+        self.diagonal = diagonal
+        self.version = flat.version
+        self.t = flat.node_id(*goal)
+        self.s = None
+        self.km = 0.0
+        if len(flat.walk) <= DENSE_NODES:
+            self.g = [math.inf] * len(flat.walk)
+            self.rhs = [math.inf] * len(flat.walk)
+        else:
+            self.g = _Scores()
+            self.rhs = _Scores()
+        self.rhs[self.t] = 0.0
+        self.queue = [(0.0, 0.0, self.t)]  # (k1, k2, node); stale entries are skipped
+        self.queued = {self.t: (0.0, 0.0)}  # node -> key of its live queue entry
+        # (offset, corner offset, corner offset, cost); a straight move's
+        # corners are the node itself
+        if diagonal:
+            self.moves = [(flat.offset(dx, dy), 0, 0, 1.0) for dx, dy in CARDINALS_8]
+            self.moves += [(flat.offset(dx, dy), flat.offset(dx, 0), flat.offset(0, dy), SQRT2)
+                           for dx, dy in DIAGONALS_8]
+        else:
+            self.moves = [(flat.offset(dx, dy), 0, 0, 1.0) for dx, dy in DIRECTIONS_4]
+        self.stats = {"expanded": 0, "time": 0.0}
+
+    def h(self, a, b):
+        ax, ay = divmod(a, self.flat.stride)
+        bx, by = divmod(b, self.flat.stride)
+        dx, dy = abs(ax - bx), abs(ay - by)
+        if self.diagonal:
+            return max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+        return dx + dy
+
+    def edges(self, u):
+        """(neighbour, cost) of every move allowed from u right now"""
+        walk = self.flat.walk
+        if not walk[u]:
+            return []
+        return [(u + off, cost) for off, ox, oy, cost in self.moves
+                if walk[u + off] and walk[u + ox] and walk[u + oy]]
+
+    def _lookahead(self, u):
+        walk, g = self.flat.walk, self.g
+        best = math.inf
+        if walk[u]:
+            for off, ox, oy, cost in self.moves:
+                v = u + off
+                if walk[v] and walk[u + ox] and walk[u + oy] and cost + g[v] < best:
+                    best = cost + g[v]
+        return best
+
+    def _queue(self, u):
+        g, rhs = self.g[u], self.rhs[u]
+        if g == rhs:
+            self.queued.pop(u, None)
+            return
+        m = min(g, rhs)
+        key = (m + self.h(self.s, u) + self.km, m)
+        if self.queued.get(u) != key:
+            self.queued[u] = key
+            heapq.heappush(self.queue, (key[0], key[1], u))
+
+    def set_start(self, start):
+        s = self.flat.node_id(*start)
+        if self.s is not None and s != self.s:
+            self.km += self.h(self.s, s)
+        self.s = s
+
+    def update_cells(self, cells):
+        """Take walkability changes of cells (already made on the grid) into account"""
+        stride = self.flat.stride
+        affected = set()
+        for x, y in cells:
+            node = self.flat.node_id(x, y)
+            # The cell's own edges and the diagonals it is a corner of
+            for dx in (-stride, 0, stride):
+                for dy in (-1, 0, 1):
+                    affected.add(node + dx + dy)
+        for u in affected:
+            if u != self.t and 0 <= u < len(self.flat.walk):
+                self.rhs[u] = self._lookahead(u)
+                if self.s is not None:
+                    self._queue(u)
+        self.version = self.flat.version
+
+    def compute(self):
+        """Expand nodes until the start's distance is known again"""
+        began = time.perf_counter()
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        heappop, heappush = heapq.heappop, heapq.heappush
+        s, t, km = self.s, self.t, self.km
+        walk, moves, lookahead = self.flat.walk, self.moves, self._lookahead
+        sx, sy = divmod(s, self.flat.stride)
+        stride = self.flat.stride
+        diagonal = self.diagonal
+        inf = math.inf
+        expanded = 0
+
+        def key_of(v, m):
+            dx, dy = divmod(v, stride)
+            dx = abs(dx - sx)
+            dy = abs(dy - sy)
+            if diagonal:
+                return m + (dx + (SQRT2 - 1) * dy if dx > dy else dy + (SQRT2 - 1) * dx) + km
+            return m + dx + dy + km
+
+        while queue:
+            k1, k2, u = queue[0]
+            key = (k1, k2)
+            if queued.get(u) != key:
+                heappop(queue)
+                continue
+            gs = g[s]
+            ms = min(gs, rhs[s])
+            # Keys are float sums; k1 values this close are a tie
+            if rhs[s] == gs and (k1 > ms + km + EPSILON or k1 >= ms + km - EPSILON and k2 >= ms):
+                break
+            heappop(queue)
+            gu, ru = g[u], rhs[u]
+            m = gu if gu < ru else ru
+            new = (key_of(u, m), m)
+            if key < new:
+                queued[u] = new
+                heappush(queue, (new[0], m, u))
+                continue
+            del queued[u]
+            expanded += 1
+            if walk[u]:
+                around = [(u + off, cost) for off, ox, oy, cost in moves
+                          if walk[u + off] and walk[u + ox] and walk[u + oy]]
+            else:
+                around = []
+            if gu > ru:
+                g[u] = ru
+                changed = []
+                for v, cost in around:
+                    if v != t and ru + cost < rhs[v]:
+                        rhs[v] = ru + cost
+                        changed.append(v)
+            else:
+                g[u] = inf
+                changed = [u]
+                for v, cost in around:
+                    if v != t and rhs[v] == gu + cost:
+                        changed.append(v)
+                for v in changed:
+                    if v != t:
+                        rhs[v] = lookahead(v)
+            for v in changed:
+                gv, rv = g[v], rhs[v]
+                if gv == rv:
+                    queued.pop(v, None)
+                    continue
+                m = gv if gv < rv else rv
+                new = (key_of(v, m), m)
+                if queued.get(v) != new:
+                    queued[v] = new
+                    heappush(queue, (new[0], m, v))
+        self.stats["expanded"] = expanded
+        self.stats["time"] = time.perf_counter() - began
+
+    def path(self):
+        """Route from the start along decreasing g (start excluded), or [] if there is none"""
+        g, s, t, flat = self.g, self.s, self.t, self.flat
+        if not flat.walk[s] or math.isinf(self.rhs[s]):
+            return []
+        path = []
+        node = s
+        while node != t:
+            cost, node = min((cost + g[v], v) for v, cost in self.edges(node))
+            if math.isinf(cost) or len(path) > len(flat.walk):
+                return []
+            path.append(flat.coords(node))
+        return path
+
+    def plan(self, start, changed=()):
+        """Shortest path from start (start excluded, like a_star), reusing earlier work.
+
+        changed lists cells whose walkability changed since the last call.
+        """
+        if not (self.flat.in_bounds(*start) and self.flat.is_walkable(*self.goal)):
+            return []
+        self.set_start(start)
+        if changed:
+            self.update_cells(changed)
+        self.compute()
+        return self.path()
+
+def speedup(flat, repair, start, goal, diagonal=True):
+    """A repair (DStarLite.stats after its plan()) against a full a_star from start.
+
+    The full search uses the octile distance (Manhattan when 4-connected),
+    so, like D* Lite, it returns a shortest route; the Manhattan default
+    overestimates diagonal moves and would not be a fair baseline.
+    Returns expansions and seconds of both, and "speedup", how many
+    times faster the incremental repair was.
+    """
+    heuristic = octile_heuristic(flat, goal).tolist() if diagonal else None
+    stats = {}
+    began = time.perf_counter()
+    grid_search.a_star(flat, start, goal, diagonal=diagonal, stats=stats, heuristic=heuristic)
+    full_time = time.perf_counter() - began
+    return {
+        "expanded": repair["expanded"],
+        "time": repair["time"],
+        "full_expanded": stats["expanded"],
+        "full_time": full_time,
+        "speedup": full_time / max(repair["time"], 1e-9),
+    }
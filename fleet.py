@@ -0,0 +1,149 @@
+"""Many couriers as a struct of arrays.
+
+Positions, angles, speeds, path cursors and pickup flags of all couriers
+live in contiguous NumPy arrays, and every path is stored back to back in
+one shared waypoint array; courier i follows waypoints[cursor[i]:end[i]].
+step() moves the whole fleet with the same rule as Final.Courier.move,
+but as a handful of array operations instead of one Python call per
+courier. advance() adds the pickup -> delivery handoff on top; it runs
+the fleet mode of Final (drawn with renderer.FleetSprites) and
+simulate.py --fleet.
+"""
+import numpy as np
+
+DEFAULT_SPEED = 0.15  # cells per tick, as Final.Courier
+
+_PER_COURIER = ("pos", "prev", "angle", "speed", "moving", "has_pickup", "cursor", "end")
+
+class Fleet:
+    def __init__(self, capacity=64):
+        capacity = max(capacity, 1)
+        self.size = 0
+        self.pos = np.zeros((capacity, 2))
+        self.prev = np.zeros((capacity, 2))
+        self.angle = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.moving = np.zeros(capacity, dtype=bool)
+        self.has_pickup = np.zeros(capacity, dtype=bool)
+        self.cursor = np.zeros(capacity, dtype=np.int64)
+        self.end = np.zeros(capacity, dtype=np.int64)
+        self.waypoints = np.zeros((max(capacity * 16, 1024), 2))
+        self.used = 0  # waypoint slots written, including consumed ones
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self, capacity):
+        for name in _PER_COURIER:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self, x, y, speed=DEFAULT_SPEED):
+        """New courier standing at (x, y); returns its index"""
+        if self.size == len(self.pos):
+            self._grow(2 * self.size)
+        i = self.size
+        self.size += 1
+        self.pos[i] = self.prev[i] = (x, y)
+        self.angle[i] = 0
+        self.speed[i] = speed
+        self.moving[i] = self.has_pickup[i] = False
+        self.cursor[i] = self.end[i] = 0
+        return i
+
+    def set_path(self, i, path):
+        """Let courier i follow path (list of cells, start excluded)"""
+        n = len(path)
+        self.end[i] = self.cursor[i]  # the old path is no longer live
+        if self.used + n > len(self.waypoints):
+            self.compact()
+            if 2 * (self.used + n) > len(self.waypoints):
+                grown = np.zeros((2 * (self.used + n), 2))
+                grown[:self.used] = self.waypoints[:self.used]
+                self.waypoints = grown
+        start = self.used
+        if n:
+            self.waypoints[start:start + n] = path
+        self.used += n
+        self.cursor[i] = start
+        self.end[i] = start + n
+        self.moving[i] = n > 0
+
+    def compact(self):
+        """Drop consumed waypoints so the buffer only holds the live tails"""
+        n = self.size
+        lengths = self.end[:n] - self.cursor[:n]
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if n else lengths
+        source = np.repeat(self.cursor[:n] - starts, lengths) + np.arange(int(lengths.sum()))
+        live = self.waypoints[source]
+        self.waypoints[:len(live)] = live
+        self.cursor[:n] = starts
+        self.end[:n] = starts + lengths
+        self.used = len(live)
+
+    def remaining(self, i):
+        """Waypoints courier i has not reached yet (a view, do not keep)"""
+        return self.waypoints[self.cursor[i]:self.end[i]]
+
+    def step(self):
+        """Advance every moving courier one tick; indices of those that just stopped"""
+        n = self.size
+        pos = self.pos[:n]
+        self.prev[:n] = pos
+        moving = self.moving[:n]
+        active = moving & (self.cursor[:n] < self.end[:n])
+        stopped = np.flatnonzero(moving & ~active)
+        self.moving[stopped] = False
+
+        idx = np.flatnonzero(active)
+        if len(idx):
+            target = self.waypoints[self.cursor[idx]]
+            delta = target - pos[idx]
+            distance = np.hypot(delta[:, 0], delta[:, 1])
+            speed = self.speed[idx]
+            arrive = distance < speed
+
+            hit = idx[arrive]
+            pos[hit] = target[arrive]
+            self.cursor[hit] += 1
+
+            go = ~arrive
+            unit = delta[go] / distance[go, None]
+            pos[idx[go]] += unit * speed[go, None]
+            self.angle[idx[go]] = np.arctan2(-unit[:, 1], unit[:, 0])
+        return stopped
+
+    def advance(self, legs):
+        """step(), then send couriers that reached their pickup on their
+        delivery leg, legs[i][1]; indices of couriers that just delivered"""
+        delivered = []
+        for i in self.step().tolist():
+            if self.has_pickup[i]:
+                delivered.append(i)
+            else:
+                self.has_pickup[i] = True
+                self.set_path(i, legs[i][1])
+        return delivered
+
+    def positions(self, alpha=1.0):
+        """Drawn positions, alpha of the way from the previous tick"""
+        n = self.size
+        return self.prev[:n] + (self.pos[:n] - self.prev[:n]) * alpha
+
+    def cells(self):
+        """Grid cell of every courier (rounded position), as int array (N, 2)"""
+        return np.rint(self.pos[:self.size]).astype(np.int64)
+
+def plan_legs(find_path, stops):
+    """(pickup leg, delivery leg) of every (start, pickup, goal) in stops,
+    each planned with find_path(start, goal)"""
+    return [(find_path(start, pickup), find_path(pickup, goal)) for start, pickup, goal in stops]
+
+def dispatch(stops, legs):
+    """Fleet with one courier per stop, each on its way to its pickup"""
+    fleet = Fleet(len(stops))
+    for (start, _, _), (first, _) in zip(stops, legs):
+        fleet.set_path(fleet.add(*start), first)
+    return fleet
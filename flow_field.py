@@ -0,0 +1,193 @@
+"""Goal-rooted distance fields shared by every courier heading to one goal.
+
+distance_field() runs Dijkstra from the goal over a FlatGrid with the
+move rules of Final.a_star (8-connected, sqrt(2) diagonals, no corner
+cutting). Moves are symmetric, so the distance from the goal is also the
+distance to it. Since every move costs at least 1, all tentative nodes
+within 1 of the smallest tentative distance are final at once; the
+search settles such a band per iteration with array operations instead
+of popping nodes one by one from a heap.
+
+FlowField adds the best next cell for every cell, so a courier anywhere
+on the map reads its next step in O(1). Fields are cached per (grid
+version, goal) and evicted least recently used by memory budget.
+"""
+from collections import OrderedDict
+import numpy as np
+from grid_search import SQRT2, CARDINALS_8, DIAGONALS_8
+
+MAX_FIELD_BYTES = 256 * 1024 * 1024
+
+def _moves(flat):
+    """(offset, side offsets, cost) per move; side offsets must be walkable too"""
+    moves = [(flat.offset(dx, dy), (), 1.0) for dx, dy in CARDINALS_8]
+    moves += [(flat.offset(dx, dy), (flat.offset(dx, 0), flat.offset(0, dy)), SQRT2)
+              for dx, dy in DIAGONALS_8]
+    return moves
+
+def distance_fields(flat, sources, targets=None):
+    """distance_field for several sources at once: one row per source.
+
+    All sources advance together, each band taking every entry within 1
+    of the smallest tentative distance over all rows, which is final for
+    its own row too. This shares the per-band overhead between sources.
+    With targets (cells), the search stops as soon as all of them are
+    settled in every row; only their distances (and smaller ones) are
+    then final.
+    """
+    walk = np.frombuffer(flat.walk, dtype=np.uint8).astype(bool)
+    n = len(walk)
+    dist = np.full((len(sources), n), np.inf)
+    flat_dist = dist.ravel()
+    moves = _moves(flat)
+    pending = np.array([k * n + flat.node_id(*source) for k, source in enumerate(sources)
+                        if flat.is_walkable(*source)], dtype=np.int64)
+    flat_dist[pending] = 0.0
+    queued = np.zeros(dist.size, dtype=bool)
+    queued[pending] = True
+    slot = np.zeros(dist.size, dtype=np.int32)  # scratch space to drop duplicates
+    if targets is not None:
+        nodes = [flat.node_id(*cell) for cell in targets if flat.is_walkable(*cell)]
+        targets = (np.arange(len(sources))[:, None] * n + np.array(nodes, dtype=np.int64)).ravel()
+
+    while len(pending):
+        d = flat_dist[pending]
+        lowest = d.min()
+        if targets is not None and not (flat_dist[targets] >= lowest).any():
+            break  # every target is below the frontier, so final
+        settled = d < lowest + 1.0
+        band, d = pending[settled], d[settled]
+        pending = pending[~settled]
+        queued[band] = False
+        node = band % n
+
+        reached = []
+        costs = []
+        for off, sides, cost in moves:
+            ok = walk[node + off]
+            for side in sides:
+                ok &= walk[node + side]
+            nb = band[ok] + off
+            cand = d[ok] + cost
+            better = cand < flat_dist[nb]
+            reached.append(nb[better])
+            costs.append(cand[better])
+        reached = np.concatenate(reached)
+        if len(reached):
+            costs = np.concatenate(costs)
+            np.minimum.at(flat_dist, reached, costs)
+            fresh = reached[~queued[reached]]
+            # Keep one copy of each node: only one write per node survives in slot
+            slot[fresh] = np.arange(len(fresh), dtype=np.int32)
+            fresh = fresh[slot[fresh] == np.arange(len(fresh), dtype=np.int32)]
+            queued[fresh] = True
+            pending = np.concatenate((pending, fresh))
+    return dist
+
+def distance_field(flat, goal, targets=None):
+    """Path length from every node (FlatGrid node ids) to goal; inf if unreachable"""
+    return distance_fields(flat, [goal], targets)[0]
+
+class FlowField:
+    def __init__(self, flat, goal):
+        self.flat = flat
+        self.version = flat.version
+        self.goal = goal
+        self.dist = distance_field(flat, goal)
+        # Best neighbour of every node (-1 at the goal and where unreachable)
+        walk = np.frombuffer(flat.walk, dtype=np.uint8).astype(bool)
+        n = len(walk)
+        inner = np.arange(flat.stride + 1, n - flat.stride - 1)
+        best = np.full(n, np.inf)
+        self.next = np.full(n, -1, dtype=np.int32)
+        for off, sides, cost in _moves(flat):
+            ok = walk[inner] & walk[inner + off]
+            for side in sides:
+                ok &= walk[inner + side]
+            through = np.where(ok, self.dist[inner + off] + cost, np.inf)
+            better = through < best[inner]
+            best[inner[better]] = through[better]
+            self.next[inner[better]] = inner[better] + off
+        self.next[~np.isfinite(self.dist)] = -1
+        if flat.is_walkable(*goal):
+            self.next[flat.node_id(*goal)] = -1
+
+    @property
+    def nbytes(self):
+        return self.dist.nbytes + self.next.nbytes
+
+    def distance(self, pos):
+        if not self.flat.in_bounds(*pos):
+            return np.inf
+        return float(self.dist[self.flat.node_id(*pos)])
+
+    def next_step(self, pos):
+        """Next cell from pos towards the goal, or None at the goal or if unreachable"""
+        if not self.flat.in_bounds(*pos):
+            return None
+        node = int(self.next[self.flat.node_id(*pos)])
+        return None if node < 0 else self.flat.coords(node)
+
+    def next_steps(self, cells):
+        """next_step for an (N, 2) array of cells; -1 rows where there is none"""
+        cells = np.asarray(cells, dtype=np.int64)
+        nodes = self.next[(cells[:, 0] + 1) * self.flat.stride + cells[:, 1] + 1].astype(np.int64)
+        px, py = np.divmod(nodes, self.flat.stride)
+        out = np.stack([px - 1, py - 1], axis=1)
+        out[nodes < 0] = -1
+        return out
+
+    def path(self, start):
+        """Path from start to the goal (start excluded), or [] like a_star"""
+        if not np.isfinite(self.distance(start)):
+            return []
+        path = []
+        stride = self.flat.stride
+        node = int(self.next[self.flat.node_id(*start)])
+        while node >= 0:
+            px, py = divmod(node, stride)
+            path.append((px - 1, py - 1))
+            node = int(self.next[node])
+        return path
+
+class FlowFieldCache:
+    def __init__(self, max_bytes=MAX_FIELD_BYTES):
+        self.max_bytes = max_bytes
+        self.fields = OrderedDict()  # (version, goal) -> FlowField
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, flat, goal):
+        """Field towards goal on the current state of flat, built on a miss"""
+        field = self.lookup(flat, goal)
+        if field is None:
+            field = FlowField(flat, goal)
+            self.add(field)
+        return field
+
+    def lookup(self, flat, goal):
+        """Cached field towards goal on the current state of flat, or None"""
+        key = (flat.version, goal)
+        field = self.fields.get(key)
+        if field is None:
+            self.misses += 1
+            return None
+        self.fields.move_to_end(key)
+        self.hits += 1
+        return field
+
+    def add(self, field):
+        key = (field.version, field.goal)
+        if key in self.fields:
+            return
+        self.fields[key] = field
+        self.bytes += field.nbytes
+        # Keep at least the field just built, even if it alone is over budget
+        while self.bytes > self.max_bytes and len(self.fields) > 1:
+            _, old = self.fields.popitem(last=False)
+            self.bytes -= old.nbytes
+
+    def clear(self):
+        self.fields.clear()
+        self.bytes = 0
@@ -0,0 +1,231 @@
+"""On-disk cache of classified walkability grids.
+
+Entries are .npy files (uint8, one byte per cell) named after a key built
+from the image content hash, TILE_SIZE and the classification thresholds,
+so a changed image or changed rule never hits an old entry. Grids of
+images too large to decode at once are streamed by strip_loader straight
+into a BitGrid file (.bits, one bit per cell) instead. Old entries are
+removed by the size-bounded LRU eviction. Other per-grid arrays
+(landmark tables) share the directory and the eviction.
+"""
+import hashlib
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+import map_loader
+from bitgrid import BitGrid
+
+ENTRY_SUFFIXES = (".npy", ".bits")
+
+CACHE_DIR = os.environ.get(
+    "SMARTKURIR_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "smartkurir", "grids"),
+)
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Bump when the file layout or classification code changes, or entries of a
+# new kind share the directory (2: terrain cost, .bits and landmark entries)
+FORMAT_VERSION = 2
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of the raw file bytes (no image decoding)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(content_hash, tile_size=map_loader.TILE_SIZE,
+              threshold=map_loader.WALKABLE_RATIO, sampled=False, costs=False):
+    mode = "sampled" if sampled else "ratio"
+    if costs:
+        mode = "cost%d" % map_loader.COST_LEVELS
+    parts = [
+        FORMAT_VERSION, content_hash, tile_size, mode,
+        map_loader.GRAY_MIN, map_loader.GRAY_MAX, repr(float(threshold)),
+    ]
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+class GridCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path_for(self, key, suffix=".npy"):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, dtype=np.uint8):
+        """2D array (a grid by default) for key, or None.
+
+        The file is mapped copy-on-write: nothing is read until used, and
+        writes (road closures) stay private to this process.
+        """
+        path = self.path_for(key)
+        try:
+            cells = np.load(path, mmap_mode="c")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Truncated or corrupt entry: drop it and recompute
+            self._remove(path)
+            return None
+        if cells.dtype != dtype or cells.ndim != 2:
+            self._remove(path)
+            return None
+        self._touch(path)
+        return cells
+
+    def get_bits(self, key):
+        """BitGrid stored under key, mapped copy-on-write like get(), or None"""
+        path = self.path_for(key, ".bits")
+        try:
+            grid = BitGrid.load(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error):
+            self._remove(path)
+            return None
+        self._touch(path)
+        return grid
+
+    def put(self, key, cells, dtype=np.uint8):
+        """Store a grid (or other 2D array) atomically, then trim the directory to max_bytes"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(cells, dtype=dtype))
+            os.replace(tmp_path, self.path_for(key))
+        except OSError:
+            return  # caching is best effort; loading must still work
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        entries = []
+        total = 0
+        for name in names:
+            if not name.endswith(ENTRY_SUFFIXES):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(ENTRY_SUFFIXES + (".tmp",)):
+                self._remove(os.path.join(self.directory, name))
+
+    def _touch(self, path):
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except OSError:
+            pass
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def load_cells(self, filepath, tile_size=map_loader.TILE_SIZE,
+                   threshold=map_loader.WALKABLE_RATIO, sampled=False):
+        """Grid of an image file: a uint8 array (0 = walkable), or a BitGrid for
+        images too large to decode at once; decodes and classifies only on a miss"""
+        key = cache_key(file_hash(filepath), tile_size, threshold, sampled)
+        cells = self.get(key)
+        if cells is None:
+            cells = self.get_bits(key)
+        if cells is None:
+            # Only needed on a miss; keeps PIL and the process pool out of headless startup
+            from PIL import Image
+            import strip_loader
+            with Image.open(filepath) as img:
+                streamed = img.size[0] * img.size[1] > strip_loader.STREAM_MIN_PIXELS
+                if not streamed:
+                    pixels = map_loader.image_to_array(img)
+            if streamed:
+                # Too big to decode at once: classify strip by strip into the cache
+                return self._ingest(key, filepath, tile_size=tile_size, threshold=threshold, sampled=sampled)
+            if sampled:
+                cells = map_loader.classify_sampled(pixels, tile_size)
+            else:
+                cells = map_loader.classify_tiles(pixels, tile_size, threshold)
+            self.put(key, cells)
+        return cells
+
+    def _ingest(self, key, filepath, **options):
+        """strip_loader.ingest into a new .bits entry, reopened copy-on-write"""
+        import strip_loader
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            os.close(fd)
+            grid = strip_loader.ingest(filepath, tmp_path, **options)
+            if isinstance(grid.bits, np.memmap):
+                grid.bits.flush()
+            del grid
+            os.replace(tmp_path, self.path_for(key, ".bits"))
+        except OSError:
+            return strip_loader.ingest(filepath, **options)  # caching is best effort
+        self.evict()
+        return self.get_bits(key) or strip_loader.ingest(filepath, **options)
+
+    def load_map(self, filepath, tile_size=map_loader.TILE_SIZE,
+                 threshold=map_loader.WALKABLE_RATIO, image=None):
+        """(load_cells, terrain cost levels) of an image file. On a miss both are
+        classified from one decode (of image, the already decoded file, if
+        given). Costs are None for images too large to decode at once."""
+        content_hash = file_hash(filepath)
+        key = cache_key(content_hash, tile_size, threshold)
+        costs_key = cache_key(content_hash, tile_size, threshold, costs=True)
+        cells = self.get(key)
+        levels = self.get(costs_key)
+        if cells is None or levels is None:
+            if cells is None:
+                cells = self.get_bits(key)
+            if image is None:
+                from PIL import Image
+                import strip_loader
+                with Image.open(filepath) as img:
+                    if img.size[0] * img.size[1] > strip_loader.STREAM_MIN_PIXELS:
+                        if cells is None:
+                            cells = self._ingest(key, filepath, tile_size=tile_size, threshold=threshold)
+                        return cells, None
+                    pixels = map_loader.image_to_array(img)
+            else:
+                pixels = map_loader.image_to_array(image)
+            tiles, levels = map_loader.classify_map(pixels, tile_size, threshold)
+            if cells is None:
+                cells = tiles
+                self.put(key, cells)
+            self.put(costs_key, levels)
+        return cells, levels
+
+    def load_costs(self, filepath, tile_size=map_loader.TILE_SIZE, threshold=map_loader.WALKABLE_RATIO):
+        """Terrain cost levels (map_loader.classify_costs) of an image file; classifies
+        only on a miss. None for images too large to decode at once."""
+        return self.load_map(filepath, tile_size, threshold)[1]
+
+default_cache = GridCache()
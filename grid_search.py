@@ -0,0 +1,212 @@
+"""A* on a flat, padded walkability buffer with integer node ids.
+
+Cells are stored column-major with a one-cell obstacle border, so node
+ids sort in the same order as (x, y) tuples. Ties in the open set are
+therefore broken exactly like the old PriorityQueue of (f, (x, y)) and
+the returned paths are identical to the previous implementations.
+
+On the bundled 100 x 70 maps this is about 3-4.5x faster than that
+PriorityQueue search (benchmark.py reports the "speedup" per map), short
+of the 10x once aimed for: most of the time is now the heapq calls and
+neighbour tests themselves, and very short searches are dominated by
+setting up the score lists.
+"""
+import heapq
+import itertools
+import math
+import time
+
+import numpy as np
+
+import instrument
+
+SQRT2 = math.sqrt(2)
+
+# Same neighbour order as the original a_star functions
+DIRECTIONS_4 = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+CARDINALS_8 = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+DIAGONALS_8 = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+# Above this many nodes a_star keeps its scores in dicts instead of
+# lists as long as the grid (a 20,000 x 20,000 map would need gigabytes)
+DENSE_NODES = 1 << 22
+
+class _Scores(dict):
+    """g scores of the nodes seen so far; unseen nodes are at infinity"""
+    def __missing__(self, node):
+        return math.inf
+
+# Versions are unique across all grids, so (version) alone identifies a
+# grid state in caches even after a new map is loaded
+_versions = itertools.count(1)
+
+class FlatGrid:
+    """Walkability of a grid (0 = walkable) as a padded bytearray"""
+    def __init__(self, grid):
+        cells = np.asarray(grid, dtype=np.uint8)
+        if cells.ndim != 2:
+            cells = cells.reshape(0, 0)
+        self.height, self.width = cells.shape
+        self.stride = self.height + 2
+        padded = np.pad(cells == 0, 1, constant_values=False)
+        # Transpose so consecutive ids walk down a column
+        self.walk = bytearray(np.ascontiguousarray(padded.T, dtype=np.uint8).tobytes())
+        self.version = next(_versions)
+
+    @classmethod
+    def from_walk(cls, walk, width, height):
+        """FlatGrid over an existing padded walk buffer (e.g. a read-only mmap of another grid's walk)"""
+        flat = cls.__new__(cls)
+        flat.width, flat.height = width, height
+        flat.stride = height + 2
+        flat.walk = walk
+        flat.version = next(_versions)
+        return flat
+
+    def node_id(self, x, y):
+        return (x + 1) * self.stride + (y + 1)
+
+    def coords(self, node):
+        px, py = divmod(node, self.stride)
+        return px - 1, py - 1
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_walkable(self, x, y):
+        return self.in_bounds(x, y) and self.walk[self.node_id(x, y)] == 1
+
+    def rows(self, y0, y1):
+        """Cells of rows y0..y1-1 as a uint8 array (0 = walkable), like BitGrid.rows"""
+        columns = np.frombuffer(self.walk, dtype=np.uint8).reshape(self.width + 2, self.stride)
+        return (columns[1:-1, 1 + y0:1 + min(y1, self.height)].T == 0).astype(np.uint8)
+
+    def walk_array(self, padded=False):
+        """Walkability as a (height, width) bool array, optionally with the border"""
+        walk = np.frombuffer(bytes(self.walk), dtype=np.uint8)
+        walk = walk.reshape(self.width + 2, self.stride).T.astype(bool)
+        return walk if padded else walk[1:-1, 1:-1]
+
+    def set_walkable(self, x, y, walkable):
+        """Change one cell; returns True if it changed (and bumps version)"""
+        node = self.node_id(x, y)
+        value = 1 if walkable else 0
+        if self.walk[node] == value:
+            return False
+        self.walk[node] = value
+        self.version = next(_versions)
+        return True
+
+    def offset(self, dx, dy):
+        """Id difference between a node and its (dx, dy) neighbour"""
+        return dx * self.stride + dy
+
+def as_flat_grid(grid):
+    # FlatGrid and bitgrid.BitGrid are used as they are
+    return grid if hasattr(grid, "node_id") else FlatGrid(grid)
+
+def reconstruct(flat, came_from, start, goal):
+    path = []
+    node = goal
+    while node != start:
+        path.append(flat.coords(node))
+        node = came_from[node]
+    return path[::-1]
+
+def a_star(flat, start, goal, diagonal=True, stats=None, heuristic=None):
+    """Path from start to goal (start excluded), or [] if there is none.
+
+    diagonal=True is the 8-connected search of Final.a_star (no corner
+    cutting, sqrt(2) diagonals); diagonal=False is program.a_star. If
+    stats is a dict, it receives the nodes expanded, heap pushes, the
+    peak open-set size and the wall time in ms; with instrument enabled
+    these are also recorded as a "search" record. heuristic, if given,
+    is indexed by node id and gives the estimate to goal (a list, or see
+    landmarks.LandmarkTable.heuristic); the default is the Manhattan
+    distance both apps used.
+    """
+    if stats is None and instrument.enabled:
+        stats = {}
+    track = stats is not None
+    if track:
+        began = time.perf_counter()
+        stats.update(expanded=0, pushes=0, peak_open=0, ms=0.0)
+    if not (flat.in_bounds(*start) and flat.is_walkable(*goal)):
+        if track:
+            _finish(stats, 0, 0, 0, 0, began, False)
+        return []
+    stride = flat.stride
+    walk = flat.walk
+    s = flat.node_id(*start)
+    t = flat.node_id(*goal)
+    gx, gy = divmod(t, stride)
+
+    if diagonal:
+        straight = [(flat.offset(dx, dy), dx, dy) for dx, dy in CARDINALS_8]
+        diagonals = [(flat.offset(dx, dy), flat.offset(dx, 0), flat.offset(0, dy), dx, dy)
+                     for dx, dy in DIAGONALS_8]
+    else:
+        straight = [(flat.offset(dx, dy), dx, dy) for dx, dy in DIRECTIONS_4]
+        diagonals = []
+
+    if len(walk) <= DENSE_NODES:
+        g_score = [math.inf] * len(walk)
+        came_from = [-1] * len(walk)
+    else:
+        g_score = _Scores()
+        came_from = {}
+    g_score[s] = 0
+    # (f, node, g); entries whose g is worse than g_score are stale and skipped
+    open_set = [(0, s, 0)]
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    h = heuristic
+    expanded = 0
+    stale = 0
+    peak = 1
+
+    while open_set:
+        if track and len(open_set) > peak:
+            peak = len(open_set)
+        _, current, g = heappop(open_set)
+        if current == t:
+            if track:
+                _finish(stats, expanded, stale + 1, len(open_set), peak, began, True)
+            return reconstruct(flat, came_from, s, t)
+        if g > g_score[current]:
+            stale += 1
+            continue
+        expanded += 1
+        cx, cy = divmod(current, stride)
+        cx -= gx
+        cy -= gy
+
+        for off, dx, dy in straight:
+            neighbor = current + off
+            if walk[neighbor]:
+                tentative_g = g + 1
+                if tentative_g < g_score[neighbor]:
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    estimate = h[neighbor] if h is not None else abs(cx + dx) + abs(cy + dy)
+                    heappush(open_set, (tentative_g + estimate, neighbor, tentative_g))
+
+        for off, off_x, off_y, dx, dy in diagonals:
+            neighbor = current + off
+            if walk[neighbor] and walk[current + off_x] and walk[current + off_y]:
+                tentative_g = g + SQRT2
+                if tentative_g < g_score[neighbor]:
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    estimate = h[neighbor] if h is not None else abs(cx + dx) + abs(cy + dy)
+                    heappush(open_set, (tentative_g + estimate, neighbor, tentative_g))
+    if track:
+        _finish(stats, expanded, stale, len(open_set), peak, began, False)
+    return []
+
+def _finish(stats, expanded, other_pops, still_open, peak, began, found):
+    # Every push was either popped (expanded, stale or the goal) or is still queued
+    stats.update(expanded=expanded, pushes=expanded + other_pops + still_open,
+                 peak_open=peak, ms=(time.perf_counter() - began) * 1000)
+    if instrument.enabled:
+        instrument.record("search", found=found, **stats)
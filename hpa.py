@@ -0,0 +1,266 @@
+"""Hierarchical pathfinding (HPA*) on top of a FlatGrid.
+
+The grid is cut into square clusters. Where two neighbouring clusters
+share an open stretch of border, one or two entrance pairs are placed
+on it; inside every cluster the distances between its entrance cells
+are precomputed together with the paths. A query connects start and
+goal to the entrances of their own clusters, searches the small
+abstract graph, and expands each abstract edge with the stored paths.
+
+Paths follow the rules of Final.a_star (8 directions, no corner
+cutting) but are only near-optimal: they must cross cluster borders at
+entrance cells.
+"""
+import heapq
+import math
+
+from grid_search import SQRT2, CARDINALS_8, DIAGONALS_8
+from jps import octile
+
+CLUSTER_SIZE = 16
+# Open border stretches at least this long get an entrance at each end
+MAX_SINGLE_ENTRANCE = 6
+
+class HierarchicalGrid:
+    def __init__(self, flat, cluster_size=CLUSTER_SIZE):
+        self.flat = flat
+        self.size = cluster_size
+        self.clusters_x = -(-flat.width // cluster_size)
+        self.clusters_y = -(-flat.height // cluster_size)
+        self.borders = {}        # border key -> [(cell, cell), ...]
+        self.inter = {}          # cell -> set of cells across a border
+        self.intra = {}          # cluster -> {cell: {cell: cost}}
+        self.paths = {}          # cluster -> {(cell, cell): cells after the first}
+        for cy in range(self.clusters_y):
+            for cx in range(self.clusters_x):
+                if cx + 1 < self.clusters_x:
+                    self._build_border(("v", cx, cy))
+                if cy + 1 < self.clusters_y:
+                    self._build_border(("h", cx, cy))
+        for c in range(self.clusters_x * self.clusters_y):
+            self._build_cluster(c)
+        self.version = flat.version
+
+    # -- structure -------------------------------------------------------
+
+    def cluster_of(self, node):
+        x, y = self.flat.coords(node)
+        return (y // self.size) * self.clusters_x + x // self.size
+
+    def _bounds(self, cluster):
+        cy, cx = divmod(cluster, self.clusters_x)
+        x0, y0 = cx * self.size, cy * self.size
+        return x0, y0, min(x0 + self.size, self.flat.width), min(y0 + self.size, self.flat.height)
+
+    def _cluster_borders(self, cluster):
+        cy, cx = divmod(cluster, self.clusters_x)
+        keys = []
+        if cx > 0:
+            keys.append(("v", cx - 1, cy))
+        if cx + 1 < self.clusters_x:
+            keys.append(("v", cx, cy))
+        if cy > 0:
+            keys.append(("h", cx, cy - 1))
+        if cy + 1 < self.clusters_y:
+            keys.append(("h", cx, cy))
+        return keys
+
+    def _build_border(self, key):
+        """(Re)place the entrance pairs on one border between two clusters"""
+        for a, b in self.borders.get(key, ()):
+            self.inter[a].discard(b)
+            self.inter[b].discard(a)
+        flat = self.flat
+        kind, cx, cy = key
+        x0, y0, x1, y1 = self._bounds(cy * self.clusters_x + cx)
+        if kind == "v":
+            cells = [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        else:
+            cells = [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+
+        pairs = []
+        run = []
+        for a, b in cells + [(None, None)]:
+            if a is not None and flat.is_walkable(*a) and flat.is_walkable(*b):
+                run.append((flat.node_id(*a), flat.node_id(*b)))
+                continue
+            if len(run) >= MAX_SINGLE_ENTRANCE:
+                pairs += [run[0], run[-1]]
+            elif run:
+                pairs.append(run[len(run) // 2])
+            run = []
+        self.borders[key] = pairs
+        for a, b in pairs:
+            self.inter.setdefault(a, set()).add(b)
+            self.inter.setdefault(b, set()).add(a)
+
+    def _build_cluster(self, cluster):
+        """Distances and paths between every pair of entrance cells inside one cluster"""
+        nodes = set()
+        for key in self._cluster_borders(cluster):
+            for a, b in self.borders[key]:
+                nodes.add(a if self.cluster_of(a) == cluster else b)
+        table = {}
+        paths = {}
+        for node in nodes:
+            dist, parent = self._cluster_search(node, cluster, targets=nodes)
+            table[node] = {other: dist[other] for other in nodes if other != node and other in dist}
+            for other in table[node]:
+                paths[(node, other)] = _trace(parent, node, other)
+        self.intra[cluster] = table
+        self.paths[cluster] = paths
+
+    def _cluster_search(self, source, cluster, targets=()):
+        """Dijkstra from source limited to one cluster, until targets are settled"""
+        flat = self.flat
+        walk = flat.walk
+        stride = flat.stride
+        x0, y0, x1, y1 = self._bounds(cluster)
+        moves = [(flat.offset(dx, dy), dx, dy, 0, 0, 1) for dx, dy in CARDINALS_8]
+        moves += [(flat.offset(dx, dy), dx, dy, flat.offset(dx, 0), flat.offset(0, dy), SQRT2)
+                  for dx, dy in DIAGONALS_8]
+        remaining = len(targets)
+        dist = {source: 0}
+        parent = {}
+        done = set()
+        heap = [(0, source)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            if node in targets:
+                remaining -= 1
+                if remaining == 0:
+                    break
+            x, y = divmod(node, stride)
+            x -= 1
+            y -= 1
+            for off, dx, dy, off_x, off_y, cost in moves:
+                if not (x0 <= x + dx < x1 and y0 <= y + dy < y1):
+                    continue
+                nb = node + off
+                if not walk[nb] or (off_x and not (walk[node + off_x] and walk[node + off_y])):
+                    continue
+                nd = d + cost
+                if nd < dist.get(nb, math.inf):
+                    dist[nb] = nd
+                    parent[nb] = node
+                    heapq.heappush(heap, (nd, nb))
+        return {n: dist[n] for n in done}, parent
+
+    # -- updates -----------------------------------------------------------
+
+    def set_cell(self, x, y):
+        """Rebuild only the clusters a change of cell (x, y) can affect; the
+        caller has already opened or blocked it in flat (Router.set_closed)"""
+        flat = self.flat
+        node = flat.node_id(x, y)
+        cluster = self.cluster_of(node)
+        x0, y0, x1, y1 = self._bounds(cluster)
+        on_edge = []
+        for key in self._cluster_borders(cluster):
+            kind, cx, cy = key
+            left_or_top = cy * self.clusters_x + cx == cluster
+            if kind == "v" and x == (x1 - 1 if left_or_top else x0):
+                on_edge.append(key)
+            elif kind == "h" and y == (y1 - 1 if left_or_top else y0):
+                on_edge.append(key)
+        rebuild = {cluster}
+        for key in on_edge:
+            kind, cx, cy = key
+            self._build_border(key)
+            rebuild.add(cy * self.clusters_x + cx)
+            rebuild.add((cy + (kind == "h")) * self.clusters_x + cx + (kind == "v"))
+        for c in rebuild:
+            self._build_cluster(c)
+        self.version = flat.version
+
+    # -- queries -----------------------------------------------------------
+
+    def find_path(self, start, goal, stats=None):
+        """Near-optimal path (start excluded) in the format of a_star, or [].
+
+        If stats is a dict it receives the abstract nodes expanded, the path
+        cost, and cost / octile distance as an upper bound on suboptimality.
+        """
+        flat = self.flat
+        if stats is not None:
+            stats.update(expanded=0, cost=0.0, bound_ratio=1.0)
+        if start == goal or not (flat.is_walkable(*start) and flat.is_walkable(*goal)):
+            return []
+        s = flat.node_id(*start)
+        t = flat.node_id(*goal)
+        s_cluster = self.cluster_of(s)
+        t_cluster = self.cluster_of(t)
+        s_nodes = set(self.intra[s_cluster])
+        t_nodes = set(self.intra[t_cluster])
+        if s_cluster == t_cluster:
+            s_nodes.add(t)
+        s_edges, s_parent = self._cluster_search(s, s_cluster, targets=s_nodes)
+        t_edges, t_parent = self._cluster_search(t, t_cluster, targets=t_nodes)
+        s_edges.pop(s, None)
+
+        stride = flat.stride
+        gx, gy = divmod(t, stride)
+        g_score = {s: 0}
+        came_from = {}
+        open_set = [(0, s, 0)]
+        expanded = 0
+        while open_set:
+            _, u, g = heapq.heappop(open_set)
+            if u == t:
+                break
+            if g > g_score[u]:
+                continue
+            expanded += 1
+            if u == s:
+                edges = [(v, c) for v, c in s_edges.items() if v in s_nodes]
+            else:
+                edges = list(self.intra[self.cluster_of(u)].get(u, {}).items())
+            edges += [(v, 1) for v in self.inter.get(u, ())]
+            if u in t_edges and u != s:
+                edges.append((t, t_edges[u]))
+            for v, cost in edges:
+                tentative_g = g + cost
+                if tentative_g < g_score.get(v, math.inf):
+                    g_score[v] = tentative_g
+                    came_from[v] = u
+                    vx, vy = divmod(v, stride)
+                    heapq.heappush(open_set, (tentative_g + octile(gx - vx, gy - vy), v, tentative_g))
+        else:
+            if stats is not None:
+                stats["expanded"] = expanded
+            return []
+
+        abstract = [t]
+        while abstract[-1] != s:
+            abstract.append(came_from[abstract[-1]])
+        abstract.reverse()
+
+        # Refine: every abstract edge is a border step or a stored/traced segment
+        cells = []
+        for a, b in zip(abstract, abstract[1:]):
+            if b in self.inter.get(a, ()):
+                cells.append(b)
+            elif a == s:
+                cells += _trace(s_parent, s, b)
+            elif b == t:
+                cells += _trace(t_parent, t, a)[-2::-1] + [t]
+            else:
+                cells += self.paths[self.cluster_of(a)][(a, b)]
+        path = [flat.coords(node) for node in cells]
+
+        if stats is not None:
+            stats["expanded"] = expanded
+            stats["cost"] = g_score[t]
+            stats["bound_ratio"] = g_score[t] / octile(gx - s // stride, gy - s % stride)
+        return path
+
+def _trace(parent, source, node):
+    """Cells from source (excluded) to node along a search parent map"""
+    cells = []
+    while node != source:
+        cells.append(node)
+        node = parent[node]
+    return cells[::-1]
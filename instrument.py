@@ -0,0 +1,77 @@
+"""Optional performance records for searches, frames and map loads.
+
+Nothing is measured until enable() is called: instrumented call sites
+check the module-level `enabled` flag first, so the cost when disabled
+is one global lookup per call. Records are plain dicts ({"kind": ...,
+"t": unix time, ...}) kept in a bounded ring, optionally appended to a
+JSON lines file as they come, and exportable later with export().
+"""
+import json
+import time
+from collections import deque
+
+MAX_RECORDS = 10000
+
+enabled = False
+records = deque(maxlen=MAX_RECORDS)
+latest = {}  # kind -> most recent record
+_log = None
+
+def enable(log_path=None):
+    """Start recording; with log_path, also append every record to that file"""
+    global enabled, _log
+    disable()
+    if log_path is not None:
+        _log = open(log_path, "a", encoding="utf-8")
+    enabled = True
+
+def disable():
+    global enabled, _log
+    enabled = False
+    if _log is not None:
+        _log.close()
+        _log = None
+
+def clear():
+    records.clear()
+    latest.clear()
+
+def record(kind, **fields):
+    entry = {"kind": kind, "t": time.time()}
+    entry.update(fields)
+    records.append(entry)
+    latest[kind] = entry
+    if _log is not None:
+        _log.write(json.dumps(entry) + "\n")
+        _log.flush()
+    return entry
+
+def export(path, kinds=None):
+    """Write the kept records (optionally only some kinds) as JSON lines; returns the count"""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in list(records):
+            if kinds is None or entry["kind"] in kinds:
+                f.write(json.dumps(entry) + "\n")
+                count += 1
+    return count
+
+def overlay_text():
+    """Short multi-line summary of the latest records, for an on-screen overlay"""
+    lines = []
+    frame = latest.get("frame")
+    if frame:
+        lines.append("Frame: %.2f ms, %d item, %d tick terbuang"
+                     % (frame["draw_ms"], frame["items"], frame["dropped_ticks"]))
+    plan = latest.get("plan")
+    if plan:
+        lines.append("Rute (%s): %.2f ms%s" % (plan["planner"], plan["ms"], ", cache" if plan["cached"] else ""))
+    search = latest.get("search")
+    if search:
+        lines.append("A*: %d ekspansi, %d push, open maks %d, %.2f ms"
+                     % (search["expanded"], search["pushes"], search["peak_open"], search["ms"]))
+    load = latest.get("map_load")
+    if load:
+        lines.append("Load peta: decode %.0f ms, klasifikasi %.0f ms, indeks %.0f ms"
+                     % (load["decode_ms"], load["classify_ms"], load["index_ms"]))
+    return "\n".join(lines) or "Belum ada data"
@@ -0,0 +1,243 @@
+"""Jump Point Search (JPS+) for the 8-connected planner.
+
+Uses the same move rules as Final.a_star: diagonals cost sqrt(2) and are
+only allowed when both adjacent cardinal cells are walkable (no corner
+cutting). JumpTable precomputes, for every cell and cardinal direction,
+the distance to the next jump point (positive) or to the wall
+(zero/negative). The table only depends on the grid, so one table serves
+every query on the same map.
+"""
+import heapq
+import math
+from array import array
+
+import numpy as np
+
+import grid_search
+from grid_search import SQRT2
+from landmarks import octile_heuristic
+
+CARDINALS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+DIAGONALS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+def octile(dx, dy):
+    dx = abs(dx)
+    dy = abs(dy)
+    return (dx + dy) + (SQRT2 - 2) * min(dx, dy)
+
+def _sign(v):
+    return (v > 0) - (v < 0)
+
+def _forced(walk, dx, dy):
+    """Cells with a forced neighbour when entered moving in cardinal (dx, dy).
+
+    Moving along x, side cell (x, y+s) is forced when it is open but the
+    cell behind it (x-dx, y+s) is blocked, because no corner-cutting path
+    from the parent can reach it without passing through this cell.
+    """
+    forced = np.zeros_like(walk)
+    h, w = walk.shape
+    inner = walk[1:h - 1, 1:w - 1]
+    if dx:
+        for s in (-1, 1):
+            side = walk[1 + s:h - 1 + s, 1:w - 1]
+            behind = walk[1 + s:h - 1 + s, 1 - dx:w - 1 - dx]
+            forced[1:h - 1, 1:w - 1] |= inner & side & ~behind
+    else:
+        for s in (-1, 1):
+            side = walk[1:h - 1, 1 + s:w - 1 + s]
+            behind = walk[1 - dy:h - 1 - dy, 1 + s:w - 1 + s]
+            forced[1:h - 1, 1:w - 1] |= inner & side & ~behind
+    return forced
+
+def _sweep(walk, forced, axis, step):
+    """Jump distances along one axis of the padded (h, w) walk array"""
+    dist = np.zeros(walk.shape, dtype=np.int32)
+    n = walk.shape[axis]
+    order = range(n - 2, -1, -1) if step > 0 else range(1, n)
+    for i in order:
+        j = i + step
+        if axis == 1:
+            nxt_walk, nxt_forced, nxt_dist = walk[:, j], forced[:, j], dist[:, j]
+        else:
+            nxt_walk, nxt_forced, nxt_dist = walk[j], forced[j], dist[j]
+        row = np.where(nxt_dist > 0, nxt_dist + 1, nxt_dist - 1)
+        row = np.where(nxt_forced, 1, row)
+        row = np.where(nxt_walk, row, 0)
+        if axis == 1:
+            dist[:, i] = row
+        else:
+            dist[i] = row
+    return dist
+
+class JumpTable:
+    """Per-grid JPS+ tables, indexed by FlatGrid node id"""
+    def __init__(self, flat):
+        self.flat = flat
+        self.version = flat.version
+        walk = flat.walk_array(padded=True)
+        self.dist = {}
+        for dx, dy in CARDINALS:
+            forced = _forced(walk, dx, dy)
+            if dx:
+                dist = _sweep(walk, forced, 1, dx)
+            else:
+                dist = _sweep(walk, forced, 0, dy)
+            self.dist[(dx, dy)] = array("i", np.ascontiguousarray(dist.T).tobytes())
+
+def jps(flat, start, goal, table=None, stats=None):
+    """Optimal octile path from start to goal (start excluded), or [].
+
+    Returns the same cell-by-cell format as grid_search.a_star; table is
+    a JumpTable for flat and is built on the fly when omitted.
+    """
+    if stats is not None:
+        stats["expanded"] = 0
+    if not (flat.in_bounds(*start) and flat.is_walkable(*goal)):
+        return []
+    if table is None or table.flat is not flat or table.version != flat.version:
+        table = JumpTable(flat)
+    stride = flat.stride
+    walk = flat.walk
+    s = flat.node_id(*start)
+    t = flat.node_id(*goal)
+    if s == t:
+        return []
+    gx, gy = divmod(t, stride)
+    dist = table.dist
+
+    def straight(node, x, y, dx, dy):
+        """Jump point (or goal) reached moving along a cardinal, or -1"""
+        k = dist[(dx, dy)][node]
+        reach = k if k > 0 else -k
+        if dx:
+            i = (gx - x) * dx
+            if gy == y and 0 < i <= reach:
+                return t
+        else:
+            i = (gy - y) * dy
+            if gx == x and 0 < i <= reach:
+                return t
+        if k > 0:
+            return node + k * (dx * stride + dy)
+        return -1
+
+    def diagonal(node, x, y, dx, dy):
+        """Jump point (or goal) reached moving along a diagonal, or -1"""
+        ox = dx * stride
+        while walk[node + ox] and walk[node + dy] and walk[node + ox + dy]:
+            node += ox + dy
+            x += dx
+            y += dy
+            if node == t:
+                return t
+            if straight(node, x, y, dx, 0) >= 0 or straight(node, x, y, 0, dy) >= 0:
+                return node
+        return -1
+
+    g_score = {s: 0}
+    came_from = {}
+    open_set = [(octile(gx - divmod(s, stride)[0], gy - s % stride), s, 0)]
+    expanded = 0
+    while open_set:
+        _, current, g = heapq.heappop(open_set)
+        if current == t:
+            break
+        if g > g_score[current]:
+            continue
+        expanded += 1
+        x, y = divmod(current, stride)
+        parent = came_from.get(current)
+        if parent is None:
+            dirs = CARDINALS + DIAGONALS
+        else:
+            px, py = divmod(parent, stride)
+            dirs = _pruned_directions(walk, stride, current, _sign(x - px), _sign(y - py))
+
+        for dx, dy in dirs:
+            if dx and dy:
+                jp = diagonal(current, x, y, dx, dy)
+            elif walk[current + dx * stride + dy]:
+                jp = straight(current, x, y, dx, dy)
+            else:
+                jp = -1
+            if jp < 0:
+                continue
+            jx, jy = divmod(jp, stride)
+            tentative_g = g + octile(jx - x, jy - y)
+            if tentative_g < g_score.get(jp, math.inf):
+                g_score[jp] = tentative_g
+                came_from[jp] = current
+                heapq.heappush(open_set, (tentative_g + octile(gx - jx, gy - jy), jp, tentative_g))
+    else:
+        t = -1
+    if stats is not None:
+        stats["expanded"] = expanded
+    if t < 0:
+        return []
+
+    jump_points = [t]
+    while jump_points[-1] != s:
+        jump_points.append(came_from[jump_points[-1]])
+    jump_points.reverse()
+    return expand_path(flat, jump_points)
+
+def _pruned_directions(walk, stride, node, dx, dy):
+    """Natural and forced successor directions after arriving with (dx, dy)"""
+    ox = dx * stride
+    dirs = []
+    if dx and dy:
+        open_x = walk[node + ox]
+        open_y = walk[node + dy]
+        if open_x:
+            dirs.append((dx, 0))
+        if open_y:
+            dirs.append((0, dy))
+        if open_x and open_y:
+            dirs.append((dx, dy))
+    elif dx:
+        for s in (-1, 1):
+            if walk[node + s] and not walk[node - ox + s]:
+                dirs.append((0, s))
+                dirs.append((dx, s))
+        dirs.append((dx, 0))
+    else:
+        for s in (-1, 1):
+            side = s * stride
+            if walk[node + side] and not walk[node - dy + side]:
+                dirs.append((s, 0))
+                dirs.append((s, dy))
+        dirs.append((0, dy))
+    return dirs
+
+def expand_path(flat, jump_points):
+    """Cell-by-cell path through a list of jump point ids (first one excluded)"""
+    path = []
+    for a, b in zip(jump_points, jump_points[1:]):
+        x, y = flat.coords(a)
+        bx, by = flat.coords(b)
+        dx, dy = _sign(bx - x), _sign(by - y)
+        while (x, y) != (bx, by):
+            x += dx
+            y += dy
+            path.append((x, y))
+    return path
+
+def expansion_report(flat, table, pairs):
+    """Mean nodes expanded per query by jps and by a_star with the octile heuristic.
+
+    Both find optimal routes, so octile A* is the fair baseline ("ratio"
+    is how many times fewer nodes JPS expands). JPS still expands about
+    one node per turn of the route, so the ratio grows with route length:
+    on map/mapy.png it is ~6x at TILE_SIZE 10 (100 x 70 cells, routes of
+    ~30 cells) and 16x / 40x at tile sizes 5 / 2.
+    """
+    report = {"jps": 0.0, "octile": 0.0}
+    stats = {}
+    for start, goal in pairs:
+        jps(flat, start, goal, table, stats=stats)
+        report["jps"] += stats["expanded"] / max(len(pairs), 1)
+        grid_search.a_star(flat, start, goal, stats=stats, heuristic=octile_heuristic(flat, goal).tolist())
+        report["octile"] += stats["expanded"] / max(len(pairs), 1)
+    report["ratio"] = report["octile"] / report["jps"] if report["jps"] else 0.0
+    return report
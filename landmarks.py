@@ -0,0 +1,158 @@
+"""ALT heuristic (A*, landmarks, triangle inequality) for grid_search.a_star.
+
+A few landmark cells are picked far apart (each one the cell farthest
+from those chosen so far) and exact distances from every landmark to
+every cell are precomputed. For any cell n and goal t, the triangle
+inequality gives |d(L, t) - d(L, n)| <= d(n, t), so the largest of these
+differences is an admissible heuristic; it is combined with the octile
+distance, which is admissible for the same 8-connected move rules.
+
+Tables are float32, one row per landmark in FlatGrid node order, and are
+stored in the grid cache under a key built from the grid content. A
+query only reads the columns of the nodes A* actually reaches.
+
+Closing a road cell only makes distances longer, so bounds from a table
+built before the closure stay admissible: the table is kept across
+closures (and the reopening of those cells) instead of being rebuilt.
+"""
+import hashlib
+import math
+import random
+import numpy as np
+from flow_field import distance_field
+import grid_search
+from grid_search import SQRT2
+import grid_cache
+from grid_cache import default_cache
+
+NUM_LANDMARKS = 8
+
+# Bump when the table layout or landmark selection changes
+FORMAT_VERSION = 1
+
+def select_landmarks(flat, k, rng=random):
+    """Up to k far-apart walkable cells and their distance rows (float64)"""
+    free = np.flatnonzero(np.frombuffer(flat.walk, dtype=np.uint8))
+    if not len(free) or k <= 0:
+        return [], []
+    seed = int(free[rng.randrange(len(free))])
+    nearest = distance_field(flat, flat.coords(seed))
+    landmarks, rows = [], []
+    for _ in range(k):
+        reachable = np.isfinite(nearest)
+        if not reachable.any() or nearest[reachable].max() == 0 and landmarks:
+            break
+        node = int(np.flatnonzero(reachable)[nearest[reachable].argmax()])
+        row = distance_field(flat, flat.coords(node))
+        landmarks.append(flat.coords(node))
+        rows.append(row)
+        nearest = row if len(rows) == 1 else np.minimum(nearest, row)
+    return landmarks, rows
+
+def octile_heuristic(flat, goal):
+    """Octile distance to goal for every node (admissible without landmarks)"""
+    nodes = np.arange(len(flat.walk))
+    gx, gy = divmod(flat.node_id(*goal), flat.stride)
+    dx = np.abs(nodes // flat.stride - gx)
+    dy = np.abs(nodes % flat.stride - gy)
+    return np.maximum(dx, dy) + (SQRT2 - 1) * np.minimum(dx, dy)
+
+class _Bounds(dict):
+    """ALT lower bounds to one goal, computed per node the first time a_star reads them"""
+    def __init__(self, table, goal):
+        super().__init__()
+        flat = table.flat
+        t = flat.node_id(*goal)
+        self.stride = flat.stride
+        self.gx, self.gy = divmod(t, flat.stride)
+        self.dist = table.dist
+        self.to_goal = table.dist[:, t].tolist()
+        self.slack = table.slack
+
+    def __missing__(self, node):
+        x, y = divmod(node, self.stride)
+        dx = abs(x - self.gx)
+        dy = abs(y - self.gy)
+        h = max(dx, dy) + (SQRT2 - 1) * min(dx, dy)
+        for d, to_goal in zip(self.dist[:, node].tolist(), self.to_goal):
+            # inf or nan if the landmark cannot reach the cell or goal: no bound
+            bound = abs(d - to_goal) - self.slack
+            if h < bound < math.inf:
+                h = bound
+        self[node] = h
+        return h
+
+def table_key(flat, k):
+    digest = hashlib.sha256(bytes(flat.walk))
+    digest.update(("|%d|%d|%d|%d" % (flat.height, k, FORMAT_VERSION, grid_cache.FORMAT_VERSION)).encode())
+    return "alt-" + digest.hexdigest()[:32]
+
+class LandmarkTable:
+    def __init__(self, flat, dist):
+        self.flat = flat
+        self.version = flat.version
+        self.dist = dist  # (landmarks, nodes) float32, inf where unreachable
+        self.closed = set()  # Cells closed since the table was built
+        finite = dist[np.isfinite(dist)]
+        # float32 rounding of the stored distances must not make h overestimate
+        self.slack = float(finite.max()) * 4e-7 if len(finite) else 0.0
+
+    @classmethod
+    def build(cls, flat, k=NUM_LANDMARKS, rng=random):
+        _, rows = select_landmarks(flat, k, rng)
+        dist = np.array(rows, dtype=np.float32).reshape(len(rows), len(flat.walk))
+        return cls(flat, dist)
+
+    @classmethod
+    def load_or_build(cls, flat, k=NUM_LANDMARKS, cache=default_cache):
+        """Table from the grid cache, computed and stored there on a miss"""
+        key = table_key(flat, k)
+        dist = cache.get(key, dtype=np.float32)
+        if dist is None or dist.shape[1] != len(flat.walk):
+            table = cls.build(flat, k, rng=random.Random(key))
+            cache.put(key, table.dist, dtype=np.float32)
+            return table
+        return cls(flat, np.asarray(dist))
+
+    @property
+    def landmarks(self):
+        return [self.flat.coords(int(node)) for node in self.dist.argmin(axis=1)]
+
+    def set_closed(self, cell, closed):
+        """Follow a closure or reopening of cell in flat (already made there):
+        the table stays current unless cell was an obstacle when it was built"""
+        if closed:
+            self.closed.add(cell)
+        elif cell in self.closed:
+            self.closed.discard(cell)
+        else:
+            return  # shorter paths than the table knows: rebuilt on next use
+        self.version = self.flat.version
+
+    def heuristic(self, goal):
+        """Lower bound of the distance to goal, indexable by node id for a_star"""
+        return _Bounds(self, goal)
+
+def expansion_report(flat, table, pairs):
+    """Mean nodes expanded by a_star per query with each heuristic.
+
+    "reduction" compares ALT with octile, the best admissible heuristic
+    without landmarks, and "ratio" is how many times fewer nodes ALT
+    expands (as in jps.expansion_report); Manhattan is what the apps use,
+    but it overestimates diagonal moves, so its routes are not always
+    shortest.
+    """
+    heuristics = {
+        "manhattan": lambda goal: None,
+        "octile": lambda goal: octile_heuristic(flat, goal).tolist(),
+        "alt": table.heuristic,
+    }
+    report = dict.fromkeys(heuristics, 0.0)
+    stats = {}
+    for start, goal in pairs:
+        for name, heuristic in heuristics.items():
+            grid_search.a_star(flat, start, goal, stats=stats, heuristic=heuristic(goal))
+            report[name] += stats["expanded"] / max(len(pairs), 1)
+    report["reduction"] = 1 - report["alt"] / report["octile"] if report["octile"] else 0.0
+    report["ratio"] = report["octile"] / report["alt"] if report["alt"] else 0.0
+    return report
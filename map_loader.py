@@ -0,0 +1,87 @@
+"""Map ingestion: turn a map image into a walkability grid (0 = walkable, 1 = obstacle)"""
+import numpy as np
+
+TILE_SIZE = 10 # Same fixed size as Final.py / program.py
+
+# Road pixels are gray: every channel inside this range
+GRAY_MIN = 90
+GRAY_MAX = 150
+
+# A tile is walkable when more than this fraction of its pixels are road
+WALKABLE_RATIO = 0.2
+
+# Traversal cost levels of walkable tiles: 1 = all road .. COST_LEVELS = barely walkable
+COST_LEVELS = 4
+
+def image_to_array(img):
+    """Decode the image once into an (h, w, 3) uint8 array"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return np.asarray(img, dtype=np.uint8)
+
+def gray_mask(pixels, gray_min=GRAY_MIN, gray_max=GRAY_MAX, require_r_le_g=False):
+    """Boolean mask of road (gray) pixels.
+
+    Final.py's rule is written as `90 <= r <= g <= 150 and ...`, which also
+    requires r <= g. Pass require_r_le_g=True to reproduce it exactly.
+    """
+    r = pixels[..., 0]
+    g = pixels[..., 1]
+    b = pixels[..., 2]
+    mask = ((r >= gray_min) & (r <= gray_max) &
+            (g >= gray_min) & (g <= gray_max) &
+            (b >= gray_min) & (b <= gray_max))
+    if require_r_le_g:
+        mask &= r <= g
+    return mask
+
+def tile_ratios(mask, tile_size=TILE_SIZE):
+    """Fraction of road pixels in every full tile, shape (grid_h, grid_w)"""
+    grid_h = mask.shape[0] // tile_size
+    grid_w = mask.shape[1] // tile_size
+    tiles = mask[:grid_h * tile_size, :grid_w * tile_size]
+    counts = tiles.reshape(grid_h, tile_size, grid_w, tile_size).sum(axis=(1, 3), dtype=np.int64)
+    return counts / float(tile_size * tile_size)
+
+def road_ratios(pixels, tile_size=TILE_SIZE):
+    """tile_ratios of the road pixels by Final.py's gray rule"""
+    return tile_ratios(gray_mask(pixels, require_r_le_g=True), tile_size)
+
+def tiles_from_ratios(ratios, threshold=WALKABLE_RATIO):
+    return np.where(ratios > threshold, 0, 1).astype(np.uint8)
+
+def costs_from_ratios(ratios, threshold=WALKABLE_RATIO, levels=COST_LEVELS):
+    scaled = np.ceil((1 - ratios) / (1 - threshold) * levels)
+    costs = np.clip(scaled, 1, levels).astype(np.uint8)
+    costs[ratios <= threshold] = 0
+    return costs
+
+def classify_tiles(pixels, tile_size=TILE_SIZE, threshold=WALKABLE_RATIO):
+    """Tile classification used by Final.App.load_map, as a uint8 array"""
+    return tiles_from_ratios(road_ratios(pixels, tile_size), threshold)
+
+def classify_costs(pixels, tile_size=TILE_SIZE, threshold=WALKABLE_RATIO, levels=COST_LEVELS):
+    """Integer traversal cost per tile as a uint8 array: 0 where classify_tiles
+    says obstacle, else 1..levels, growing with the share of non-road pixels"""
+    return costs_from_ratios(road_ratios(pixels, tile_size), threshold, levels)
+
+def classify_map(pixels, tile_size=TILE_SIZE, threshold=WALKABLE_RATIO, levels=COST_LEVELS):
+    """(classify_tiles, classify_costs) of the pixels, from one pass over them"""
+    ratios = road_ratios(pixels, tile_size)
+    return tiles_from_ratios(ratios, threshold), costs_from_ratios(ratios, threshold, levels)
+
+def classify_sampled(pixels, tile_size=TILE_SIZE):
+    """Tile classification used by program.App.load_map (top-left pixel of each tile)"""
+    grid_h = pixels.shape[0] // tile_size
+    grid_w = pixels.shape[1] // tile_size
+    samples = pixels[:grid_h * tile_size:tile_size, :grid_w * tile_size:tile_size]
+    return np.where(gray_mask(samples), 0, 1).astype(np.uint8)
+
+def load_grid(img, tile_size=TILE_SIZE, threshold=WALKABLE_RATIO, sampled=False):
+    """Classify a PIL image and return the grid as a list of lists"""
+    pixels = image_to_array(img)
+    if sampled:
+        cells = classify_sampled(pixels, tile_size)
+    else:
+        cells = classify_tiles(pixels, tile_size, threshold)
+    return cells.tolist()
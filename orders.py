@@ -0,0 +1,241 @@
+"""Visiting order for many pickup-and-delivery orders served by one courier.
+
+Distances between the courier start, every pickup and every delivery
+come from one early-stopping Dijkstra per point, run many points at a
+time by distance_fields(), never from pairwise A*. The stop sequence is
+built greedily (nearest stop that may be visited next) and then improved
+by 2-opt segment reversals, single-stop relocations and order
+reinsertions that keep every pickup before its delivery, until no move
+helps or the time budget runs out.
+
+Batch routing from the command line, on an order file ({"start": [x, y],
+"orders": [[[px, py], [dx, dy]], ...]}) or on random orders:
+
+    python orders.py map/mapy.png orders.json --budget 5
+    python orders.py map/mapy.png --random 200
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import numpy as np
+from flow_field import distance_fields
+
+TIME_BUDGET = 2.0  # seconds for the local search
+BATCH_CELLS = 1 << 22  # distance entries per distance_fields() call
+
+PICKUP = "pickup"
+DELIVERY = "delivery"
+
+def distance_matrix(flat, points, batch_cells=BATCH_CELLS):
+    """Matrix of shortest path lengths between points (inf if unreachable)"""
+    # Node 0 is border padding and never reached, so it stands in for off-map points
+    nodes = [flat.node_id(*p) if flat.in_bounds(*p) else 0 for p in points]
+    per_batch = max(1, batch_cells // len(flat.walk))
+    matrix = np.empty((len(points), len(points)))
+    for i in range(0, len(points), per_batch):
+        dist = distance_fields(flat, points[i:i + per_batch], targets=points)
+        matrix[i:i + per_batch] = dist[:, nodes]
+    return matrix
+
+def _length(matrix, route):
+    route = np.asarray(route)
+    return float(matrix[route[:-1], route[1:]].sum())
+
+def _greedy(matrix, count):
+    """Nearest-next construction; point 0 is the start, 1..count pickups, then deliveries"""
+    route = [0]
+    open_stops = set(range(1, count + 1))
+    while open_stops:
+        here = matrix[route[-1]]
+        stop = min(open_stops, key=lambda s: (here[s], s))
+        open_stops.remove(stop)
+        route.append(stop)
+        if stop <= count:
+            open_stops.add(stop + count)
+    return route
+
+def _two_opt(matrix, route, count, deadline):
+    """Reverse segments route[i:j+1] that shorten the route and keep precedence"""
+    improved = False
+    n = len(route)
+    for i in range(1, n - 1):
+        if time.perf_counter() > deadline:
+            break
+        a, first = route[i - 1], route[i]
+        inside = set()
+        for j in range(i, n):
+            stop = route[j]
+            # A delivery whose pickup is also in the segment would come first
+            if stop > count and stop - count in inside:
+                break
+            inside.add(stop)
+            if j == i:
+                continue
+            after = route[j + 1] if j + 1 < n else None
+            before = matrix[a, first] + (matrix[stop, after] if after is not None else 0.0)
+            reversed_ = matrix[a, stop] + (matrix[first, after] if after is not None else 0.0)
+            if reversed_ < before - 1e-9:
+                route[i:j + 1] = route[i:j + 1][::-1]
+                improved = True
+                break
+    return improved
+
+def _relocate(matrix, route, count, deadline):
+    """Move single stops to a better position that keeps precedence"""
+    improved = False
+    i = 1
+    while i < len(route):
+        if time.perf_counter() > deadline:
+            break
+        stop = route[i]
+        prev, nxt = route[i - 1], route[i + 1] if i + 1 < len(route) else None
+        removed = matrix[prev, stop] + (matrix[stop, nxt] - matrix[prev, nxt] if nxt is not None else 0.0)
+        rest = route[:i] + route[i + 1:]
+        # Positions allowed: after its pickup (deliveries), before its delivery (pickups)
+        if stop > count:
+            lo, hi = rest.index(stop - count) + 1, len(rest)
+        else:
+            lo, hi = 1, rest.index(stop + count)
+        best, best_at = removed - 1e-9, None
+        for k in range(lo, hi + 1):
+            p = rest[k - 1]
+            q = rest[k] if k < len(rest) else None
+            added = matrix[p, stop] + (matrix[stop, q] - matrix[p, q] if q is not None else 0.0)
+            if added < best:
+                best, best_at = added, k
+        if best_at is not None:
+            rest.insert(best_at, stop)
+            route[:] = rest
+            improved = True
+        i += 1
+    return improved
+
+def _reinsert_orders(matrix, route, count, deadline):
+    """Take out each order's pickup and delivery and put them back at the best gaps"""
+    improved = False
+    for pickup in range(1, count + 1):
+        if time.perf_counter() > deadline:
+            break
+        delivery = pickup + count
+        rest = np.array([stop for stop in route if stop != pickup and stop != delivery])
+        saved = _length(matrix, route) - _length(matrix, rest)
+        # Gap g sits between rest[g] and rest[g + 1]; the last gap appends
+        prev = rest
+        nxt = np.append(rest[1:], rest[0])
+        closing = np.append(np.ones(len(rest) - 1), 0.0)  # 0 for the last gap
+        def insert_cost(stop):
+            return matrix[prev, stop] + closing * (matrix[stop, nxt] - matrix[prev, nxt])
+        pick = insert_cost(pickup)
+        drop = insert_cost(delivery)
+        # Both in one gap, or the delivery in a later gap (suffix minimum)
+        together = matrix[prev, pickup] + matrix[pickup, delivery] \
+            + closing * (matrix[delivery, nxt] - matrix[prev, nxt])
+        later = np.append(np.minimum.accumulate(drop[::-1])[::-1][1:], np.inf)
+        cost = np.minimum(together, pick + later)
+        g = int(cost.argmin())
+        if cost[g] < saved - 1e-9:
+            h = g if together[g] <= pick[g] + later[g] else g + 1 + int(drop[g + 1:].argmin())
+            stops = rest.tolist()
+            stops.insert(h + 1, delivery)
+            stops.insert(g + 1, pickup)
+            route[:] = stops
+            improved = True
+    return improved
+
+def plan_orders(flat, start, orders, time_budget=TIME_BUDGET):
+    """Stop sequence for orders, a list of (pickup, delivery) cells.
+
+    Returns a dict with "stops" (list of (kind, order index, cell)),
+    "length" (total path length), "naive_length" (orders served one
+    after another in the given order), "skipped" (indices of orders
+    that cannot be reached from start) and "time" (seconds spent).
+    """
+    began = time.perf_counter()
+    points = [start] + [p for p, _ in orders] + [d for _, d in orders]
+    matrix = distance_matrix(flat, points)
+    count = len(orders)
+
+    # Orders the courier cannot complete from start are left out
+    served = [k for k in range(count)
+              if np.isfinite(matrix[0, k + 1]) and np.isfinite(matrix[k + 1, k + 1 + count])]
+    skipped = sorted(set(range(count)) - set(served))
+    keep = [0] + [k + 1 for k in served] + [k + 1 + count for k in served]
+    matrix = matrix[np.ix_(keep, keep)]
+    count = len(served)
+
+    route = _greedy(matrix, count)
+    deadline = began + time_budget
+    while time.perf_counter() < deadline:
+        changed = _two_opt(matrix, route, count, deadline)
+        changed = _relocate(matrix, route, count, deadline) or changed
+        changed = _reinsert_orders(matrix, route, count, deadline) or changed
+        if not changed:
+            break
+
+    naive = [0]
+    for k in range(1, count + 1):
+        naive += [k, k + count]
+    stops = []
+    for stop in route[1:]:
+        k = served[(stop - 1) % count]
+        if stop <= count:
+            stops.append((PICKUP, k, orders[k][0]))
+        else:
+            stops.append((DELIVERY, k, orders[k][1]))
+    return {
+        "stops": stops,
+        "length": _length(matrix, route),
+        "naive_length": _length(matrix, naive),
+        "skipped": skipped,
+        "time": time.perf_counter() - began,
+    }
+
+def random_orders(components, count, rng=random):
+    """A start cell and count (pickup, delivery) pairs, all in one connected area"""
+    cells = components.random_positions(2 * count + 1, rng=rng)
+    return cells[0], list(zip(cells[1:count + 1], cells[count + 1:]))
+
+def main(argv=None):
+    from components import ComponentIndex
+    from core import flat_grid
+    from grid_cache import default_cache
+
+    parser = argparse.ArgumentParser(description="SmartKurir batch routing of many orders")
+    parser.add_argument("map", help="map image")
+    parser.add_argument("orders", nargs="?", help='JSON file {"start": [x, y], "orders": [[pickup, delivery], ...]}')
+    parser.add_argument("--random", type=int, default=100, metavar="N", help="N random orders when no file is given")
+    parser.add_argument("--budget", type=float, default=TIME_BUDGET, help="seconds for the local search")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the results with the stop sequence to this JSON file")
+    args = parser.parse_args(argv)
+
+    flat = flat_grid(default_cache.load_cells(args.map))
+    if args.orders:
+        with open(args.orders) as f:
+            data = json.load(f)
+        start = tuple(data["start"])
+        orders = [(tuple(pickup), tuple(delivery)) for pickup, delivery in data["orders"]]
+    else:
+        start, orders = random_orders(ComponentIndex(flat), args.random, random.Random(args.seed))
+
+    result = plan_orders(flat, start, orders, args.budget)
+    summary = {
+        "orders": len(orders),
+        "skipped": result["skipped"],
+        "length": result["length"],
+        "naive_length": result["naive_length"],
+        "saving": 1 - result["length"] / result["naive_length"] if result["naive_length"] else 0.0,
+        "time_s": result["time"],
+    }
+    print(json.dumps(summary, indent=2, sort_keys=True))
+    if args.out:
+        summary["start"] = start
+        summary["stops"] = result["stops"]
+        with open(args.out, "w") as f:
+            f.write(json.dumps(summary, indent=2) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
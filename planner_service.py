@@ -0,0 +1,111 @@
+"""Run path planning in a worker pool and deliver results on the Tk thread.
+
+Requests are identified by a tag ("pickup", "goal", ...). Submitting a
+new request under a tag supersedes the previous one: it is cancelled if
+it has not started yet, and its result is dropped if it has. Finished
+results are picked up by polling with root.after, so callbacks always
+run on the Tk event loop and may touch widgets. A callback that raises
+is reported like any other Tk callback error and does not stop the
+delivery of later results.
+
+Speculative requests (routes the app may need later) are held back
+until no other request is pending, so they never compete with the
+route the courier needs now.
+"""
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 15
+
+class PlanningService:
+    def __init__(self, root, executor=None, workers=2, poll_ms=POLL_MS):
+        self.root = root
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="planner")
+        self.poll_ms = poll_ms
+        self.pending = {}  # tag -> (future, callback, on_error)
+        self.deferred = {}  # tag -> (fn, args, callback, on_error) of held back speculative requests
+        self.poll_id = None
+
+    def submit(self, tag, fn, *args, callback, on_error=None, speculative=False):
+        """Run fn(*args) in the pool; callback(result) runs later on the Tk thread.
+
+        A speculative request starts only once no other request is pending.
+        """
+        self.cancel(tag)
+        if speculative and self.pending:
+            self.deferred[tag] = (fn, args, callback, on_error)
+            return None
+        future = self.executor.submit(fn, *args)
+        self.pending[tag] = (future, callback, on_error)
+        if self.poll_id is None:
+            self.poll_id = self.root.after(self.poll_ms, self._poll)
+        return future
+
+    def cancel(self, tag=None):
+        """Drop one pending request, or all of them when tag is None"""
+        tags = list(self.pending) + list(self.deferred) if tag is None else [tag]
+        for t in tags:
+            self.deferred.pop(t, None)
+            entry = self.pending.pop(t, None)
+            if entry is not None:
+                entry[0].cancel()
+        self._start_deferred()
+
+    def promote(self, tag):
+        """Start a held back speculative request now: the app is waiting for it"""
+        entry = self.deferred.pop(tag, None)
+        if entry is not None:
+            fn, args, callback, on_error = entry
+            self.submit(tag, fn, *args, callback=callback, on_error=on_error)
+
+    def busy(self, tag=None):
+        if tag is None:
+            return bool(self.pending or self.deferred)
+        return tag in self.pending or tag in self.deferred
+
+    def _start_deferred(self):
+        if self.pending or not self.deferred:
+            return
+        deferred, self.deferred = self.deferred, {}
+        for tag, (fn, args, callback, on_error) in deferred.items():
+            self.submit(tag, fn, *args, callback=callback, on_error=on_error)
+
+    def _poll(self):
+        self.poll_id = None
+        try:
+            done = [(tag, entry) for tag, entry in self.pending.items() if entry[0].done()]
+            for tag, (future, callback, on_error) in done:
+                # An earlier callback may have cancelled or replaced this request
+                if self.pending.get(tag, (None,))[0] is not future:
+                    continue
+                del self.pending[tag]
+                try:
+                    error = future.exception()
+                    if error is None:
+                        callback(future.result())
+                    elif on_error is not None:
+                        on_error(error)
+                    else:
+                        raise error
+                except Exception as e:
+                    self._report(e)
+            self._start_deferred()
+        finally:
+            if self.pending and self.poll_id is None:
+                self.poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def _report(self, error):
+        """Show a failed request or callback the way Tk shows callback errors"""
+        report = getattr(self.root, "report_callback_exception", None)
+        if report is not None:
+            report(type(error), error, error.__traceback__)
+        else:
+            traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+    def shutdown(self):
+        self.cancel()
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
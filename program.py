@@ -1,14 +1,21 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
-import random
 import math
-from queue import PriorityQueue
-from PIL import Image
+from collections import deque
+import core
+from core import clamp, generate_random_map, is_walkable, random_position
+from grid_search import as_flat_grid
+from renderer import Layout, RetainedRenderer, courier_shape, flag_shape
+from raster import GridRaster
+from scheduler import FrameScheduler
+from sim_clock import SimClock
 
 WINDOW_WIDTH = 1100
 WINDOW_HEIGHT = 700
 
 TILE_SIZE = 10 # Ukuran tetap
+FRAME_MS = 16 # Jeda antar gambar ulang
+TICK_MS = 70 # Jeda antar langkah simulasi (satu tile per langkah)
 
 GRAY = "#666666"
 WHITE = "#FFFFFF"
@@ -17,59 +24,32 @@ YELLOW = "#FFFF00"
 RED = "#FF0000"
 GREEN = "#00FF00"
 
-def clamp(value, min_value, max_value):
-    return max(min_value, min(max_value, value))
-
-def generate_random_map(grid_width, grid_height):
-    return [[0 if random.random() < 0.85 else 1 for _ in range(grid_width)] for _ in range(grid_height)]
-
-def is_walkable(grid, x, y):
-    return 0 <= x < len(grid[0]) and 0 <= y < len(grid) and grid[y][x] == 0
+# Item canvas yang hanya dipindah (coords) setiap frame, urut dari bawah
+SCENE_LAYERS = [
+    ("start_pole", "line", {"fill": BLACK, "width": 3}),
+    ("start_flag", "polygon", {"fill": YELLOW, "outline": BLACK}),
+    ("goal_pole", "line", {"fill": BLACK, "width": 3}),
+    ("goal_flag", "polygon", {"fill": RED, "outline": BLACK}),
+    ("courier", "polygon", {"fill": GREEN, "outline": BLACK}),
+    ("legend_box", "rectangle", {"fill": "white", "outline": "black", "stipple": "gray50"}),
+    ("legend", "text", {"anchor": "nw", "font": ("Arial", 10, "bold")}),
+]
 
 def a_star(grid, start, goal):
-    def heuristic(a, b):
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
-    open_set = PriorityQueue()
-    open_set.put((0, start))
-    came_from = {}
-    g_score = {start: 0}
-    while not open_set.empty():
-        _, current = open_set.get()
-        if current == goal:
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            return path[::-1]
-        for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
-            neighbor = (current[0] + dx, current[1] + dy)
-            if is_walkable(grid, *neighbor):
-                tentative_g = g_score[current] + 1
-                if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g
-                    f_score = tentative_g + heuristic(neighbor, goal)
-                    open_set.put((f_score, neighbor))
-    return []
-
-def random_position(grid):
-    h = len(grid)
-    w = len(grid[0])
-    while True:
-        x = random.randint(0, w - 1)
-        y = random.randint(0, h - 1)
-        if grid[y][x] == 0:
-            return x, y
+    """A* 4 arah; grid boleh list biasa atau FlatGrid"""
+    return core.a_star(grid, start, goal, diagonal=False)
 
 class Courier:
     def __init__(self, x, y):
         self.x, self.y = x, y
-        self.path = []
+        self.prev = (x, y)
+        self.path = deque()
         self.moving = False
         self.angle = 0
     def move(self):
+        self.prev = (self.x, self.y)
         if self.path:
-            nx, ny = self.path.pop(0)
+            nx, ny = self.path.popleft()
             dx = nx - self.x
             dy = ny - self.y
             if dx or dy:
@@ -77,6 +57,10 @@ class Courier:
             self.x, self.y = nx, ny
         else:
             self.moving = False
+    def position(self, alpha=1.0):
+        """Posisi gambar di antara langkah sebelumnya dan sekarang"""
+        px, py = self.prev
+        return px + (self.x - px) * alpha, py + (self.y - py) * alpha
 
 class App:
     def __init__(self, root):
@@ -112,85 +96,82 @@ class App:
         self.load_btn = tk.Button(self.controls_frame, text="Load Peta", command=self.load_map)
         self.load_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
-        self.grid = generate_random_map(self.grid_width, self.grid_height)
+        self.renderer = RetainedRenderer(self.canvas)
+        self.set_grid(generate_random_map(self.grid_width, self.grid_height))
         self.start = random_position(self.grid)
         self.goal = random_position(self.grid)
         self.courier = Courier(*self.start)
 
-        self.root.bind("<Configure>", lambda e: self.update())
+        # Resize hanya menggambar ulang, tidak menggerakkan kurir
+        self.frames = FrameScheduler(root, self.draw_grid, self.step, FRAME_MS)
+        self.clock = SimClock(TICK_MS)
+        self.root.bind("<Configure>", lambda e: self.frames.invalidate())
         self.root.minsize(500, 350)
 
         self.update()
 
+    def set_grid(self, grid):
+        self.grid = grid
+        self.flat_grid = as_flat_grid(grid)
+        # Seluruh sel digambar ke beberapa gambar, bukan satu kotak per sel
+        self.raster = GridRaster(grid, TILE_SIZE, GRAY, WHITE, outline_color=BLACK)
+
+    def draw_static(self, canvas, offset_x, offset_y):
+        """Layer peta: hanya digambar ulang saat peta atau ukuran canvas berubah"""
+        self.raster.draw(canvas, offset_x, offset_y)
+
     def draw_grid(self):
-        self.canvas.delete("all")
         canvas_w = self.canvas.winfo_width()
         canvas_h = self.canvas.winfo_height()
         map_w = self.grid_width * TILE_SIZE
         map_h = self.grid_height * TILE_SIZE
         offset_x = max((canvas_w - map_w) // 2, 0)
         offset_y = max((canvas_h - map_h) // 2, 0)
+        layout = Layout(offset_x, offset_y, TILE_SIZE)
 
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                color = GRAY if self.grid[y][x] == 0 else WHITE
-                self.canvas.create_rectangle(
-                    offset_x + x*TILE_SIZE,
-                    offset_y + y*TILE_SIZE,
-                    offset_x + (x+1)*TILE_SIZE,
-                    offset_y + (y+1)*TILE_SIZE,
-                    fill=color, outline=BLACK
-                )
+        self.renderer.begin(
+            (self.flat_grid.version, canvas_w, canvas_h),
+            lambda canvas: self.draw_static(canvas, offset_x, offset_y),
+            SCENE_LAYERS,
+        )
 
         # Start
-        sx, sy = self.start
-        cx = offset_x + sx*TILE_SIZE + TILE_SIZE//2
-        cy = offset_y + sy*TILE_SIZE + TILE_SIZE//2
-        self.canvas.create_line(cx, cy - 10, cx, cy + 10, fill=BLACK, width=3)
-        self.canvas.create_polygon([(cx, cy), (cx, cy - 10), (cx + 10, cy)], fill=YELLOW, outline=BLACK)
+        pole, flag = flag_shape(*layout.to_canvas(*self.start))
+        self.renderer.update("start_pole", pole)
+        self.renderer.update("start_flag", flag)
 
         # Goal
-        gx, gy = self.goal
-        cx = offset_x + gx*TILE_SIZE + TILE_SIZE//2
-        cy = offset_y + gy*TILE_SIZE + TILE_SIZE//2
-        self.canvas.create_line(cx, cy - 10, cx, cy + 5, fill=BLACK, width=3)
-        self.canvas.create_polygon([(cx, cy), (cx, cy - 10), (cx + 10, cy)], fill=RED, outline=BLACK)
+        pole, flag = flag_shape(*layout.to_canvas(*self.goal), pole_down=5)
+        self.renderer.update("goal_pole", pole)
+        self.renderer.update("goal_flag", flag)
 
         # Courier
-        cx = offset_x + self.courier.x * TILE_SIZE + TILE_SIZE // 2
-        cy = offset_y + self.courier.y * TILE_SIZE + TILE_SIZE // 2
-        length = TILE_SIZE // 2
-        angle = self.courier.angle
-        points = [
-            (cx + length * math.cos(angle), cy - length * math.sin(angle)),
-            (cx + length * math.cos(angle + 2.3), cy - length * math.sin(angle + 2.3)),
-            (cx + length * math.cos(angle - 2.3), cy - length * math.sin(angle - 2.3)),
-        ]
-        self.canvas.create_polygon(points, fill=GREEN, outline=BLACK)
+        alpha = self.clock.alpha() if self.courier.moving else 1.0
+        cx, cy = layout.to_canvas(*self.courier.position(alpha))
+        self.renderer.update("courier", courier_shape(cx, cy, TILE_SIZE // 2, self.courier.angle))
 
         # Legend
         legend_text = f"Map size: {self.grid_width * TILE_SIZE} px x {self.grid_height * TILE_SIZE} px"
-        padding = 4
-        font = ("Arial", 10, "bold")
-        text_id = self.canvas.create_text(padding, padding, anchor="nw", text=legend_text, font=font)
-        bbox = self.canvas.bbox(text_id)
-        if bbox:
-            x1, y1, x2, y2 = bbox
-            self.canvas.create_rectangle(
-                x1 - padding, y1 - padding,
-                x2 + padding, y2 + padding,
-                fill="white", outline="black", stipple="gray50"
-            )
-            self.canvas.lift(text_id)
+        self.renderer.legend("legend", "legend_box", legend_text)
 
     def update(self):
-        self.draw_grid()
+        """Minta gambar ulang; animasi berjalan selama kurir bergerak"""
         if self.courier.moving:
+            if not self.frames.animating:
+                self.clock.reset()
+            self.frames.start()
+        else:
+            self.frames.invalidate()
+
+    def step(self):
+        for _ in range(self.clock.advance()):
+            if not self.courier.moving:
+                break
             self.courier.move()
-            self.root.after(70, self.update)
+        return self.courier.moving
 
     def random_map(self):
-        self.grid = generate_random_map(self.grid_width, self.grid_height)
+        self.set_grid(generate_random_map(self.grid_width, self.grid_height))
         self.random_positions()
 
     def random_positions(self):
@@ -200,7 +181,7 @@ class App:
         self.update()
 
     def play(self):
-        self.courier.path = a_star(self.grid, (self.courier.x, self.courier.y), self.goal)
+        self.courier.path = deque(a_star(self.flat_grid, (self.courier.x, self.courier.y), self.goal))
         if self.courier.path:
             self.courier.moving = True
             self.update()
@@ -216,26 +197,14 @@ class App:
         try:
             filepath = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg")])
             if filepath:
-                img = Image.open(filepath).convert('RGB')
-                w, h = img.size
-                grid_w = w // TILE_SIZE
-                grid_h = h // TILE_SIZE
-
-                self.grid_width = grid_w
-                self.grid_height = grid_h
-
-                grid = []
-                for y in range(grid_h):
-                    row = []
-                    for x in range(grid_w):
-                        r, g, b = img.getpixel((x * TILE_SIZE, y * TILE_SIZE))
-                        if 90 <= r <= 150 and 90 <= g <= 150 and 90 <= b <= 150:
-                            row.append(0)
-                        else:
-                            row.append(1)
-                    grid.append(row)
-
-                self.grid = grid
+                # Satu sampel piksel (pojok kiri atas) per tile; grid yang
+                # sudah pernah dihitung diambil dari cache tanpa decode gambar
+                grid = core.load_grid(filepath, TILE_SIZE, sampled=True)
+
+                self.grid_width = len(grid[0]) if len(grid) else 0
+                self.grid_height = len(grid)
+
+                self.set_grid(grid)
                 self.start = random_position(self.grid)
                 self.goal = random_position(self.grid)
                 self.courier = Courier(*self.start)
@@ -0,0 +1,114 @@
+"""Grid rasterised into a few images instead of one canvas item per cell.
+
+The grid is split into square chunks of CHUNK_CELLS x CHUNK_CELLS cells;
+each chunk is a palette ("P") image shown as a single canvas image item.
+The grid is read one band of chunk rows at a time, so a BitGrid is never
+unpacked whole. Changing a cell repaints only its tile in the chunk
+image, and refresh() pastes dirty chunks into their existing PhotoImages
+in place.
+"""
+import numpy as np
+from PIL import Image
+
+CHUNK_CELLS = 128
+
+# Palette indices
+WALKABLE = 0
+OBSTACLE = 1
+OUTLINE = 2
+
+def _rgb(color):
+    color = color.lstrip("#")
+    return [int(color[i:i + 2], 16) for i in (0, 2, 4)]
+
+def grid_rows(grid, y0, y1):
+    """Rows y0..y1-1 of a list grid, 2D array or BitGrid as a uint8 array"""
+    if hasattr(grid, "rows"):
+        return grid.rows(y0, y1)
+    return np.asarray(grid[y0:y1], dtype=np.uint8).reshape(-1, len(grid[0]) if len(grid) else 0)
+
+class GridRaster:
+    def __init__(self, grid, tile_size, walkable_color, obstacle_color, outline_color=None,
+                 chunk_cells=CHUNK_CELLS):
+        self.grid = grid  # Read again by sync() for changed cells
+        self.height = len(grid)
+        self.width = len(grid[0]) if self.height else 0
+        self.tile_size = tile_size
+        self.outline = outline_color is not None
+        self.chunk_cells = chunk_cells
+        palette = _rgb(walkable_color) + _rgb(obstacle_color) + _rgb(outline_color or "#000000")
+        self.palette = palette + [0] * (768 - len(palette))
+        self.chunks = {}   # (cx, cy) -> PIL image
+        self.photos = {}   # (cx, cy) -> ImageTk.PhotoImage, created on first draw
+        self.dirty = set()
+        self.changed = set()  # Cells repainted since the chunks were made
+        for cy in range(0, self.height, chunk_cells):
+            band = grid_rows(grid, cy, cy + chunk_cells)
+            for cx in range(0, self.width, chunk_cells):
+                key = (cx // chunk_cells, cy // chunk_cells)
+                block = band[:, cx:cx + chunk_cells]
+                pixels = self._pixels(block)
+                if self.outline:
+                    # Close the outline on the right and bottom edge of the grid
+                    if cx + chunk_cells >= self.width:
+                        pixels = np.pad(pixels, ((0, 0), (0, 1)), constant_values=OUTLINE)
+                    if cy + chunk_cells >= self.height:
+                        pixels = np.pad(pixels, ((0, 1), (0, 0)), constant_values=OUTLINE)
+                image = Image.fromarray(pixels)
+                image.putpalette(self.palette)
+                self.chunks[key] = image
+
+    def _pixels(self, block):
+        """Palette index per pixel for a block of cells"""
+        t = self.tile_size
+        pixels = np.where(block == 0, WALKABLE, OBSTACLE).astype(np.uint8)
+        pixels = np.repeat(np.repeat(pixels, t, axis=0), t, axis=1)
+        if self.outline:
+            pixels[::t, :] = OUTLINE
+            pixels[:, ::t] = OUTLINE
+        return pixels
+
+    def set_cell(self, x, y, value):
+        """Repaint a single cell; visible after the next refresh()"""
+        n = self.chunk_cells
+        t = self.tile_size
+        key = (x // n, y // n)
+        corner = ((x % n) * t, (y % n) * t)
+        # The tile's last pixel is never outline (unless tiles are 1 pixel)
+        painted = self.chunks[key].getpixel((corner[0] + t - 1, corner[1] + t - 1))
+        if painted == (WALKABLE if value == 0 else OBSTACLE):
+            return
+        tile = Image.fromarray(self._pixels(np.array([[value]], dtype=np.uint8)))
+        tile.putpalette(self.palette)
+        self.chunks[key].paste(tile, corner)
+        self.dirty.add(key)
+        self.changed.add((x, y))
+
+    def sync(self, cells):
+        """Repaint the given cells, and the ones repainted before, from the grid"""
+        grid = self.grid
+        for x, y in set(cells) | self.changed:
+            self.set_cell(x, y, grid[y][x])
+
+    def draw(self, canvas, offset_x, offset_y):
+        """Place every chunk on the canvas as one image item each"""
+        # Offscreen canvases (benchmark.OffscreenCanvas) make their own photos
+        make_photo = getattr(canvas, "make_photo", None)
+        if make_photo is None:
+            from PIL import ImageTk
+            make_photo = ImageTk.PhotoImage
+        self.refresh()
+        span = self.chunk_cells * self.tile_size
+        for (cx, cy), image in self.chunks.items():
+            photo = self.photos.get((cx, cy))
+            if photo is None:
+                photo = self.photos[(cx, cy)] = make_photo(image)
+            canvas.create_image(offset_x + cx * span, offset_y + cy * span, anchor="nw", image=photo)
+
+    def refresh(self):
+        """Push repainted chunks into their PhotoImages (canvas items stay the same)"""
+        for key in self.dirty:
+            photo = self.photos.get(key)
+            if photo is not None:
+                photo.paste(self.chunks[key])
+        self.dirty.clear()
@@ -0,0 +1,192 @@
+"""Retained-mode drawing on a Tk canvas.
+
+The static layer (map image or cells) is drawn once per map or canvas
+size. Flags, courier, path and legend are created once as named items
+and afterwards only moved or re-styled with coords/itemconfig, and only
+when their values actually change, so a frame costs the same on any
+map size.
+"""
+import math
+import numpy as np
+
+def flag_shape(cx, cy, scale_x=1, scale_y=1, pole_down=10):
+    """(pole line, flag triangle) coordinates of a flag standing at (cx, cy)"""
+    pole = (cx, cy - 10 * scale_y, cx, cy + pole_down * scale_y)
+    flag = (cx, cy, cx, cy - 10 * scale_y, cx + 10 * scale_x, cy)
+    return pole, flag
+
+def courier_shape(cx, cy, length, angle):
+    """Triangle pointing along angle (radians, counter-clockwise, y up)"""
+    points = []
+    for a in (angle, angle + 2.3, angle - 2.3):
+        points += [cx + length * math.cos(a), cy - length * math.sin(a)]
+    return tuple(points)
+
+def courier_shapes(cx, cy, length, angles):
+    """courier_shape for arrays of couriers: one row of 6 coordinates each"""
+    a = np.asarray(angles)[:, None] + np.array([0, 2.3, -2.3])
+    xs = np.asarray(cx)[:, None] + length * np.cos(a)
+    ys = np.asarray(cy)[:, None] - length * np.sin(a)
+    return np.stack([xs, ys], axis=2).reshape(len(a), 6)
+
+class Layout:
+    """Maps grid coordinates to canvas pixels (centre of a tile)"""
+    def __init__(self, offset_x, offset_y, tile_size, scale_x=1, scale_y=1):
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.tile_size = tile_size
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+
+    def to_canvas(self, x, y):
+        t = self.tile_size
+        return (self.offset_x + x * t * self.scale_x + t * self.scale_x // 2,
+                self.offset_y + y * t * self.scale_y + t * self.scale_y // 2)
+
+    def to_grid(self, px, py):
+        """Cell under canvas pixel (px, py)"""
+        return (int((px - self.offset_x) // (self.tile_size * self.scale_x)),
+                int((py - self.offset_y) // (self.tile_size * self.scale_y)))
+
+    def cell_box(self, x, y):
+        """(x0, y0, x1, y1) canvas rectangle covered by a cell"""
+        w = self.tile_size * self.scale_x
+        h = self.tile_size * self.scale_y
+        x0 = self.offset_x + x * w
+        y0 = self.offset_y + y * h
+        return x0, y0, x0 + w, y0 + h
+
+class RetainedRenderer:
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.static_key = None
+        self.items = {}  # name -> canvas item id
+        self.last = {}   # name -> (coords, options) last sent to Tk
+
+    def invalidate(self):
+        """Force the static layer to be rebuilt on the next frame"""
+        self.static_key = None
+
+    def begin(self, static_key, build_static, layers):
+        """Rebuild the scene if static_key changed.
+
+        build_static(canvas) draws the background; layers is a list of
+        (name, kind, options) for the dynamic items, bottom to top, where
+        kind is "line", "polygon", "rectangle" or "text".
+        """
+        if static_key == self.static_key:
+            return False
+        canvas = self.canvas
+        canvas.delete("all")
+        self.items.clear()
+        self.last.clear()
+        build_static(canvas)
+        for name, kind, options in layers:
+            if kind == "text":
+                item = canvas.create_text(0, 0, state="hidden", **options)
+            elif kind == "polygon":
+                item = canvas.create_polygon(0, 0, 0, 0, 0, 0, state="hidden", **options)
+            elif kind == "rectangle":
+                item = canvas.create_rectangle(0, 0, 0, 0, state="hidden", **options)
+            else:
+                item = canvas.create_line(0, 0, 0, 0, state="hidden", **options)
+            self.items[name] = item
+        self.static_key = static_key
+        return True
+
+    def update(self, name, coords, **options):
+        """Show an item at coords with options; no Tk call if nothing changed"""
+        coords = tuple(coords)
+        state = (coords, options)
+        if self.last.get(name) == state:
+            return
+        item = self.items[name]
+        previous = self.last.get(name)
+        if previous is None or previous[0] != coords:
+            self.canvas.coords(item, *coords)
+        if previous is None or previous[1] != options:
+            self.canvas.itemconfig(item, state="normal", **options)
+        self.last[name] = state
+
+    def update_keyed(self, name, key, make_coords, **options):
+        """Like update, but coords are only rebuilt when key changes"""
+        if self.last.get(name) is not None and self.last[name][0] == ("key", key) \
+                and self.last[name][1] == options:
+            return
+        self.update(name, make_coords(), **options)
+        self.last[name] = (("key", key), options)
+
+    def hide(self, name):
+        if self.last.get(name) is not None:
+            self.canvas.itemconfig(self.items[name], state="hidden")
+            self.last[name] = None
+
+    def legend(self, text_name, box_name, text, padding=4, x=None, y=None):
+        """Legend text at (x, y), the top-left by default, with a box sized to its bbox"""
+        position = (padding if x is None else x, padding if y is None else y)
+        if self.last.get(text_name) == (position, {"text": text}):
+            return
+        self.update(text_name, position, text=text)
+        bbox = self.canvas.bbox(self.items[text_name])
+        if bbox:
+            x1, y1, x2, y2 = bbox
+            self.update(box_name, (x1 - padding, y1 - padding, x2 + padding, y2 + padding))
+
+class FleetSprites:
+    """One polygon per courier of a Fleet, drawn in a single batch.
+
+    Couriers are drawn on the cell they occupy (Fleet.cells), not
+    interpolated between ticks: at courier speed a cell changes every few
+    ticks, so only a small share of a moving fleet needs Tk calls in any
+    frame. Shapes for the whole fleet are computed with array operations,
+    and Tk is only called for couriers whose cell, heading or colour
+    changed since the previous frame.
+    """
+    def __init__(self, canvas, colors, outline="black"):
+        self.canvas = canvas
+        self.colors = colors  # (without pickup, with pickup)
+        self.outline = outline
+        self.reset()
+
+    def reset(self):
+        """Forget the items (after the canvas was cleared)"""
+        self.items = []
+        self.last_coords = np.zeros((0, 6))
+        self.last_loaded = np.zeros(0, dtype=bool)
+
+    def draw(self, layout, fleet, length, below=None):
+        """Show every courier of fleet on its cell; new items are stacked
+        under the canvas item below (e.g. the legend)"""
+        cells = fleet.cells()
+        cx, cy = layout.to_canvas(cells[:, 0], cells[:, 1])
+        coords = np.rint(courier_shapes(cx, cy, length, fleet.angle[:len(fleet)]))
+        loaded = fleet.has_pickup[:len(fleet)].copy()
+        n, visible = len(coords), len(self.last_coords)
+        canvas = self.canvas
+
+        # Couriers already on screen: only touch the ones that changed
+        kept = min(n, visible)
+        moved = np.flatnonzero((coords[:kept] != self.last_coords[:kept]).any(axis=1))
+        for i in moved.tolist():
+            canvas.coords(self.items[i], *coords[i].tolist())
+        recolor = np.flatnonzero(loaded[:kept] != self.last_loaded[:kept])
+        for i in recolor.tolist():
+            canvas.itemconfig(self.items[i], fill=self.colors[int(loaded[i])])
+
+        # New couriers reuse hidden items first, then get new ones
+        for i in range(kept, n):
+            row = coords[i].tolist()
+            fill = self.colors[int(loaded[i])]
+            if i < len(self.items):
+                canvas.coords(self.items[i], *row)
+                canvas.itemconfig(self.items[i], state="normal", fill=fill)
+            else:
+                item = canvas.create_polygon(*row, fill=fill, outline=self.outline)
+                if below is not None:
+                    canvas.tag_lower(item, below)
+                self.items.append(item)
+        for item in self.items[n:visible]:
+            canvas.itemconfig(item, state="hidden")
+
+        self.last_coords = coords
+        self.last_loaded = loaded
@@ -0,0 +1,99 @@
+"""LRU cache of planned routes, keyed by grid version and endpoints.
+
+Every subpath of a shortest path is itself a shortest path, so for an
+optimal planner a query whose start and goal both lie on a cached route
+can be answered by slicing that route (in either direction, since moves
+are symmetric).
+"""
+from collections import OrderedDict
+
+MAX_CACHED_CELLS = 200000
+
+class RouteCache:
+    def __init__(self, max_cells=MAX_CACHED_CELLS):
+        self.max_cells = max_cells
+        self.routes = OrderedDict()  # (start, goal) -> [start, ..., goal]
+        self.cell_index = {}         # cell -> {route key: position in route}
+        self.cells = 0
+        self.version = None
+        self.hits = 0
+        self.subpath_hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.routes.clear()
+        self.cell_index.clear()
+        self.cells = 0
+
+    def _sync(self, version):
+        # Any change to the grid invalidates every cached route
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def lookup(self, version, start, goal, allow_subpath=True):
+        """Cached path (start excluded, same format as a_star) or None on a miss"""
+        self._sync(version)
+        key = (start, goal)
+        route = self.routes.get(key)
+        if route is not None:
+            self.routes.move_to_end(key)
+            self.hits += 1
+            return route[1:]
+
+        if allow_subpath:
+            on_start = self.cell_index.get(start)
+            on_goal = self.cell_index.get(goal)
+            if on_start and on_goal:
+                for route_key, i in on_start.items():
+                    j = on_goal.get(route_key)
+                    if j is None:
+                        continue
+                    self.routes.move_to_end(route_key)
+                    self.hits += 1
+                    self.subpath_hits += 1
+                    route = self.routes[route_key]
+                    if i <= j:
+                        return route[i + 1:j + 1]
+                    return route[j:i][::-1]
+
+        self.misses += 1
+        return None
+
+    def store(self, version, start, goal, path):
+        """Remember the result of a search (an empty path means no route)"""
+        self._sync(version)
+        key = (start, goal)
+        if key in self.routes:
+            self._drop(key)
+        route = [start] + list(path)
+        if len(route) > self.max_cells:
+            return
+        self.routes[key] = route
+        self.cells += len(route)
+        if path:
+            for i, cell in enumerate(route):
+                self.cell_index.setdefault(cell, {})[key] = i
+        while self.cells > self.max_cells:
+            self._drop(next(iter(self.routes)))
+
+    def _drop(self, key):
+        route = self.routes.pop(key)
+        self.cells -= len(route)
+        for cell in route:
+            entries = self.cell_index.get(cell)
+            if entries is not None:
+                entries.pop(key, None)
+                if not entries:
+                    del self.cell_index[cell]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "subpath_hits": self.subpath_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "routes": len(self.routes),
+            "cells": self.cells,
+        }
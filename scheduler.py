@@ -0,0 +1,67 @@
+"""One pending frame at a time for a Tk app.
+
+Redraw requests (resize, map load, state changes) only mark the frame
+dirty; they never advance the simulation. The simulation is advanced by
+the animation loop alone, once per interval, so extra <Configure>
+events cannot speed the courier up or start a second after() chain.
+"""
+
+class FrameScheduler:
+    def __init__(self, root, render, step, interval_ms):
+        """render() draws the scene; step() advances the simulation and
+        returns True while the animation should keep running"""
+        self.root = root
+        self.render = render
+        self.step = step
+        self.interval_ms = interval_ms
+        self.pending = None     # after() id of the single scheduled frame
+        self.animating = False
+        self.dirty = False
+        self.in_frame = False
+
+    def invalidate(self):
+        """Redraw soon; coalesced with any frame that is already scheduled"""
+        self.dirty = True
+        if not self.in_frame:  # the running frame renders after its step
+            self._schedule(0)
+
+    def start(self):
+        """Run the animation loop (no-op if it is already running)"""
+        self.animating = True
+        if not self.in_frame:
+            self._schedule(0)
+
+    def stop(self):
+        self.animating = False
+
+    def _schedule(self, delay):
+        if self.pending is None:
+            self.pending = self.root.after(delay, self._frame)
+
+    def _frame(self):
+        self.pending = None
+        if self.in_frame:
+            # Only reachable from a nested event loop (a dialog inside step())
+            self._schedule(self.interval_ms)
+            return
+        self.in_frame = True
+        try:
+            if self.animating:
+                # step() may itself call start() (e.g. a new leg begins)
+                self.animating = False
+                keep_going = self.step()
+                self.animating = self.animating or bool(keep_going)
+                self.dirty = True
+            if self.dirty:
+                self.dirty = False
+                self.render()
+        finally:
+            self.in_frame = False
+        if self.animating:
+            self._schedule(self.interval_ms)
+
+    def cancel(self):
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+        self.animating = False
@@ -0,0 +1,45 @@
+"""Fixed-timestep simulation clock.
+
+The simulation advances in whole ticks of tick_ms of real time, however
+often frames are actually drawn. A late frame runs several ticks to catch
+up (at most max_ticks; any older backlog is dropped so a stalled event
+loop cannot snowball), and alpha() says how far the next tick has come
+so the renderer can interpolate between the last two simulated states.
+"""
+import time
+
+MAX_TICKS_PER_FRAME = 8
+
+class SimClock:
+    def __init__(self, tick_ms, max_ticks=MAX_TICKS_PER_FRAME, clock=time.perf_counter):
+        self.tick = tick_ms / 1000.0
+        self.max_ticks = max_ticks
+        self.clock = clock
+        self.last = None
+        self.accumulator = 0.0
+        self.dropped = 0  # ticks skipped because frames came too late
+
+    def reset(self):
+        """Start measuring again from the next advance() (after a pause)"""
+        self.last = None
+        self.accumulator = 0.0
+
+    def advance(self):
+        """Number of ticks due since the previous call"""
+        now = self.clock()
+        if self.last is None:
+            self.last = now
+            return 0
+        self.accumulator += now - self.last
+        self.last = now
+        due = int(self.accumulator / self.tick)
+        if due > self.max_ticks:
+            self.dropped += due - self.max_ticks
+            self.accumulator = 0.0
+            return self.max_ticks
+        self.accumulator -= due * self.tick
+        return due
+
+    def alpha(self):
+        """Fraction (0..1) of the current tick that has already elapsed"""
+        return min(self.accumulator / self.tick, 1.0)
@@ -0,0 +1,222 @@
+"""Headless batch simulation of pickup -> delivery episodes.
+
+Each episode picks a start, pickup and goal in one connected area (as
+Final.App.load_map does), plans both legs with a_star and drives a
+core.Courier along them tick by tick until it stops, with no window and
+no waiting on the clock. Episode i always uses the same seeded random
+generator, so results do not depend on how episodes are spread over
+workers. Only the GUI-free core is used, so no display is needed;
+benchmark.py checks that importing this module loads no GUI module.
+
+Episodes run in a process pool. The grid is classified once (through the
+grid cache) and its padded walk buffer written to a temporary file that
+every worker maps read-only, so the OS shares one copy of the grid
+between all processes and nothing is pickled per task beyond two ints.
+
+With --fleet N, N couriers instead drive their episodes at the same
+time as one fleet.Fleet in this process, and the cost of every
+simulation tick is measured.
+
+    python simulate.py map/Map1_fix.png --episodes 5000
+    python simulate.py map/Map1_fix.png --scaling   # episodes/s per worker count
+    python simulate.py map/Map1_fix.png --fleet 1000
+"""
+import argparse
+import json
+import mmap
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import grid_search
+from any_angle import path_length
+from components import ComponentIndex
+from core import Courier, a_star, flat_grid, TICK_MS
+from fleet import dispatch, plan_legs
+from grid_cache import default_cache as grid_cache
+
+EPISODES = 1000
+SEED = 1
+CHUNK = 64  # episodes per pool task
+MAX_TICKS = 200000  # per episode; a courier still moving after this counts as failed
+
+# Set in each worker by _init_worker
+_flat = None
+_components = None
+
+def _init_worker(walk_path, width, height):
+    global _flat, _components
+    with open(walk_path, "rb") as f:
+        walk = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _flat = grid_search.FlatGrid.from_walk(walk, width, height)
+    _components = ComponentIndex(_flat)
+
+def episode_rng(seed, i):
+    return random.Random("%d/%d" % (seed, i))
+
+def run_episode(flat, components, rng, max_ticks=MAX_TICKS):
+    """(delivered, path length, planning ms, simulated ticks) of one episode"""
+    start, pickup, goal = components.random_positions(3, rng=rng)
+    courier = Courier(*start)
+    length = 0.0
+    plan_ms = 0.0
+    ticks = 0
+    for target in (pickup, goal):
+        here = (courier.x, courier.y)
+        began = time.perf_counter()
+        path = a_star(flat, here, target)
+        plan_ms += (time.perf_counter() - began) * 1000
+        if not path:
+            return False, length, plan_ms, ticks
+        length += path_length(here, path)
+        courier.path = path
+        courier.target_index = 0
+        courier.moving = True
+        while courier.moving and ticks < max_ticks:
+            courier.move()
+            ticks += 1
+        if courier.moving:
+            return False, length, plan_ms, ticks
+        courier.has_pickup = True
+    return (courier.x, courier.y) == goal, length, plan_ms, ticks
+
+def _run_chunk(seed, first, count):
+    return [run_episode(_flat, _components, episode_rng(seed, i)) for i in range(first, first + count)]
+
+def summarize(results, wall):
+    """Aggregate statistics of a list of run_episode results"""
+    if not results:
+        return {"episodes": 0}
+    delivered, length, plan_ms, ticks = (np.array(column, dtype=float) for column in zip(*results))
+    ok = delivered.astype(bool)
+    seconds = ticks * TICK_MS / 1000.0
+
+    def spread(values, unit):
+        if not len(values):
+            return {}
+        p50, p95 = np.percentile(values, [50, 95])
+        return {"mean" + unit: float(values.mean()), "p50" + unit: float(p50), "p95" + unit: float(p95)}
+
+    return {
+        "episodes": len(results),
+        "success_rate": float(ok.mean()),
+        "path_length": spread(length[ok], ""),
+        "planning": spread(plan_ms, "_ms"),
+        "delivery_time": spread(seconds[ok], "_s"),
+        "wall_s": wall,
+        "episodes_per_s": len(results) / wall if wall > 0 else 0.0,
+    }
+
+def simulate(map_path, episodes=EPISODES, workers=None, seed=SEED):
+    """Run episodes on the map image (workers=0: in this process); returns summarize() output"""
+    flat = flat_grid(grid_cache.load_cells(map_path))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 0:
+        began = time.perf_counter()
+        components = ComponentIndex(flat)
+        results = [run_episode(flat, components, episode_rng(seed, i)) for i in range(episodes)]
+        return summarize(results, time.perf_counter() - began)
+
+    fd, walk_path = tempfile.mkstemp(suffix=".walk")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(flat.walk)
+        # Several chunks per worker keep them all busy until the end
+        chunk = max(1, min(CHUNK, episodes // (workers * 4)))
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(walk_path, flat.width, flat.height)) as pool:
+            began = time.perf_counter()
+            futures = [pool.submit(_run_chunk, seed, first, min(chunk, episodes - first))
+                       for first in range(0, episodes, chunk)]
+            for future in futures:
+                results.extend(future.result())
+            wall = time.perf_counter() - began
+    finally:
+        os.remove(walk_path)
+    return summarize(results, wall)
+
+def run_fleet(flat, components, couriers, rng, max_ticks=MAX_TICKS):
+    """One fleet of couriers driving their episodes together.
+
+    Returns (run_episode-like results, milliseconds of every tick); the
+    planning time of both legs is shared out evenly over the couriers.
+    """
+    stops = [components.random_positions(3, rng=rng) for _ in range(couriers)]
+    began = time.perf_counter()
+    legs = plan_legs(lambda start, goal: a_star(flat, start, goal), stops)
+    plan_ms = (time.perf_counter() - began) * 1000 / max(couriers, 1)
+    fleet = dispatch(stops, legs)
+    delivered_at = {}
+    tick_ms = []
+    ticks = 0
+    while fleet.moving[:len(fleet)].any() and ticks < max_ticks:
+        began = time.perf_counter()
+        done = fleet.advance(legs)
+        tick_ms.append((time.perf_counter() - began) * 1000)
+        ticks += 1
+        for i in done:
+            delivered_at[i] = ticks
+    results = []
+    for i, (start, pickup, _) in enumerate(stops):
+        length = path_length(start, legs[i][0]) + path_length(pickup, legs[i][1])
+        results.append((i in delivered_at, length, plan_ms, delivered_at.get(i, ticks)))
+    return results, tick_ms
+
+def simulate_fleet(map_path, couriers, seed=SEED):
+    """summarize() of one fleet run on the map image, plus per-tick cost ("tick")"""
+    flat = flat_grid(grid_cache.load_cells(map_path))
+    began = time.perf_counter()
+    results, tick_ms = run_fleet(flat, ComponentIndex(flat), couriers, episode_rng(seed, 0))
+    summary = summarize(results, time.perf_counter() - began)
+    summary["tick"] = {"couriers": couriers, "ticks": len(tick_ms)}
+    if tick_ms:
+        samples = np.array(tick_ms)
+        p50, p95 = np.percentile(samples, [50, 95])
+        summary["tick"].update(mean_ms=float(samples.mean()), p50_ms=float(p50), p95_ms=float(p95))
+    return summary
+
+def scaling(map_path, episodes=EPISODES, max_workers=None, seed=SEED):
+    """Throughput for 1, 2, 4, ... workers, with the speedup over one worker"""
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = sorted({min(1 << i, max_workers) for i in range(max_workers.bit_length() + 1)})
+    rows = []
+    for n in counts:
+        rate = simulate(map_path, episodes, n, seed)["episodes_per_s"]
+        rows.append({"workers": n, "episodes_per_s": rate,
+                     "speedup": rate / rows[0]["episodes_per_s"] if rows else 1.0})
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartKurir headless simulation")
+    parser.add_argument("map", help="map image")
+    parser.add_argument("--episodes", type=int, default=EPISODES)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores, 0: no pool)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--scaling", action="store_true", help="measure throughput for 1..workers processes")
+    parser.add_argument("--fleet", type=int, metavar="N", help="drive N couriers at once as one fleet")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.fleet:
+        results = simulate_fleet(args.map, args.fleet, args.seed)
+    elif args.scaling:
+        results = scaling(args.map, args.episodes, args.workers, args.seed)
+    else:
+        results = simulate(args.map, args.episodes, args.workers, args.seed)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Streaming map ingestion: decode and classify an image one strip at a time.
+
+A strip is TILE_SIZE pixel rows, exactly one row of tiles, so classifying
+strips gives the same grid as map_loader on the whole image. Only the
+current strip is converted to RGB and classified; each grid row goes
+straight into a BitGrid (in memory or a file), so peak memory is bounded
+by the strip size rather than the image size.
+
+8-bit, non-interlaced PNGs (the format of the bundled maps) are inflated
+here strip by strip, and each strip's scanlines are handed to PIL as a
+tiny PNG of their own. Other images go through PIL, which decodes the
+whole image in its own mode; only conversion, classification and output
+are strip-wise then. Classification can be spread over a
+process pool, with a bounded number of strips in flight. PIL is
+imported where an image is decoded, so importing this module stays cheap.
+"""
+import io
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import map_loader
+from bitgrid import BitGrid
+
+# Images with more pixels than this are ingested strip-wise by the grid cache
+STREAM_MIN_PIXELS = 1 << 26
+PREVIEW_SIZE = 4096  # Longest side of preview() images
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # PNG colour type -> samples per pixel
+
+def _png_chunks(f):
+    """(type, data) of every chunk after the signature, up to IEND"""
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        length, kind = struct.unpack(">I4s", head)
+        data = f.read(length)
+        f.read(4)  # CRC
+        yield kind, data
+        if kind == b"IEND":
+            return
+
+def png_header(path):
+    """(IHDR fields, PLTE data) if the PNG can be streamed, else None"""
+    with open(path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        ihdr = palette = None
+        for kind, data in _png_chunks(f):
+            if kind == b"IHDR":
+                ihdr = struct.unpack(">IIBBBBB", data)
+                _, _, depth, color, _, _, interlace = ihdr
+                if depth != 8 or interlace or color not in _CHANNELS:
+                    return None
+            elif kind == b"PLTE":
+                palette = data
+            elif kind == b"IDAT":
+                break
+        else:
+            return None
+    if ihdr is None or (ihdr[3] == 3 and palette is None):
+        return None
+    return ihdr, palette
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def _decode_strip(header, prev, lines):
+    """Let PIL unfilter and convert filtered scanlines, given the unfiltered row above.
+
+    The scanlines are wrapped in a small PNG whose first row is prev
+    (filter 0), stored without compression, so PIL's own decoder and
+    convert('RGB') do the work and the result is exactly what PIL gives
+    for these rows of the whole image.
+    """
+    (width, _, depth, color, compression, filtering, interlace), palette = header
+    rows = len(lines) // (width * _CHANNELS[color] + 1)
+    ihdr = struct.pack(">IIBBBBB", width, rows + 1, depth, color, compression, filtering, interlace)
+    data = PNG_SIGNATURE + _chunk(b"IHDR", ihdr)
+    if palette is not None:
+        data += _chunk(b"PLTE", palette)
+    data += _chunk(b"IDAT", zlib.compress(b"\0" + prev + lines, 0)) + _chunk(b"IEND", b"")
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        samples = np.asarray(img)
+        return map_loader.image_to_array(img)[1:], samples[-1].tobytes()
+
+def png_strips(path, rows, header=None):
+    """RGB arrays of `rows` pixel rows each (the last one may be shorter)"""
+    header = header or png_header(path)
+    width, height = header[0][:2]
+    line = width * _CHANNELS[header[0][3]] + 1  # filter byte + samples
+    budget = line * rows  # never inflate much more than one strip at a time
+    decompressor = zlib.decompressobj()
+    pending = b""
+    prev = bytes(line - 1)
+    done = 0
+
+    with open(path, "rb") as f:
+        f.read(8)
+        for kind, data in _png_chunks(f):
+            if kind != b"IDAT":
+                continue
+            while done < height:
+                out = decompressor.decompress(data, budget)
+                data = decompressor.unconsumed_tail
+                pending += out
+                while len(pending) >= budget or (done + len(pending) // line >= height and pending):
+                    count = min(rows, height - done, len(pending) // line)
+                    strip, prev = _decode_strip(header, prev, pending[:count * line])
+                    pending = pending[count * line:]
+                    done += count
+                    yield strip
+                    if done == height:
+                        break
+                if not data and len(out) < budget:
+                    break  # this chunk is used up
+    if done < height:
+        raise ValueError("Data PNG terpotong: %d dari %d baris" % (done, height))
+
+def pil_strips(path, rows):
+    """Same as png_strips for any image PIL can open"""
+    from PIL import Image
+    with Image.open(path) as img:
+        img.load()
+        width, height = img.size
+        for y0 in range(0, height, rows):
+            yield map_loader.image_to_array(img.crop((0, y0, width, min(y0 + rows, height))))
+
+def image_strips(path, rows):
+    """(width, height, strip iterator) for an image file"""
+    header = png_header(path)
+    if header is not None:
+        return header[0][0], header[0][1], png_strips(path, rows, header)
+    from PIL import Image
+    with Image.open(path) as img:
+        width, height = img.size
+    return width, height, pil_strips(path, rows)
+
+def preview(path, max_side=PREVIEW_SIZE):
+    """RGB PIL image of the whole map, shrunk by a whole factor to at most
+    max_side pixels a side, built strip by strip"""
+    from PIL import Image
+    width, height, _ = image_strips(path, 1)
+    factor = max(1, -(-max(width, height) // max_side))
+    # Strips a multiple of factor high shrink exactly like the whole image
+    _, _, strips = image_strips(path, factor * 64)
+    rows = [np.asarray(Image.fromarray(strip).reduce(factor)) for strip in strips]
+    return Image.fromarray(np.concatenate(rows)) if rows else Image.new("RGB", (0, 0))
+
+def classify_strip(pixels, tile_size=map_loader.TILE_SIZE,
+                   threshold=map_loader.WALKABLE_RATIO, sampled=False):
+    """Grid row for one strip of exactly tile_size pixel rows"""
+    if sampled:
+        return map_loader.classify_sampled(pixels, tile_size)[0]
+    return map_loader.classify_tiles(pixels, tile_size, threshold)[0]
+
+def ingest(path, out_path=None, tile_size=map_loader.TILE_SIZE,
+           threshold=map_loader.WALKABLE_RATIO, sampled=False, workers=0):
+    """Classify an image strip by strip into a BitGrid (a file if out_path is given).
+
+    With workers > 0, strips are classified in a process pool while the
+    next ones are decoded; at most 2 * workers strips wait at a time.
+    """
+    width, height, strips = image_strips(path, tile_size)
+    grid = BitGrid.create(width // tile_size, height // tile_size, out_path)
+    rows = (strip for strip in strips if len(strip) == tile_size)  # drop a partial last strip
+    if workers <= 0:
+        for y, strip in enumerate(rows):
+            grid.set_rows(y, [classify_strip(strip, tile_size, threshold, sampled)])
+        return grid
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for y, strip in enumerate(rows):
+            if len(in_flight) >= 2 * workers:
+                y_done, future = in_flight.popleft()
+                grid.set_rows(y_done, [future.result()])
+            in_flight.append((y, pool.submit(classify_strip, strip, tile_size, threshold, sampled)))
+        for y_done, future in in_flight:
+            grid.set_rows(y_done, [future.result()])
+    return grid
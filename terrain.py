@@ -0,0 +1,152 @@
+"""Weighted terrain search: cheapest routes over per-cell integer costs.
+
+map_loader.classify_costs turns the gray ratio of every tile into a cost
+level (1 = all road .. COST_LEVELS). Entering a cell costs its level
+times STRAIGHT or DIAGONAL (10 and 14: integer octile steps), so every
+f = g + h is an integer. With the consistent octile heuristic f never
+decreases along the search, and the open set is a monotone bucket queue
+(Dial's algorithm): a ring of lists indexed by f, where push and pop are
+list appends and pops instead of O(log n) heap operations. No f can be
+more than 2 * DIAGONAL * max cost ahead of the current one, which bounds
+the ring size.
+
+TerrainCosts keeps the levels in the padded, column-major layout of
+FlatGrid.walk, so node ids index both. Walkability is read from the
+FlatGrid, so runtime road closures apply here too.
+"""
+import math
+import time
+
+import numpy as np
+
+import instrument
+from grid_search import CARDINALS_8, DIAGONALS_8, DENSE_NODES, _Scores, _finish, reconstruct
+
+STRAIGHT = 10
+DIAGONAL = 14
+
+class TerrainCosts:
+    """Cost levels of a (height, width) array in FlatGrid's padded layout, indexable by node id"""
+    def __init__(self, levels):
+        levels = np.asarray(levels, dtype=np.uint8)
+        if levels.ndim != 2:
+            levels = levels.reshape(0, 0)
+        self.height, self.width = levels.shape
+        self.cells = bytearray(np.ascontiguousarray(np.pad(levels, 1).T).tobytes())
+        self.max_cost = int(levels.max()) if levels.size else 0
+
+def octile(dx, dy):
+    """Cheapest possible cost of a (dx, dy) move: every cell at level 1"""
+    dx, dy = abs(dx), abs(dy)
+    return STRAIGHT * max(dx, dy) + (DIAGONAL - STRAIGHT) * min(dx, dy)
+
+def path_cost(flat, costs, start, path):
+    """Terrain cost of a route (start excluded) as found by a_star"""
+    total = 0
+    x, y = start
+    for nx, ny in path:
+        step = DIAGONAL if nx != x and ny != y else STRAIGHT
+        total += step * costs.cells[flat.node_id(nx, ny)]
+        x, y = nx, ny
+    return total
+
+def a_star(flat, costs, start, goal, stats=None):
+    """Cheapest path from start to goal (start excluded), or [] if there is none.
+
+    8-connected without corner cutting, like grid_search.a_star; costs
+    is the TerrainCosts of the same grid. stats works as in
+    grid_search.a_star (peak_open counts queued entries).
+    """
+    if stats is None and instrument.enabled:
+        stats = {}
+    track = stats is not None
+    if track:
+        began = time.perf_counter()
+        stats.update(expanded=0, pushes=0, peak_open=0, ms=0.0)
+    if not (flat.in_bounds(*start) and flat.is_walkable(*goal)):
+        if track:
+            _finish(stats, 0, 0, 0, 0, began, False)
+        return []
+    stride = flat.stride
+    walk = flat.walk
+    cost = costs.cells
+    s = flat.node_id(*start)
+    t = flat.node_id(*goal)
+    gx, gy = divmod(t, stride)
+    straight = [(flat.offset(dx, dy), dx, dy) for dx, dy in CARDINALS_8]
+    diagonals = [(flat.offset(dx, dy), flat.offset(dx, 0), flat.offset(0, dy), dx, dy)
+                 for dx, dy in DIAGONALS_8]
+
+    if len(walk) <= DENSE_NODES:
+        g_score = [math.inf] * len(walk)
+        came_from = [-1] * len(walk)
+    else:
+        g_score = _Scores()
+        came_from = {}
+    g_score[s] = 0
+    # f grows by at most one step's cost plus one step's change of h
+    ring = 2 * DIAGONAL * max(costs.max_cost, 1) + 1
+    buckets = [[] for _ in range(ring)]
+    sx, sy = divmod(s, stride)
+    f = octile(sx - gx, sy - gy)
+    # Bare node ids: h is fixed per node, so an entry whose f is not
+    # g_score + h was queued before a cheaper g was found and is skipped
+    buckets[f % ring].append(s)
+    queued = 1
+    expanded = 0
+    stale = 0
+    peak = 1
+    diagonal_extra = DIAGONAL - STRAIGHT
+
+    while queued:
+        bucket = buckets[f % ring]
+        if not bucket:
+            f += 1
+            continue
+        if track and queued > peak:
+            peak = queued
+        current = bucket.pop()
+        queued -= 1
+        if current == t:
+            if track:
+                _finish(stats, expanded, stale + 1, queued, peak, began, True)
+            return reconstruct(flat, came_from, s, t)
+        g = g_score[current]
+        cx, cy = divmod(current, stride)
+        cx -= gx
+        cy -= gy
+        hx = abs(cx)
+        hy = abs(cy)
+        if g + (STRAIGHT * hx + diagonal_extra * hy if hx > hy else STRAIGHT * hy + diagonal_extra * hx) != f:
+            stale += 1
+            continue
+        expanded += 1
+
+        for off, dx, dy in straight:
+            neighbor = current + off
+            if walk[neighbor]:
+                tentative_g = g + STRAIGHT * cost[neighbor]
+                if tentative_g < g_score[neighbor]:
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    hx = abs(cx + dx)
+                    hy = abs(cy + dy)
+                    estimate = STRAIGHT * hx + diagonal_extra * hy if hx > hy else STRAIGHT * hy + diagonal_extra * hx
+                    buckets[(tentative_g + estimate) % ring].append(neighbor)
+                    queued += 1
+
+        for off, off_x, off_y, dx, dy in diagonals:
+            neighbor = current + off
+            if walk[neighbor] and walk[current + off_x] and walk[current + off_y]:
+                tentative_g = g + DIAGONAL * cost[neighbor]
+                if tentative_g < g_score[neighbor]:
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    hx = abs(cx + dx)
+                    hy = abs(cy + dy)
+                    estimate = STRAIGHT * hx + diagonal_extra * hy if hx > hy else STRAIGHT * hy + diagonal_extra * hx
+                    buckets[(tentative_g + estimate) % ring].append(neighbor)
+                    queued += 1
+    if track:
+        _finish(stats, expanded, stale, 0, peak, began, False)
+    return []